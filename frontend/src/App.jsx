@@ -405,9 +405,13 @@ function App() {
               // Handle streaming content updates
               setIsStreaming(true)
               setStreamingContent(prev => prev + data.content)
-              // Update status with progress
-              const progress = `✨ Generating guide... ${data.total_chars.toLocaleString()} chars, ~${data.total_words.toLocaleString()} words (${data.elapsed_time.toFixed(1)}s)`
+              // Update status with progress (the agent sends its own label)
+              const progress = data.message || `✨ Generating guide... ${data.total_chars.toLocaleString()} chars, ~${data.total_words.toLocaleString()} words (${data.elapsed_time.toFixed(1)}s)`
               setCurrentStatus(progress)
+            } else if (data.type === 'streaming_reset') {
+              // A new model call started; drop the previous call's text
+              setIsStreaming(false)
+              setStreamingContent('')
             } else if (data.type === 'action_log') {
               // Add action log to the list
               setActionLogs(prev => [...prev, {
@@ -528,8 +532,11 @@ function App() {
               // Handle streaming content updates (in buffer processing)
               setIsStreaming(true)
               setStreamingContent(prev => prev + data.content)
-              const progress = `✨ Generating guide... ${data.total_chars.toLocaleString()} chars, ~${data.total_words.toLocaleString()} words (${data.elapsed_time.toFixed(1)}s)`
+              const progress = data.message || `✨ Generating guide... ${data.total_chars.toLocaleString()} chars, ~${data.total_words.toLocaleString()} words (${data.elapsed_time.toFixed(1)}s)`
               setCurrentStatus(progress)
+            } else if (data.type === 'streaming_reset') {
+              setIsStreaming(false)
+              setStreamingContent('')
             } else if (data.type === 'action_log') {
               // Add action log to the list
               setActionLogs(prev => [...prev, {
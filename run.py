@@ -1,16 +1,32 @@
 """
 Helper script to run the AI Assistant application.
 """
+import asyncio
 import os
+import signal
 import sys
 import subprocess
 import time
 from pathlib import Path
 
 
-def check_env_file():
+def scan_dir(path):
+    """
+    List a directory once as {name: DirEntry}.
+    
+    The pre-flight checks look names up in this dict instead of stat-ing
+    each path separately. Returns an empty dict if the directory is missing.
+    """
+    try:
+        with os.scandir(path) as entries:
+            return {entry.name: entry for entry in entries}
+    except (FileNotFoundError, NotADirectoryError):
+        return {}
+
+
+def check_env_file(root_entries):
     """Check if .env file exists."""
-    if not os.path.exists(".env"):
+    if ".env" not in root_entries:
         print("❌ .env file not found!")
         print("\nPlease create a .env file with your API keys.")
         print("You can copy .env.example and fill in your keys:")
@@ -21,9 +37,9 @@ def check_env_file():
     return True
 
 
-def check_vector_store():
+def check_vector_store(data_entries):
     """Check if vector store exists."""
-    if not os.path.exists("data/ap_faiss_index"):
+    if "ap_faiss_index" not in data_entries:
         print("❌ Vector store not found!")
         print("\nPlease prepare the knowledge base first:")
         print("  python scripts/migration/prepare_knowledge_base.py")
@@ -31,24 +47,33 @@ def check_vector_store():
     return True
 
 
-def check_frontend():
+async def _stream_output(stream, prefix=""):
+    """Echo a subprocess stream line by line as it is produced."""
+    async for line in stream:
+        print(f"{prefix}{line.decode(errors='replace').rstrip()}", flush=True)
+
+
+async def check_frontend(root_entries):
     """Check if frontend is set up."""
     frontend_dir = Path("frontend")
-    node_modules = frontend_dir / "node_modules"
     
-    if not frontend_dir.exists():
+    if "frontend" not in root_entries or not root_entries["frontend"].is_dir():
         print("❌ Frontend directory not found!")
         return False
     
-    if not node_modules.exists():
+    if "node_modules" not in scan_dir(frontend_dir):
         print("⚠️  Frontend dependencies not installed!")
         print("\nInstalling frontend dependencies...")
         try:
-            subprocess.run(
-                ["npm", "install"],
+            proc = await asyncio.create_subprocess_exec(
+                "npm", "install",
                 cwd=frontend_dir,
-                check=True
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT
             )
+            await _stream_output(proc.stdout, prefix="  [npm] ")
+            if await proc.wait() != 0:
+                raise RuntimeError(f"npm install exited with code {proc.returncode}")
             print("✓ Frontend dependencies installed")
         except Exception as e:
             print(f"❌ Failed to install frontend dependencies: {e}")
@@ -57,6 +82,49 @@ def check_frontend():
     return True
 
 
+async def run_preflight_checks():
+    """Run the pre-flight checks from one directory listing per folder."""
+    root_entries = scan_dir(".")
+    data_entries = scan_dir("data") if "data" in root_entries else {}
+    
+    results = [
+        check_env_file(root_entries),
+        check_vector_store(data_entries),
+        await check_frontend(root_entries)
+    ]
+    return all(results)
+
+
+def run_foreground(cmd, cwd=None):
+    """
+    Run a command until it exits, staying responsive to Ctrl+C.
+    
+    Polls the child instead of blocking in wait(), so KeyboardInterrupt is
+    handled at once; the interrupt is forwarded to the child (SIGINT, or
+    CTRL_BREAK_EVENT to its own process group on Windows) and re-raised.
+    Raises CalledProcessError if the command fails.
+    """
+    kwargs = {}
+    if os.name == "nt":
+        kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+    
+    proc = subprocess.Popen(cmd, cwd=cwd, **kwargs)
+    try:
+        while proc.poll() is None:
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        proc.send_signal(signal.CTRL_BREAK_EVENT if os.name == "nt" else signal.SIGINT)
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        raise
+    
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+
+
 def run_backend():
     """Run the FastAPI backend."""
     print("\n" + "="*60)
@@ -64,10 +132,7 @@ def run_backend():
     print("="*60)
     
     try:
-        subprocess.run(
-            [sys.executable, "-m", "uvicorn", "src.main:app", "--reload"],
-            check=True
-        )
+        run_foreground([sys.executable, "-m", "uvicorn", "src.main:app", "--reload"])
     except KeyboardInterrupt:
         print("\n\n✓ Backend server stopped")
     except Exception as e:
@@ -82,11 +147,7 @@ def run_frontend():
     print("="*60)
     
     try:
-        subprocess.run(
-            ["npm", "run", "dev"],
-            cwd="frontend",
-            check=True
-        )
+        run_foreground(["npm", "run", "dev"], cwd="frontend")
     except KeyboardInterrupt:
         print("\n\n✓ Frontend server stopped")
     except Exception as e:
@@ -94,6 +155,63 @@ def run_frontend():
         sys.exit(1)
 
 
+def _stop_process(proc):
+    """Ask a child server to shut down (SIGINT on POSIX, terminate on Windows)."""
+    if proc.returncode is not None:
+        return
+    if os.name == "nt":
+        proc.terminate()
+    else:
+        proc.send_signal(signal.SIGINT)
+
+
+async def _run_both_async():
+    """Start backend and frontend and wait until either of them exits."""
+    processes = []
+    backend_logs = None
+    try:
+        # Start backend in background
+        backend_process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "uvicorn", "src.main:app", "--reload",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT
+        )
+        processes.append(backend_process)
+        # Drain the pipe continuously: an unread pipe fills up (~64KB) and
+        # then blocks uvicorn on its next log write
+        backend_logs = asyncio.create_task(
+            _stream_output(backend_process.stdout, prefix="[backend] ")
+        )
+        
+        print("✓ Backend started")
+        await asyncio.sleep(2)
+        
+        print("✓ Starting frontend...\n")
+        frontend_process = await asyncio.create_subprocess_exec(
+            "npm", "run", "dev",
+            cwd="frontend"
+        )
+        processes.append(frontend_process)
+        
+        await asyncio.wait(
+            [asyncio.create_task(proc.wait()) for proc in processes],
+            return_when=asyncio.FIRST_COMPLETED
+        )
+        if frontend_process.returncode not in (None, 0):
+            raise RuntimeError(f"Frontend exited with code {frontend_process.returncode}")
+    finally:
+        # Runs on Ctrl+C (task cancellation) as well as on errors
+        for proc in processes:
+            _stop_process(proc)
+        await asyncio.gather(*(proc.wait() for proc in processes))
+        if backend_logs is not None:
+            # Flush what is left; don't hang on a stray reload worker holding the pipe
+            try:
+                await asyncio.wait_for(backend_logs, timeout=5)
+            except asyncio.TimeoutError:
+                pass
+
+
 def run_both():
     """Run both backend and frontend (Windows only)."""
     print("\n" + "="*60)
@@ -105,34 +223,14 @@ def run_both():
     print("="*60 + "\n")
     
     try:
-        # Start backend in background
-        backend_process = subprocess.Popen(
-            [sys.executable, "-m", "uvicorn", "src.main:app", "--reload"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        
-        print("✓ Backend started")
-        time.sleep(2)
-        
-        # Start frontend in foreground
-        print("✓ Starting frontend...\n")
-        subprocess.run(
-            ["npm", "run", "dev"],
-            cwd="frontend",
-            check=True
-        )
+        asyncio.run(_run_both_async())
+        print("✓ Servers stopped")
     
     except KeyboardInterrupt:
-        print("\n\n✓ Stopping servers...")
-        backend_process.terminate()
-        backend_process.wait()
-        print("✓ Servers stopped")
+        print("\n\n✓ Servers stopped")
     
     except Exception as e:
         print(f"\n❌ Error: {e}")
-        if 'backend_process' in locals():
-            backend_process.terminate()
         sys.exit(1)
 
 
@@ -145,13 +243,7 @@ def main():
     # Pre-flight checks
     print("\nRunning pre-flight checks...")
     
-    if not check_env_file():
-        sys.exit(1)
-    
-    if not check_vector_store():
-        sys.exit(1)
-    
-    if not check_frontend():
+    if not asyncio.run(run_preflight_checks()):
         sys.exit(1)
     
     print("\n✓ All checks passed!")
@@ -4,6 +4,8 @@ complete context to the agent including all input properties.
 """
 import pickle
 import random
+import re
+from collections import Counter
 
 # Load the enhanced index
 import os
@@ -12,28 +14,125 @@ import sys
 # Add parent directories to path for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
 
-with open("data/ap_faiss_index/index.pkl", "rb") as f:
-    docstore, index_to_docstore_id = pickle.load(f)
+try:
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+INDEX_DIR = "data/ap_faiss_index"
+PARQUET_PATH = os.path.join(INDEX_DIR, "docstore.parquet")
+PICKLE_PATH = os.path.join(INDEX_DIR, "index.pkl")
+
+# Property lines look like "  - Folder Path (ShortText, Optional)"
+PROPERTY_TYPE_PATTERN = r'^  - [^(]+\((?P<type>[^,)]+)'
+PROPERTY_TYPE_RE = re.compile(PROPERTY_TYPE_PATTERN, re.MULTILINE)
+
+
+def summarize_table(table):
+    """Compute the demo statistics column-wise over the docstore.parquet table."""
+    doc_type = table["type"]
+    num_properties = pc.fill_null(table["num_properties"], 0)
+    has_props = pc.greater(num_properties, 0)
+    is_action = pc.equal(doc_type, "action")
+    is_trigger = pc.equal(doc_type, "trigger")
+    
+    def first_row(mask):
+        rows = table.filter(mask).slice(0, 1).to_pylist()
+        if not rows:
+            return None
+        row = rows[0]
+        return {'page_content': row.pop('page_content'), 'metadata': row}
+    
+    lines = pc.list_flatten(pc.split_pattern(table["page_content"], "\n"))
+    types = pc.struct_field(pc.extract_regex(lines, PROPERTY_TYPE_PATTERN), "type")
+    property_types = Counter({
+        item["values"].as_py(): item["counts"].as_py()
+        for item in pc.value_counts(pc.drop_null(types))
+    })
+    
+    return {
+        'total_docs': table.num_rows,
+        'actions_with_props': pc.sum(pc.and_(is_action, has_props)).as_py() or 0,
+        'triggers_with_props': pc.sum(pc.and_(is_trigger, has_props)).as_py() or 0,
+        'total_props': pc.sum(num_properties).as_py() or 0,
+        'example_action': first_row(pc.and_(is_action, pc.greater_equal(num_properties, 5))),
+        'example_trigger': first_row(pc.and_(is_trigger, has_props)),
+        'property_types': property_types,
+    }
+
+
+def summarize_docstore(docstore):
+    """Compute the demo statistics from the pickled docstore dict in a single pass."""
+    actions_with_props = 0
+    triggers_with_props = 0
+    total_props = 0
+    example_action = None
+    example_trigger = None
+    property_types = Counter()
+    
+    for doc_data in docstore.values():
+        metadata = doc_data['metadata']
+        doc_type = metadata.get('type')
+        num_properties = metadata.get('num_properties', 0)
+        total_props += num_properties
+        
+        if doc_type == 'action' and num_properties > 0:
+            actions_with_props += 1
+            # Example 1: Action with multiple properties
+            if example_action is None and num_properties >= 5:
+                example_action = doc_data
+        elif doc_type == 'trigger' and num_properties > 0:
+            triggers_with_props += 1
+            # Example 2: Trigger with properties
+            if example_trigger is None:
+                example_trigger = doc_data
+        
+        # Extract property types from content
+        property_types.update(PROPERTY_TYPE_RE.findall(doc_data['page_content']))
+    
+    return {
+        'total_docs': len(docstore),
+        'actions_with_props': actions_with_props,
+        'triggers_with_props': triggers_with_props,
+        'total_props': total_props,
+        'example_action': example_action,
+        'example_trigger': example_trigger,
+        'property_types': property_types,
+    }
+
+
+def print_example(doc_data, label, name_field):
+    metadata = doc_data['metadata']
+    content = doc_data['page_content']
+    
+    print(f"\n{label}: {metadata.get(name_field)}")
+    print(f"Piece: {metadata.get('piece')}")
+    print(f"Properties: {metadata.get('num_properties')}")
+    print("\nFull Context Available to Agent:")
+    print("-" * 80)
+    print(content[:500] + "..." if len(content) > 500 else content)
+
+
+# Prefer the memory-mapped Parquet docstore when it is at least as new as index.pkl
+if (pq is not None and os.path.exists(PARQUET_PATH) and
+        os.path.getmtime(PARQUET_PATH) >= os.path.getmtime(PICKLE_PATH)):
+    summary = summarize_table(pq.read_table(PARQUET_PATH, memory_map=True))
+else:
+    with open(PICKLE_PATH, "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    summary = summarize_docstore(docstore)
 
 print("=" * 80)
 print(" " * 20 + "ENHANCED AGENT DEMONSTRATION")
 print("=" * 80)
 
 # Statistics
-total_docs = len(docstore)
-actions_with_props = sum(1 for doc in docstore.values() 
-                         if doc['metadata'].get('type') == 'action' 
-                         and doc['metadata'].get('num_properties', 0) > 0)
-triggers_with_props = sum(1 for doc in docstore.values() 
-                          if doc['metadata'].get('type') == 'trigger' 
-                          and doc['metadata'].get('num_properties', 0) > 0)
-total_props = sum(doc['metadata'].get('num_properties', 0) for doc in docstore.values())
-
 print(f"\n[STATS] FAISS Index Statistics:")
-print(f"  - Total Documents: {total_docs}")
-print(f"  - Actions with Properties: {actions_with_props}")
-print(f"  - Triggers with Properties: {triggers_with_props}")
-print(f"  - Total Properties Embedded: {total_props}")
+print(f"  - Total Documents: {summary['total_docs']}")
+print(f"  - Actions with Properties: {summary['actions_with_props']}")
+print(f"  - Triggers with Properties: {summary['triggers_with_props']}")
+print(f"  - Total Properties Embedded: {summary['total_props']}")
 
 # Find and display some examples
 print("\n" + "=" * 80)
@@ -44,58 +143,25 @@ print("=" * 80)
 print("\n[EXAMPLE 1] Action with Multiple Input Properties")
 print("-" * 80)
 
-for doc_id, doc_data in docstore.items():
-    metadata = doc_data['metadata']
-    if (metadata.get('type') == 'action' and 
-        metadata.get('num_properties', 0) >= 5):
-        content = doc_data['page_content']
-        
-        print(f"\nAction: {metadata.get('action_name')}")
-        print(f"Piece: {metadata.get('piece')}")
-        print(f"Properties: {metadata.get('num_properties')}")
-        print("\nFull Context Available to Agent:")
-        print("-" * 80)
-        print(content[:500] + "..." if len(content) > 500 else content)
-        break
+if summary['example_action']:
+    print_example(summary['example_action'], 'Action', 'action_name')
 
 # Example 2: Trigger with properties
 print("\n\n[EXAMPLE 2] Trigger with Configuration Properties")
 print("-" * 80)
 
-for doc_id, doc_data in docstore.items():
-    metadata = doc_data['metadata']
-    if (metadata.get('type') == 'trigger' and 
-        metadata.get('num_properties', 0) > 0):
-        content = doc_data['page_content']
-        
-        print(f"\nTrigger: {metadata.get('trigger_name')}")
-        print(f"Piece: {metadata.get('piece')}")
-        print(f"Properties: {metadata.get('num_properties')}")
-        print("\nFull Context Available to Agent:")
-        print("-" * 80)
-        print(content[:500] + "..." if len(content) > 500 else content)
-        break
+if summary['example_trigger']:
+    print_example(summary['example_trigger'], 'Trigger', 'trigger_name')
 
 # Show property type distribution
 print("\n\n" + "=" * 80)
 print(" " * 22 + "PROPERTY TYPE DISTRIBUTION")
 print("=" * 80)
 
-property_types = {}
-for doc_data in docstore.values():
-    content = doc_data['page_content']
-    if 'INPUT PROPERTIES:' in content or 'CONFIGURATION PROPERTIES:' in content:
-        # Extract property types from content
-        for line in content.split('\n'):
-            if '(' in line and ')' in line and '  - ' in line:
-                try:
-                    type_part = line.split('(')[1].split(',')[0]
-                    property_types[type_part] = property_types.get(type_part, 0) + 1
-                except:
-                    pass
+property_types = summary['property_types']
 
 print("\nProperty Types Found:")
-for prop_type, count in sorted(property_types.items(), key=lambda x: x[1], reverse=True)[:15]:
+for prop_type, count in property_types.most_common(15):
     print(f"  - {prop_type:25} - {count:4} occurrences")
 
 print("\n" + "=" * 80)
@@ -5,8 +5,15 @@ This script exports data from PostgreSQL and imports it into SQLite
 import sqlite3
 import json
 from datetime import datetime
+from psycopg.rows import tuple_row
 from db_config import get_db_cursor
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
 # SQLite database file
 SQLITE_DB = "activepieces.db"
 
@@ -116,21 +123,167 @@ def create_sqlite_schema(conn):
         )
     """)
     
-    # Create indexes for better performance
+    conn.commit()
+    print("[OK] SQLite schema created")
+
+
+def create_indexes(conn):
+    """Create lookup indexes once the bulk load has finished"""
+    cursor = conn.cursor()
+    
+    # Building each index once over the loaded table is much cheaper than
+    # maintaining it row by row during the inserts
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_actions_piece_id ON actions(piece_id)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_action_properties_action_id ON action_properties(action_id)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_triggers_piece_id ON triggers(piece_id)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_trigger_properties_trigger_id ON trigger_properties(trigger_id)")
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_pieces_name ON pieces(name)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_property_options_property_id ON property_options(property_id)")
     
-    conn.commit()
-    print("[OK] SQLite schema created")
+    print("[OK] Indexes created")
+
+
+def configure_bulk_load(conn):
+    """Tune SQLite for a one-off bulk load into a fresh database file"""
+    cursor = conn.cursor()
+    # Keep the rollback journal (so a failed migration can still be rolled
+    # back) but in memory, and skip fsyncs: a crash mid-migration just means
+    # re-running the script
+    cursor.execute("PRAGMA journal_mode=MEMORY")
+    cursor.execute("PRAGMA synchronous=OFF")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-200000")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    # Tables are loaded parent-first but references are verified in one scan
+    # afterwards (check_foreign_keys) instead of on every inserted row
+    cursor.execute("PRAGMA foreign_keys=OFF")
+
+
+def check_foreign_keys(conn):
+    """Report rows whose foreign keys point at missing parents"""
+    violations = {}
+    for table, _rowid, _parent, _fk_index in conn.execute("PRAGMA foreign_key_check"):
+        violations[table] = violations.get(table, 0) + 1
+    
+    if not violations:
+        print("[OK] Foreign keys verified")
+        return True
+    
+    for table, count in violations.items():
+        print(f"  [WARNING] {table}: {count} rows reference missing parent rows")
+    return False
+
+
+# INSERT statements keyed by (table, columns), built once per target shape
+_insert_sql_cache = {}
+
+
+def get_insert_sql(table_name, sqlite_columns):
+    """Return the (cached) INSERT OR REPLACE statement for a table"""
+    key = (table_name, tuple(sqlite_columns))
+    insert_sql = _insert_sql_cache.get(key)
+    if insert_sql is None:
+        placeholders = ', '.join(['?' for _ in sqlite_columns])
+        insert_sql = f"INSERT OR REPLACE INTO {table_name} ({', '.join(sqlite_columns)}) VALUES ({placeholders})"
+        _insert_sql_cache[key] = insert_sql
+    return insert_sql
+
+
+# Rows fetched per round trip from the server-side cursor
+STREAM_CHUNK_SIZE = 10000
+
+
+def dumps_json(value):
+    """Serialize a JSON/array value to compact text (orjson when installed)"""
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+
+def convert_value(value):
+    """Convert a single PostgreSQL value to a SQLite-compatible one (by Python type)"""
+    if value is None:
+        return None
+    if isinstance(value, (list, dict)):
+        # Convert arrays and JSON to text
+        return dumps_json(value)
+    if isinstance(value, bool):
+        # Convert boolean to integer
+        return 1 if value else 0
+    if isinstance(value, datetime):
+        # Convert datetime to ISO format string
+        return value.isoformat()
+    return value
+
+
+def _identity(value):
+    return value
+
+
+def _bool_to_int(value):
+    return None if value is None else int(value)
+
+
+def _to_json_text(value):
+    return None if value is None else dumps_json(value)
+
+
+def _to_isoformat(value):
+    return None if value is None else value.isoformat()
+
+
+# PostgreSQL type OIDs (pg_type.oid) -> converter
+PG_TYPE_CONVERTERS = {
+    16: _bool_to_int,       # bool
+    114: _to_json_text,     # json
+    3802: _to_json_text,    # jsonb
+    199: _to_json_text,     # json[]
+    3807: _to_json_text,    # jsonb[]
+    1000: _to_json_text,    # bool[]
+    1007: _to_json_text,    # int4[]
+    1016: _to_json_text,    # int8[]
+    1009: _to_json_text,    # text[]
+    1015: _to_json_text,    # varchar[]
+    1082: _to_isoformat,    # date
+    1114: _to_isoformat,    # timestamp
+    1184: _to_isoformat,    # timestamptz
+    20: _identity,          # int8
+    21: _identity,          # int2
+    23: _identity,          # int4
+    25: _identity,          # text
+    701: _identity,         # float8
+    1043: _identity,        # varchar
+}
+
+
+def column_converters(description):
+    """
+    Pick one converter per result column from the cursor description
+    
+    Columns of a type not listed in PG_TYPE_CONVERTERS fall back to
+    convert_value, which dispatches on the Python type of each value.
+    """
+    return [PG_TYPE_CONVERTERS.get(column.type_code, convert_value) for column in description]
+
+
+def convert_row(row, converters):
+    """
+    Convert a PostgreSQL row into a tuple of SQLite-compatible values
+    
+    Args:
+        row: Tuple row from PostgreSQL, in select order
+        converters: Per-column converters from column_converters()
+    """
+    return tuple(convert(value) for convert, value in zip(converters, row))
 
 
 def migrate_table(pg_cur, sqlite_conn, table_name, column_mapping):
     """
     Migrate a table from PostgreSQL to SQLite
     
+    Rows are streamed through a server-side cursor in chunks of
+    STREAM_CHUNK_SIZE, so memory stays bounded regardless of table size.
+    
     Args:
         pg_cur: PostgreSQL cursor
         sqlite_conn: SQLite connection
@@ -143,50 +296,34 @@ def migrate_table(pg_cur, sqlite_conn, table_name, column_mapping):
     pg_columns = list(column_mapping.keys())
     sqlite_columns = list(column_mapping.values())
     
-    # Fetch data from PostgreSQL
-    select_sql = f"SELECT {', '.join(pg_columns)} FROM {table_name}"
-    pg_cur.execute(select_sql)
-    rows = pg_cur.fetchall()
-    
-    if not rows:
-        print(f"  No data in {table_name}")
-        return
-    
     # Prepare insert statement for SQLite
-    placeholders = ', '.join(['?' for _ in sqlite_columns])
-    insert_sql = f"INSERT OR REPLACE INTO {table_name} ({', '.join(sqlite_columns)}) VALUES ({placeholders})"
+    insert_sql = get_insert_sql(table_name, sqlite_columns)
     
-    # Convert and insert data
     sqlite_cur = sqlite_conn.cursor()
-    converted_rows = []
+    migrated = 0
     
-    for row in rows:
-        converted_row = []
-        for pg_col, sqlite_col in column_mapping.items():
-            value = row[pg_col]
-            
-            # Convert special types
-            if value is None:
-                converted_row.append(None)
-            elif isinstance(value, (list, dict)):
-                # Convert arrays and JSON to text
-                converted_row.append(json.dumps(value))
-            elif isinstance(value, bool):
-                # Convert boolean to integer
-                converted_row.append(1 if value else 0)
-            elif isinstance(value, datetime):
-                # Convert datetime to ISO format string
-                converted_row.append(value.isoformat())
-            else:
-                converted_row.append(value)
+    # Named cursor = server-side cursor: PostgreSQL keeps the result set and
+    # hands it over chunk by chunk instead of sending everything at once.
+    # Plain tuple rows (columns in select order) skip building a dict per row.
+    select_sql = f"SELECT {', '.join(pg_columns)} FROM {table_name}"
+    with pg_cur.connection.cursor(name=f"mig_{table_name}", row_factory=tuple_row) as stream_cur:
+        stream_cur.itersize = STREAM_CHUNK_SIZE
+        stream_cur.execute(select_sql)
+        converters = column_converters(stream_cur.description)
         
-        converted_rows.append(tuple(converted_row))
+        while True:
+            chunk = stream_cur.fetchmany(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            # Batch insert (committed once by the caller after all tables are loaded)
+            sqlite_cur.executemany(insert_sql, (convert_row(row, converters) for row in chunk))
+            migrated += len(chunk)
     
-    # Batch insert
-    sqlite_cur.executemany(insert_sql, converted_rows)
-    sqlite_conn.commit()
+    if not migrated:
+        print(f"  No data in {table_name}")
+        return
     
-    print(f"  [OK] Migrated {len(converted_rows)} records")
+    print(f"  [OK] Migrated {migrated} records")
 
 
 def main():
@@ -196,7 +333,9 @@ def main():
     
     # Connect to SQLite
     print(f"\nConnecting to SQLite database: {SQLITE_DB}")
-    sqlite_conn = sqlite3.connect(SQLITE_DB)
+    # Autocommit mode: the migration manages its single transaction explicitly
+    sqlite_conn = sqlite3.connect(SQLITE_DB, isolation_level=None)
+    configure_bulk_load(sqlite_conn)
     
     # Create schema
     create_sqlite_schema(sqlite_conn)
@@ -208,6 +347,10 @@ def main():
             print("Starting data migration...")
             print("=" * 60)
             
+            # Load every table in one transaction: one commit instead of one
+            # per table, and a failure leaves the SQLite file untouched
+            sqlite_conn.execute("BEGIN")
+            
             # Migrate pieces (main table)
             migrate_table(pg_cur, sqlite_conn, 'pieces', {
                 'id': 'id',
@@ -292,10 +435,17 @@ def main():
                 'created_at': 'created_at'
             })
             
+            create_indexes(sqlite_conn)
+            check_foreign_keys(sqlite_conn)
+            sqlite_conn.execute("COMMIT")
+            sqlite_conn.execute("PRAGMA foreign_keys=ON")
+            
     except Exception as e:
         print(f"\n[ERROR] Migration failed: {e}")
         import traceback
         traceback.print_exc()
+        if sqlite_conn.in_transaction:
+            sqlite_conn.execute("ROLLBACK")
         sqlite_conn.close()
         return False
     
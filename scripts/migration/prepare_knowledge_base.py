@@ -1,111 +1,227 @@
 """
 Prepare the knowledge base by creating a FAISS vector store from the Pieces knowledge base.
 """
+import asyncio
 import json
+import mmap
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
 from dotenv import load_dotenv
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
 from langchain.docstore.document import Document
 
+# Add project root to path
+project_root = Path(__file__).parent.parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.embedding_cache import EmbeddingCache
+from src.vector_index import build_index, choose_index_factory, save_docstore, write_index
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 load_dotenv()
 
+# Must match the model used to embed queries in src/tools.py
+EMBEDDING_MODEL = "text-embedding-ada-002"
+EMBEDDING_BATCH_SIZE = 1000
+EMBEDDING_CONCURRENCY = 8
+
+# Below this many pieces, process start-up costs more than it saves
+PARALLEL_DOCS_MIN_PIECES = 500
+
 
 def load_pieces_data():
     """Load the Pieces knowledge base JSON file."""
+    if orjson is not None:
+        # Parse straight from a read-only mapping of the file instead of
+        # first copying it into a bytes object
+        with open("data/pieces_knowledge_base.json", "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                with memoryview(mm) as view:
+                    return orjson.loads(view)
     with open("data/pieces_knowledge_base.json", "r", encoding="utf-8") as f:
         return json.load(f)
 
 
-def create_documents_from_pieces(pieces_data):
-    """Convert Pieces data into Document objects for vector store."""
-    documents = []
+def format_action_doc(piece_name, action):
+    """Text of the document describing a single action."""
+    return (
+        f"Action: {action.get('displayName', '')}\n"
+        f"Piece: {piece_name}\n"
+        f"Description: {action.get('description', '')}\n"
+        f"Variable Name: {action.get('variableName', '')}\n"
+        f"Type: Action"
+    )
+
+
+def format_trigger_doc(piece_name, trigger):
+    """Text of the document describing a single trigger."""
+    return (
+        f"Trigger: {trigger.get('displayName', '')}\n"
+        f"Piece: {piece_name}\n"
+        f"Description: {trigger.get('description', '')}\n"
+        f"Variable Name: {trigger.get('variableName', '')}\n"
+        f"Type: Trigger"
+    )
+
+
+def build_docs_for_piece(piece):
+    """
+    Build the piece, action and trigger documents for a single piece.
     
-    pieces = pieces_data.get("pieces", [])
+    Returns ``(page_content, metadata)`` tuples rather than Document objects
+    so results are cheap to send back from worker processes.
+    """
+    # Every action/trigger metadata dict of this piece shares these objects
+    piece_name = sys.intern(piece.get("displayName", ""))
+    piece_slug = sys.intern(piece.get("slug", ""))
+    description = piece.get("description", "")
+    categories = ", ".join(piece.get("categories", ()))
     
-    for piece in pieces:
-        piece_name = piece.get("displayName", "")
-        piece_slug = piece.get("slug", "")
-        description = piece.get("description", "")
-        categories = ", ".join(piece.get("categories", []))
-        
-        # Create document for the piece itself
-        piece_doc = f"""
-Piece: {piece_name} ({piece_slug})
-Description: {description}
-Categories: {categories}
-Type: Integration/Piece
-"""
-        documents.append(Document(
-            page_content=piece_doc.strip(),
-            metadata={
-                "type": "piece",
-                "name": piece_name,
+    # Create document for the piece itself
+    docs = [(
+        f"Piece: {piece_name} ({piece_slug})\n"
+        f"Description: {description}\n"
+        f"Categories: {categories}\n"
+        f"Type: Integration/Piece",
+        {
+            "type": "piece",
+            "name": piece_name,
+            "slug": piece_slug
+        }
+    )]
+    
+    # Create documents for each action
+    docs.extend(
+        (
+            format_action_doc(piece_name, action),
+            {
+                "type": "action",
+                "piece": piece_name,
+                "action_name": action.get("displayName", ""),
                 "slug": piece_slug
             }
-        ))
-        
-        # Create documents for each action
-        for action in piece.get("actions", []):
-            action_name = action.get("displayName", "")
-            action_desc = action.get("description", "")
-            action_var = action.get("variableName", "")
-            
-            action_doc = f"""
-Action: {action_name}
-Piece: {piece_name}
-Description: {action_desc}
-Variable Name: {action_var}
-Type: Action
-"""
-            documents.append(Document(
-                page_content=action_doc.strip(),
-                metadata={
-                    "type": "action",
-                    "piece": piece_name,
-                    "action_name": action_name,
-                    "slug": piece_slug
-                }
-            ))
-        
-        # Create documents for each trigger
-        for trigger in piece.get("triggers", []):
-            trigger_name = trigger.get("displayName", "")
-            trigger_desc = trigger.get("description", "")
-            trigger_var = trigger.get("variableName", "")
-            
-            trigger_doc = f"""
-Trigger: {trigger_name}
-Piece: {piece_name}
-Description: {trigger_desc}
-Variable Name: {trigger_var}
-Type: Trigger
-"""
-            documents.append(Document(
-                page_content=trigger_doc.strip(),
-                metadata={
-                    "type": "trigger",
-                    "piece": piece_name,
-                    "trigger_name": trigger_name,
-                    "slug": piece_slug
-                }
-            ))
+        )
+        for action in piece.get("actions", ())
+    )
+    
+    # Create documents for each trigger
+    docs.extend(
+        (
+            format_trigger_doc(piece_name, trigger),
+            {
+                "type": "trigger",
+                "piece": piece_name,
+                "trigger_name": trigger.get("displayName", ""),
+                "slug": piece_slug
+            }
+        )
+        for trigger in piece.get("triggers", ())
+    )
+    
+    return docs
+
+
+def create_documents_from_pieces(pieces_data, workers=None):
+    """
+    Convert Pieces data into Document objects for vector store.
+    
+    Large catalogs are formatted across worker processes; results are kept
+    in piece order.
+    """
+    pieces = pieces_data.get("pieces", ())
+    
+    if len(pieces) >= PARALLEL_DOCS_MIN_PIECES and (workers or os.cpu_count() or 1) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(build_docs_for_piece, pieces, chunksize=64))
+    else:
+        results = [build_docs_for_piece(piece) for piece in pieces]
+    
+    # Size the list once and fill it by position instead of growing it
+    documents = [None] * sum(map(len, results))
+    position = 0
+    for piece_docs in results:
+        for page_content, metadata in piece_docs:
+            documents[position] = Document(page_content=page_content, metadata=metadata)
+            position += 1
     
     return documents
 
 
+async def embed_texts(texts, batch_size=EMBEDDING_BATCH_SIZE, concurrency=EMBEDDING_CONCURRENCY):
+    """
+    Embed texts with parallel batched requests to the OpenAI API.
+    
+    Texts are split into batches of ``batch_size`` and up to ``concurrency``
+    requests are in flight at once; vectors are returned in input order.
+    """
+    from openai import AsyncOpenAI
+    
+    client = AsyncOpenAI(max_retries=5)
+    semaphore = asyncio.Semaphore(concurrency)
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    
+    async def embed(batch):
+        async with semaphore:
+            response = await client.embeddings.create(model=EMBEDDING_MODEL, input=batch)
+            return [item.embedding for item in response.data]
+    
+    try:
+        results = await asyncio.gather(*(embed(batch) for batch in batches))
+    finally:
+        await client.close()
+    
+    return [vector for batch_vectors in results for vector in batch_vectors]
+
+
 def create_vector_store(documents):
     """Create and save FAISS vector store."""
     print(f"Creating vector store with {len(documents)} documents...")
     
-    embeddings = OpenAIEmbeddings()
-    vector_store = FAISS.from_documents(documents, embeddings)
+    texts = [doc.page_content for doc in documents]
+    metadatas = [doc.metadata for doc in documents]
+    
+    # Embed each distinct text once and share the vector between its copies
+    unique_positions = {}
+    positions = [unique_positions.setdefault(text, len(unique_positions)) for text in texts]
+    if len(unique_positions) < len(texts):
+        print(f"  {len(texts) - len(unique_positions)} duplicate documents will reuse embeddings")
+    unique_texts = list(unique_positions)
+    
+    # Only texts never embedded before (by content hash) go to the API
+    with EmbeddingCache(model=EMBEDDING_MODEL) as cache:
+        cached = cache.get_many(unique_texts)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        print(f"  Embedding cache: {len(unique_texts) - len(missing)} hits, {len(missing)} to embed")
+        
+        if missing:
+            missing_texts = [unique_texts[i] for i in missing]
+            new_vectors = asyncio.run(embed_texts(missing_texts))
+            cache.put_many(missing_texts, new_vectors)
+            for i, vector in zip(missing, new_vectors):
+                cached[i] = vector
+    
+    unique_vectors = np.asarray(cached, dtype=np.float32)
+    vectors = unique_vectors[positions]
+    
+    # Compressed index sized to the catalog (HNSW + SQ8, or OPQ/IVF/PQ once
+    # there are enough documents to train it) instead of a flat FP32 scan
+    factory = choose_index_factory(*vectors.shape)
+    index = build_index(vectors, factory)
     
     # Save to disk
-    vector_store.save_local("data/ap_faiss_index")
-    print("Vector store created and saved to 'data/ap_faiss_index'")
+    index_path = "data/ap_faiss_index"
+    write_index(index, index_path)
+    save_docstore(index_path, texts, metadatas)
+    print(f"Vector store ({factory}) created and saved to '{index_path}'")
     
-    return vector_store
+    return index
 
 
 def main():
@@ -3,16 +3,251 @@
 Generate FAISS vector store from SQLite database.
 This replaces the old prepare_knowledge_base.py that used JSON files.
 """
+import argparse
+import asyncio
 import os
+import random
 import sys
-import pickle
 from pathlib import Path
 
+import numpy as np
+
 # Add project root to path
 project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
-def main():
+try:
+    from langchain_core.embeddings import Embeddings
+except ImportError:
+    # main() reports missing langchain packages with install instructions
+    Embeddings = object
+
+# Vectors used to train the fp16 scalar quantizer (it only needs the value
+# range per dimension, so a small sample is enough)
+SQ_TRAINING_SAMPLE = 256
+
+# Attempts per embedding request on rate limits and transient API errors
+EMBEDDING_MAX_ATTEMPTS = 6
+RETRY_MAX_DELAY = 30
+
+
+def _retry_delay(error, attempt: int) -> float:
+    """Seconds to wait before retrying: the server's Retry-After, else jittered backoff."""
+    response = getattr(error, "response", None)
+    if response is not None:
+        headers = response.headers
+        try:
+            if "retry-after-ms" in headers:
+                return float(headers["retry-after-ms"]) / 1000
+            if "retry-after" in headers:
+                return float(headers["retry-after"])
+        except ValueError:
+            # Retry-After may also be an HTTP date; fall back to backoff
+            pass
+    return min(2 ** attempt, RETRY_MAX_DELAY) + random.uniform(0, 1)
+
+
+class CustomOpenAIEmbeddings(Embeddings):
+    """
+    OpenAI embeddings that send all batches concurrently.
+    
+    Texts are truncated to the model's token limit and packed into batches
+    of at most ``batch_size`` texts (and the per-request token budget); up
+    to ``concurrency`` requests are in flight at once, so wall time is roughly
+    ceil(batches / concurrency) round trips instead of one per batch. With
+    ``sort_by_length`` texts of similar length are batched together (results
+    are still returned in input order). With ``use_cache`` embeddings are
+    looked up by content hash in the shared embedding cache first, so only
+    new or changed texts are sent to the API.
+    """
+    
+    def __init__(self, api_key: str, model: str = "text-embedding-ada-002",
+                 batch_size: int = 100, concurrency: int = 16, sort_by_length: bool = True,
+                 use_cache: bool = True, cache_path: str = None):
+        self.api_key = api_key
+        self.model = model
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.sort_by_length = sort_by_length
+        self.use_cache = use_cache
+        self.cache_path = cache_path
+    
+    async def _aembed_documents(self, texts: list[str]) -> np.ndarray:
+        import openai
+        from openai import AsyncOpenAI
+        
+        from src.embedding_batches import pack_batches, truncate_to_token_limit
+        
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # Over-long texts are cut to the model's token limit, and batches are
+        # packed by token count as well as by number of texts
+        texts, token_counts = truncate_to_token_limit(texts, self.model)
+        batches = pack_batches(token_counts, max_items=self.batch_size)
+        out = None
+        
+        # Retries are handled here (honouring Retry-After) rather than by the SDK
+        async with AsyncOpenAI(api_key=self.api_key, max_retries=0) as client:
+            async def one_batch(batch_index, start, end):
+                nonlocal out
+                async with semaphore:
+                    # Small random delay so the first wave of requests does
+                    # not hit the rate limiter all at the same instant
+                    await asyncio.sleep(random.uniform(0, 0.05))
+                    for attempt in range(EMBEDDING_MAX_ATTEMPTS):
+                        try:
+                            response = await client.embeddings.create(input=texts[start:end], model=self.model)
+                            break
+                        except (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError) as e:
+                            if attempt == EMBEDDING_MAX_ATTEMPTS - 1:
+                                print(f"  Embedding batch {batch_index + 1} (texts {start}-{end - 1}) failed "
+                                      f"after {EMBEDDING_MAX_ATTEMPTS} attempts: {e}", file=sys.stderr)
+                                raise
+                            delay = _retry_delay(e, attempt)
+                            print(f"  Batch {batch_index + 1}: {type(e).__name__}, retrying in {delay:.1f}s...")
+                            await asyncio.sleep(delay)
+                        except openai.APIError as e:
+                            print(f"  Embedding batch {batch_index + 1} (texts {start}-{end - 1}) failed: {e}",
+                                  file=sys.stderr)
+                            raise
+                vectors = np.asarray([item.embedding for item in response.data], dtype=np.float32)
+                if out is None:
+                    # Dimension is only known once the first response arrives
+                    out = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+                out[start:end] = vectors
+            
+            await asyncio.gather(*(one_batch(i, start, end) for i, (start, end) in enumerate(batches)))
+        
+        return out
+    
+    def _embed_uncached(self, texts: list[str]) -> np.ndarray:
+        if not self.sort_by_length:
+            return asyncio.run(self._aembed_documents(texts))
+        
+        # Batch short pieces/actions/triggers together and long ones together,
+        # then scatter the embeddings back to their original positions
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        sorted_embeddings = asyncio.run(self._aembed_documents([texts[i] for i in order]))
+        
+        embeddings = np.empty_like(sorted_embeddings)
+        embeddings[order] = sorted_embeddings
+        return embeddings
+    
+    def embed_documents_ndarray(self, texts: list[str]) -> np.ndarray:
+        """
+        Embed a list of documents into an ``(n, d)`` float32 matrix.
+        
+        Embeddings of unchanged texts are reused from the cache; API results
+        are written straight into one preallocated array.
+        """
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        if not self.use_cache:
+            return self._embed_uncached(texts)
+        
+        from src.embedding_cache import EmbeddingCache
+        
+        with EmbeddingCache(model=self.model, path=self.cache_path) as cache:
+            cached = cache.get_many(texts)
+            missing = [i for i, vector in enumerate(cached) if vector is None]
+            print(f"  Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} to embed")
+            
+            new_embeddings = None
+            if missing:
+                missing_texts = [texts[i] for i in missing]
+                new_embeddings = self._embed_uncached(missing_texts)
+                cache.put_many(missing_texts, new_embeddings)
+        
+        if new_embeddings is not None:
+            dimension = new_embeddings.shape[1]
+        else:
+            dimension = len(cached[0])
+        
+        embeddings = np.empty((len(texts), dimension), dtype=np.float32)
+        for position, vector in enumerate(cached):
+            if vector is not None:
+                embeddings[position] = vector
+        if missing:
+            embeddings[missing] = new_embeddings
+        return embeddings
+    
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed a list of documents, reusing cached embeddings of unchanged texts."""
+        return self.embed_documents_ndarray(texts).tolist()
+    
+    def embed_query(self, text: str) -> list[float]:
+        """Embed a single query."""
+        return self._embed_uncached([text])[0].tolist()
+
+
+def _description(item):
+    return item.get('description', '') or 'No description available'
+
+
+def build_piece_rows(piece_details):
+    """Return (text, metadata) rows for a piece and each of its actions and triggers."""
+    piece_name = piece_details['name']
+    piece_display_name = piece_details['display_name']
+    actions = piece_details.get('actions', [])
+    triggers = piece_details.get('triggers', [])
+    
+    piece_text = f"Piece: {piece_display_name}. Name: {piece_name}. Description: {_description(piece_details)}. Authentication: {piece_details.get('auth_type', 'None')}. Categories: {', '.join(piece_details.get('categories', []))}. Actions: {len(actions)}. Triggers: {len(triggers)}"
+    
+    # The piece part of the action/trigger texts is the same for every item,
+    # so bake it into the templates once per piece (braces escaped for format)
+    piece_part = f". Piece: {piece_display_name}. Description: ".replace("{", "{{").replace("}", "}}")
+    action_text = ("Action: {}" + piece_part + "{}. Requires Auth: {}").format
+    trigger_text = ("Trigger: {}" + piece_part + "{}. Type: {}. Requires Auth: {}").format
+    
+    return [
+        (piece_text, {'type': 'piece', 'name': piece_name, 'display_name': piece_display_name}),
+        *(
+            (
+                action_text(action['display_name'], _description(action), action.get('requires_auth', False)),
+                {'type': 'action', 'piece': piece_name, 'action': action['name']}
+            )
+            for action in actions
+        ),
+        *(
+            (
+                trigger_text(
+                    trigger['display_name'], _description(trigger),
+                    trigger.get('trigger_type', 'Unknown'), trigger.get('requires_auth', False)
+                ),
+                {'type': 'trigger', 'piece': piece_name, 'trigger': trigger['name']}
+            )
+            for trigger in triggers
+        ),
+    ]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the FAISS vector store from the SQLite database.")
+    parser.add_argument(
+        "--embeddings", choices=("custom", "langchain"), default="custom",
+        help="custom: concurrent batched OpenAI calls (default); langchain: OpenAIEmbeddings"
+    )
+    parser.add_argument(
+        "--async-concurrency", type=int, default=16,
+        help="Maximum embedding requests in flight (custom embeddings only, default: 16)"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=100,
+        help="Texts per embedding request (default: 100)"
+    )
+    parser.add_argument(
+        "--sort-by-length", action=argparse.BooleanOptionalAction, default=True,
+        help="Batch texts of similar length together (custom embeddings only, default: on)"
+    )
+    parser.add_argument(
+        "--cache", action=argparse.BooleanOptionalAction, default=True,
+        help="Reuse embeddings of unchanged texts from data/embedding_cache.db (custom embeddings only, default: on)"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    
     print("\n" + "="*60)
     print("🔧 Creating FAISS Vector Store from SQLite Database")
     print("="*60 + "\n")
@@ -35,7 +270,6 @@ def main():
         from langchain.schema import Document
         from langchain_community.vectorstores import FAISS
         from langchain_community.docstore.in_memory import InMemoryDocstore
-        from langchain_openai import OpenAIEmbeddings
         print("✓ Required libraries imported")
     except ImportError as e:
         print(f"❌ ERROR: Missing required library: {e}")
@@ -45,6 +279,7 @@ def main():
     # Import database helper
     try:
         from src.activepieces_db import ActivepiecesDB
+        from src.vector_index import HNSW_EF_CONSTRUCTION, HNSW_EF_SEARCH, HNSW_M, save_docstore
         print("✓ Database helper imported")
     except ImportError as e:
         print(f"❌ ERROR: Could not import database helper: {e}")
@@ -53,67 +288,21 @@ def main():
     # Load data from SQLite database
     print("\n📊 Loading data from SQLite database...")
     
-    documents = []
-    
     try:
         with ActivepiecesDB() as db:
-            # Get all pieces
-            pieces = db.get_all_pieces()
+            # Load every piece with its actions and triggers in three queries
+            pieces = list(db.iter_all_details_bulk())
             print(f"✓ Loaded {len(pieces)} pieces")
             
-            # Create documents for each piece
-            for piece in pieces:
-                # Get full details for the piece
-                piece_details = db.get_piece_details(piece['name'])
-                if not piece_details:
-                    continue
-                
-                # Create main piece document
-                description = piece_details.get('description', '') or 'No description available'
-                piece_text = f"Piece: {piece_details['display_name']}. Name: {piece_details['name']}. Description: {description}. Authentication: {piece_details.get('auth_type', 'None')}. Categories: {', '.join(piece_details.get('categories', []))}. Actions: {len(piece_details.get('actions', []))}. Triggers: {len(piece_details.get('triggers', []))}"
-                
-                # Only add if content is valid
-                if piece_text and len(piece_text.strip()) > 10:
-                    documents.append(Document(
-                        page_content=piece_text,
-                        metadata={
-                            'type': 'piece',
-                            'name': piece_details['name'],
-                            'display_name': piece_details['display_name']
-                        }
-                    ))
-                
-                # Create documents for each action
-                for action in piece_details.get('actions', []):
-                    desc = action.get('description', '') or 'No description available'
-                    action_text = f"Action: {action['display_name']}. Piece: {piece_details['display_name']}. Description: {desc}. Requires Auth: {action.get('requires_auth', False)}"
-                    
-                    # Only add if content is valid
-                    if action_text and len(action_text.strip()) > 10:
-                        documents.append(Document(
-                            page_content=action_text,
-                            metadata={
-                                'type': 'action',
-                                'piece': piece_details['name'],
-                                'action': action['name']
-                            }
-                        ))
-                
-                # Create documents for each trigger
-                for trigger in piece_details.get('triggers', []):
-                    desc = trigger.get('description', '') or 'No description available'
-                    trigger_text = f"Trigger: {trigger['display_name']}. Piece: {piece_details['display_name']}. Description: {desc}. Type: {trigger.get('trigger_type', 'Unknown')}. Requires Auth: {trigger.get('requires_auth', False)}"
-                    
-                    # Only add if content is valid
-                    if trigger_text and len(trigger_text.strip()) > 10:
-                        documents.append(Document(
-                            page_content=trigger_text,
-                            metadata={
-                                'type': 'trigger',
-                                'piece': piece_details['name'],
-                                'trigger': trigger['name']
-                            }
-                        ))
+            # Create (text, metadata) rows for every piece, action and trigger
+            # (the templates always produce well over 10 characters, so no
+            # length filter is needed)
+            rows = [
+                row
+                for piece_details in pieces
+                for row in build_piece_rows(piece_details)
+            ]
+            documents = [Document(page_content=text, metadata=metadata) for text, metadata in rows]
             
             print(f"✓ Created {len(documents)} documents for vector store")
     
@@ -125,15 +314,27 @@ def main():
         print("❌ ERROR: No documents created")
         return
     
-    # Create embeddings using langchain's OpenAI embeddings
+    # Create embeddings (batches are embedded concurrently)
     print("\n🤖 Creating embeddings...")
     
     try:
-        embeddings = OpenAIEmbeddings(
-            openai_api_key=api_key,
-            model="text-embedding-ada-002"
-        )
-        print("✓ Embeddings model initialized")
+        if args.embeddings == "langchain":
+            from langchain_openai import OpenAIEmbeddings
+            embeddings = OpenAIEmbeddings(
+                openai_api_key=api_key,
+                model="text-embedding-ada-002",
+                chunk_size=args.batch_size
+            )
+        else:
+            embeddings = CustomOpenAIEmbeddings(
+                api_key=api_key,
+                model="text-embedding-ada-002",
+                batch_size=args.batch_size,
+                concurrency=args.async_concurrency,
+                sort_by_length=args.sort_by_length,
+                use_cache=args.cache
+            )
+        print(f"✓ Embeddings model initialized ({args.embeddings})")
     except Exception as e:
         print(f"❌ ERROR: Could not initialize embeddings: {e}")
         return
@@ -143,11 +344,38 @@ def main():
     print("⏳ This may take a few minutes (generating embeddings for all documents)...")
     
     try:
-        # Create vector store from documents
-        vector_store = FAISS.from_documents(
-            documents=documents,
-            embedding=embeddings
-        )
+        # Embed and index one wave of concurrent requests at a time, so only
+        # that wave's vectors are held in memory at any point
+        vector_store = None
+        chunk_size = args.batch_size * max(args.async_concurrency, 1)
+        
+        for start in range(0, len(documents), chunk_size):
+            chunk = documents[start:start + chunk_size]
+            texts = [doc.page_content for doc in chunk]
+            if isinstance(embeddings, CustomOpenAIEmbeddings):
+                vectors = embeddings.embed_documents_ndarray(texts)
+            else:
+                vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+            
+            if vector_store is None:
+                # HNSW graph over fp16 codes: logarithmic search instead of a
+                # brute-force scan, and half the bytes of float32 vectors
+                index = faiss.IndexHNSWSQ(vectors.shape[1], faiss.ScalarQuantizer.QT_fp16, HNSW_M)
+                index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+                index.hnsw.efSearch = HNSW_EF_SEARCH
+                index.train(vectors[:SQ_TRAINING_SAMPLE])
+                vector_store = FAISS(
+                    embedding_function=embeddings,
+                    index=index,
+                    docstore=InMemoryDocstore({}),
+                    index_to_docstore_id={}
+                )
+            vector_store.add_embeddings(
+                text_embeddings=list(zip(texts, vectors)),
+                metadatas=[doc.metadata for doc in chunk]
+            )
+            print(f"  Indexed {min(start + chunk_size, len(documents))}/{len(documents)} documents")
+        
         print(f"✓ FAISS vector store created with {len(documents)} documents")
     except Exception as e:
         print(f"❌ ERROR creating vector store: {e}")
@@ -164,17 +392,13 @@ def main():
         faiss.write_index(vector_store.index, str(output_dir / "index.faiss"))
         print(f"✓ Saved FAISS index to {output_dir / 'index.faiss'}")
         
-        # Save docstore and index mapping
-        docstore_dict = {}
-        for doc_id, doc in vector_store.docstore._dict.items():
-            docstore_dict[doc_id] = {
-                'page_content': doc.page_content,
-                'metadata': doc.metadata
-            }
-        
-        with open(output_dir / "index.pkl", "wb") as f:
-            pickle.dump((docstore_dict, vector_store.index_to_docstore_id), f)
-        print(f"✓ Saved document store to {output_dir / 'index.pkl'}")
+        # Save docstore (msgpack, plus the legacy pickle for older loaders)
+        save_docstore(
+            str(output_dir),
+            [doc.page_content for doc in documents],
+            [doc.metadata for doc in documents]
+        )
+        print(f"✓ Saved document store to {output_dir}")
         
     except Exception as e:
         print(f"❌ ERROR saving vector store: {e}")
@@ -3,22 +3,159 @@ Rebuild the FAISS vector store with COMPLETE information from SQLite database.
 This version includes actions/triggers WITH their properties (inputs) and descriptions.
 """
 import os
-import pickle
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
 from dotenv import load_dotenv
-from db_config import get_db_cursor, test_connection
-import faiss
+from db_config import get_db_cursor, test_connection, dict_from_row, parse_json_fields
+from embedding_batches import MAX_BATCH_ITEMS, count_tokens, pack_batches
+from embedding_cache import EmbeddingCache
+from env_utils import env_flag
+from vector_index import build_index, choose_index_factory, save_docstore, write_index
 
 load_dotenv()
 
+EMBEDDING_MODEL = "text-embedding-ada-002"
+# Concurrent embedding requests; tune against the account's tokens-per-minute limit
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "8"))
+EMBEDDING_MAX_RETRIES = 5
+
+DROPDOWN_TYPES = ('Dropdown', 'StaticDropdown', 'MultiSelectDropdown')
+# Property ids per IN (...) lookup, well under SQLite's bound-parameter limit
+OPTION_LOOKUP_CHUNK = 500
+OPTION_LOOKUP_SQL = f"""
+    SELECT property_id, option_label, option_value
+    FROM property_options
+    WHERE property_id IN ({", ".join("?" * OPTION_LOOKUP_CHUNK)})
+    ORDER BY property_id, id
+"""
+
+# Below this many pieces, process start-up costs more than it saves
+PARALLEL_DOCS_MIN_PIECES = 500
+
+
+def _group_with_properties(rows, extra_fields=()):
+    """
+    Fold flat (owner LEFT JOIN properties) rows into owner dicts keyed by piece_id.
+    
+    Rows must be ordered by owner so each owner's properties arrive contiguously.
+    Returns (owners_by_piece, props_by_id) where props_by_id lets dropdown options
+    be looked up and attached afterwards directly by property id.
+    """
+    owners_by_piece = {}
+    props_by_id = {}
+    current = None
+    
+    for row in rows:
+        if current is None or current['id'] != row['owner_id']:
+            current = {
+                'id': row['owner_id'],
+                'name': row['owner_name'],
+                'displayName': row['owner_display_name'],
+                'description': row['owner_description'] or '',
+            }
+            for field in extra_fields:
+                current[field] = row[field]
+            current['requires_auth'] = row['requires_auth']
+            current['metadata'] = row['owner_metadata']
+            current['properties'] = []
+            owners_by_piece.setdefault(row['piece_id'], []).append(current)
+        
+        if row['prop_id'] is None:
+            continue
+        
+        prop = {
+            'name': row['property_name'],
+            'displayName': row['prop_display_name'],
+            'description': row['prop_description'] or '',
+            'type': row['property_type'],
+            'required': row['required'],
+            'defaultValue': row['default_value'],
+            'options': []
+        }
+        current['properties'].append(prop)
+        props_by_id[row['prop_id']] = prop
+    
+    return owners_by_piece, props_by_id
+
+
+def _attach_options(cur, props_by_id):
+    """
+    Fetch options for every dropdown property in ``props_by_id`` and attach them.
+    
+    Uses the property ids already in hand with chunked ``IN (...)`` lookups,
+    so options are never re-resolved through the properties tables. Every
+    chunk binds exactly OPTION_LOOKUP_CHUNK parameters (the last one is padded
+    by repeating an id), so the statement text never changes and sqlite3
+    reuses the same prepared statement for all chunks.
+    """
+    dropdown_ids = [
+        prop_id for prop_id, prop in props_by_id.items()
+        if prop['type'] in DROPDOWN_TYPES
+    ]
+    
+    for start in range(0, len(dropdown_ids), OPTION_LOOKUP_CHUNK):
+        chunk = dropdown_ids[start:start + OPTION_LOOKUP_CHUNK]
+        chunk += chunk[-1:] * (OPTION_LOOKUP_CHUNK - len(chunk))
+        cur.execute(OPTION_LOOKUP_SQL, chunk)
+        for row in cur:
+            props_by_id[row['property_id']]['options'].append(
+                {'label': row['option_label'], 'value': row['option_value']}
+            )
+
 
 def fetch_complete_pieces_from_db():
-    """Fetch pieces with ALL details including action/trigger properties."""
-    pieces_data = []
+    """
+    Fetch pieces with ALL details including action/trigger properties.
     
+    Uses a fixed number of bulk queries (pieces, actions+properties,
+    triggers+properties and the dropdown options for each) and assembles the
+    nested structure in a single pass, instead of querying per piece/action/property.
+    Rows are consumed straight off the cursor rather than via fetchall().
+    """
     try:
         with get_db_cursor() as cur:
-            # Fetch all pieces
+            # Fetch all actions with their properties
+            cur.execute("""
+                SELECT 
+                    a.piece_id, a.id AS owner_id, a.name AS owner_name,
+                    a.display_name AS owner_display_name,
+                    a.description AS owner_description,
+                    a.requires_auth, a.metadata AS owner_metadata,
+                    p.id AS prop_id, p.property_name,
+                    p.display_name AS prop_display_name,
+                    p.description AS prop_description,
+                    p.property_type, p.required, p.default_value
+                FROM actions a
+                LEFT JOIN action_properties p ON p.action_id = a.id
+                ORDER BY a.piece_id, a.display_name, a.id, p.display_name
+            """)
+            actions_by_piece, action_props = _group_with_properties(cur)
+            
+            # Fetch all triggers with their properties
+            cur.execute("""
+                SELECT 
+                    t.piece_id, t.id AS owner_id, t.name AS owner_name,
+                    t.display_name AS owner_display_name,
+                    t.description AS owner_description,
+                    t.trigger_type, t.requires_auth, t.metadata AS owner_metadata,
+                    p.id AS prop_id, p.property_name,
+                    p.display_name AS prop_display_name,
+                    p.description AS prop_description,
+                    p.property_type, p.required, p.default_value
+                FROM triggers t
+                LEFT JOIN trigger_properties p ON p.trigger_id = t.id
+                ORDER BY t.piece_id, t.display_name, t.id, p.display_name
+            """)
+            triggers_by_piece, trigger_props = _group_with_properties(
+                cur, extra_fields=('trigger_type',)
+            )
+            
+            # Get options for all dropdown properties with bulk IN lookups
+            _attach_options(cur, action_props)
+            _attach_options(cur, trigger_props)
+            
+            # Stream pieces and attach their actions/triggers
             cur.execute("""
                 SELECT 
                     id, name, display_name, description, 
@@ -26,150 +163,24 @@ def fetch_complete_pieces_from_db():
                 FROM pieces
                 ORDER BY display_name
             """)
-            pieces = cur.fetchall()
-            
-            print(f"Found {len(pieces)} pieces in database")
-            
-            for piece in pieces:
+            pieces_data = []
+            for piece in cur:
                 piece_id = piece['id']
-                
-                # Fetch actions with their properties
-                cur.execute("""
-                    SELECT 
-                        a.id, a.name, a.display_name, a.description, 
-                        a.requires_auth, a.metadata
-                    FROM actions a
-                    WHERE a.piece_id = ?
-                    ORDER BY a.display_name
-                """, (piece_id,))
-                actions = cur.fetchall()
-                
-                # For each action, get its properties
-                actions_with_props = []
-                for action in actions:
-                    cur.execute("""
-                        SELECT 
-                            property_name, display_name, description,
-                            property_type, required, default_value, metadata
-                        FROM action_properties
-                        WHERE action_id = ?
-                        ORDER BY display_name
-                    """, (action['id'],))
-                    properties = cur.fetchall()
-                    
-                    # Get options for dropdown properties if any
-                    for prop in properties:
-                        if prop['property_type'] in ['Dropdown', 'StaticDropdown', 'MultiSelectDropdown']:
-                        cur.execute("""
-                            SELECT option_label, option_value
-                            FROM property_options
-                            WHERE property_id = (
-                                SELECT id FROM action_properties 
-                                WHERE action_id = ? AND property_name = ?
-                            )
-                        """, (action['id'], prop['property_name']))
-                            options = cur.fetchall()
-                            prop['options'] = [
-                                {'label': opt['option_label'], 'value': opt['option_value']}
-                                for opt in options
-                            ]
-                    
-                    actions_with_props.append({
-                        'id': action['id'],
-                        'name': action['name'],
-                        'displayName': action['display_name'],
-                        'description': action['description'] or '',
-                        'requires_auth': action['requires_auth'],
-                        'metadata': action['metadata'],
-                        'properties': [
-                            {
-                                'name': p['property_name'],
-                                'displayName': p['display_name'],
-                                'description': p['description'] or '',
-                                'type': p['property_type'],
-                                'required': p['required'],
-                                'defaultValue': p['default_value'],
-                                'options': p.get('options', [])
-                            }
-                            for p in properties
-                        ]
-                    })
-                
-                # Fetch triggers with their properties
-                cur.execute("""
-                    SELECT 
-                        t.id, t.name, t.display_name, t.description, 
-                        t.trigger_type, t.requires_auth, t.metadata
-                    FROM triggers t
-                    WHERE t.piece_id = ?
-                    ORDER BY t.display_name
-                """, (piece_id,))
-                triggers = cur.fetchall()
-                
-                # For each trigger, get its properties
-                triggers_with_props = []
-                for trigger in triggers:
-                    cur.execute("""
-                        SELECT 
-                            property_name, display_name, description,
-                            property_type, required, default_value, metadata
-                        FROM trigger_properties
-                        WHERE trigger_id = ?
-                        ORDER BY display_name
-                    """, (trigger['id'],))
-                    properties = cur.fetchall()
-                    
-                    # Get options for dropdown properties if any
-                    for prop in properties:
-                        if prop['property_type'] in ['Dropdown', 'StaticDropdown', 'MultiSelectDropdown']:
-                        cur.execute("""
-                            SELECT option_label, option_value
-                            FROM property_options
-                            WHERE property_id = (
-                                SELECT id FROM trigger_properties 
-                                WHERE trigger_id = ? AND property_name = ?
-                            )
-                        """, (trigger['id'], prop['property_name']))
-                            options = cur.fetchall()
-                            prop['options'] = [
-                                {'label': opt['option_label'], 'value': opt['option_value']}
-                                for opt in options
-                            ]
-                    
-                    triggers_with_props.append({
-                        'id': trigger['id'],
-                        'name': trigger['name'],
-                        'displayName': trigger['display_name'],
-                        'description': trigger['description'] or '',
-                        'trigger_type': trigger['trigger_type'],
-                        'requires_auth': trigger['requires_auth'],
-                        'metadata': trigger['metadata'],
-                        'properties': [
-                            {
-                                'name': p['property_name'],
-                                'displayName': p['display_name'],
-                                'description': p['description'] or '',
-                                'type': p['property_type'],
-                                'required': p['required'],
-                                'defaultValue': p['default_value'],
-                                'options': p.get('options', [])
-                            }
-                            for p in properties
-                        ]
-                    })
-                
+                piece_info = parse_json_fields(dict_from_row(piece), ['categories'])
                 pieces_data.append({
-                    'id': piece['id'],
+                    'id': piece_id,
                     'name': piece['name'],
                     'displayName': piece['display_name'],
                     'description': piece['description'] or '',
-                    'categories': piece['categories'] or [],
+                    'categories': piece_info['categories'] or [],
                     'auth_type': piece['auth_type'],
                     'version': piece['version'],
-                    'actions': actions_with_props,
-                    'triggers': triggers_with_props
+                    'actions': actions_by_piece.get(piece_id, []),
+                    'triggers': triggers_by_piece.get(piece_id, [])
                 })
             
+            print(f"Found {len(pieces_data)} pieces in database")
+            
             return pieces_data
             
     except Exception as e:
@@ -177,209 +188,350 @@ def fetch_complete_pieces_from_db():
         raise
 
 
-def create_rich_documents(pieces_data):
-    """Convert pieces into rich text documents with ALL details."""
+def _format_properties(properties, heading):
+    """Render a property list as one text block (empty string when there are none)."""
+    if not properties:
+        return ""
+    
+    parts = ["\n\n", heading]
+    append = parts.append
+    for prop in properties:
+        prop_get = prop.get
+        prop_desc = prop_get("description", "")
+        prop_default = prop_get("defaultValue", "")
+        
+        append("\n  - ")
+        append(prop_get("displayName", ""))
+        append(" (")
+        append(prop_get("type", ""))
+        append(", Required)" if prop_get("required") else ", Optional)")
+        if prop_desc:
+            append("\n    Description: ")
+            append(prop_desc)
+        if prop_default:
+            append(f"\n    Default: {prop_default}")
+        
+        # Add options if it's a dropdown
+        options = prop_get("options", [])
+        if options:
+            append("\n    Options: ")
+            append(", ".join([opt['label'] for opt in options[:10]]))
+            if len(options) > 10:
+                append(f" ...and {len(options) - 10} more")
+    
+    return "".join(parts)
+
+
+class DocumentMetadata:
+    """
+    Document metadata stored column-wise (one list per field).
+    
+    Avoids a dict per document while building; rows are turned back into the
+    usual per-document dicts only when iterated (e.g. when the docstore is saved).
+    """
+    
+    FIELDS_BY_TYPE = {
+        "piece": ("type", "name", "slug", "categories"),
+        "action": ("type", "piece", "action_name", "slug", "requires_auth", "num_properties"),
+        "trigger": ("type", "piece", "trigger_name", "slug", "trigger_type",
+                    "requires_auth", "num_properties"),
+    }
+    FIELDS = tuple(dict.fromkeys(f for fields in FIELDS_BY_TYPE.values() for f in fields))
+    
+    def __init__(self):
+        self.columns = {field: [] for field in self.FIELDS}
+    
+    def add(self, **fields):
+        for field, column in self.columns.items():
+            column.append(fields.get(field))
+    
+    def extend(self, other):
+        for field, column in self.columns.items():
+            column.extend(other.columns[field])
+    
+    def __len__(self):
+        return len(self.columns["type"])
+    
+    def __getitem__(self, position):
+        columns = self.columns
+        doc_type = columns["type"][position]
+        return {field: columns[field][position] for field in self.FIELDS_BY_TYPE[doc_type]}
+    
+    def __iter__(self):
+        return (self[position] for position in range(len(self)))
+
+
+def _build_docs_for_piece(piece):
+    """
+    Build the piece, action and trigger documents for a single piece.
+    
+    Module-level so it can run in worker processes. Returns
+    (documents, metadata, num_properties).
+    """
     documents = []
-    metadata_list = []
+    metadata = DocumentMetadata()
+    add_document = documents.append
+    add_metadata = metadata.add
     
     total_properties = 0
     
-    for piece in pieces_data:
-        piece_name = piece.get("displayName", "")
-        piece_slug = piece.get("name", "")
-        description = piece.get("description", "")
-        categories = ", ".join(piece.get("categories", []))
-        auth_type = piece.get("auth_type", "")
-        
-        # Create document for the piece itself
-        piece_doc = f"""Piece: {piece_name} ({piece_slug})
-Description: {description}
-Categories: {categories}
-Authentication: {auth_type}
-Type: Integration/Piece"""
-        
-        documents.append(piece_doc)
-        metadata_list.append({
-            "type": "piece",
-            "name": piece_name,
-            "slug": piece_slug,
-            "categories": categories
-        })
+    piece_get = piece.get
+    piece_name = piece_get("displayName", "")
+    piece_slug = piece_get("name", "")
+    categories = ", ".join(piece_get("categories", []))
+    
+    # Create document for the piece itself
+    add_document("\n".join([
+        f"Piece: {piece_name} ({piece_slug})",
+        f"Description: {piece_get('description', '')}",
+        f"Categories: {categories}",
+        f"Authentication: {piece_get('auth_type', '')}",
+        "Type: Integration/Piece",
+    ]))
+    add_metadata(
+        type="piece",
+        name=piece_name,
+        slug=piece_slug,
+        categories=categories
+    )
+    
+    # Create RICH documents for each action with properties
+    for action in piece_get("actions", []):
+        action_get = action.get
+        action_name = action_get("displayName", "")
+        requires_auth = action_get("requires_auth", False)
+        properties = action_get("properties", [])
+        total_properties += len(properties)
         
-        # Create RICH documents for each action with properties
-        for action in piece.get("actions", []):
-            action_name = action.get("displayName", "")
-            action_desc = action.get("description", "")
-            action_var = action.get("name", "")
-            requires_auth = action.get("requires_auth", False)
-            properties = action.get("properties", [])
-            
-            # Build detailed property information
-            property_details = []
-            if properties:
-                property_details.append("\n\nINPUT PROPERTIES:")
-                for prop in properties:
-                    prop_name = prop.get("displayName", "")
-                    prop_desc = prop.get("description", "")
-                    prop_type = prop.get("type", "")
-                    prop_required = "Required" if prop.get("required") else "Optional"
-                    prop_default = prop.get("defaultValue", "")
-                    
-                    prop_detail = f"\n  - {prop_name} ({prop_type}, {prop_required})"
-                    if prop_desc:
-                        prop_detail += f"\n    Description: {prop_desc}"
-                    if prop_default:
-                        prop_detail += f"\n    Default: {prop_default}"
-                    
-                    # Add options if it's a dropdown
-                    options = prop.get("options", [])
-                    if options:
-                        prop_detail += "\n    Options: " + ", ".join([opt['label'] for opt in options[:10]])
-                        if len(options) > 10:
-                            prop_detail += f" ...and {len(options) - 10} more"
-                    
-                    property_details.append(prop_detail)
-                    total_properties += 1
-            
-            action_doc = f"""Action: {action_name}
-Piece: {piece_name}
-Description: {action_desc}
-Variable Name: {action_var}
-Requires Authentication: {requires_auth}
-Type: Action{''.join(property_details)}"""
-            
-            documents.append(action_doc)
-            metadata_list.append({
-                "type": "action",
-                "piece": piece_name,
-                "action_name": action_name,
-                "slug": piece_slug,
-                "requires_auth": requires_auth,
-                "num_properties": len(properties)
-            })
+        add_document("\n".join([
+            f"Action: {action_name}",
+            f"Piece: {piece_name}",
+            f"Description: {action_get('description', '')}",
+            f"Variable Name: {action_get('name', '')}",
+            f"Requires Authentication: {requires_auth}",
+            "Type: Action" + _format_properties(properties, "INPUT PROPERTIES:"),
+        ]))
+        add_metadata(
+            type="action",
+            piece=piece_name,
+            action_name=action_name,
+            slug=piece_slug,
+            requires_auth=requires_auth,
+            num_properties=len(properties)
+        )
+    
+    # Create RICH documents for each trigger with properties
+    for trigger in piece_get("triggers", []):
+        trigger_get = trigger.get
+        trigger_name = trigger_get("displayName", "")
+        trigger_type = trigger_get("trigger_type", "")
+        requires_auth = trigger_get("requires_auth", False)
+        properties = trigger_get("properties", [])
+        total_properties += len(properties)
         
-        # Create RICH documents for each trigger with properties
-        for trigger in piece.get("triggers", []):
-            trigger_name = trigger.get("displayName", "")
-            trigger_desc = trigger.get("description", "")
-            trigger_var = trigger.get("name", "")
-            trigger_type = trigger.get("trigger_type", "")
-            requires_auth = trigger.get("requires_auth", False)
-            properties = trigger.get("properties", [])
-            
-            # Build detailed property information
-            property_details = []
-            if properties:
-                property_details.append("\n\nCONFIGURATION PROPERTIES:")
-                for prop in properties:
-                    prop_name = prop.get("displayName", "")
-                    prop_desc = prop.get("description", "")
-                    prop_type = prop.get("type", "")
-                    prop_required = "Required" if prop.get("required") else "Optional"
-                    prop_default = prop.get("defaultValue", "")
-                    
-                    prop_detail = f"\n  - {prop_name} ({prop_type}, {prop_required})"
-                    if prop_desc:
-                        prop_detail += f"\n    Description: {prop_desc}"
-                    if prop_default:
-                        prop_detail += f"\n    Default: {prop_default}"
-                    
-                    # Add options if it's a dropdown
-                    options = prop.get("options", [])
-                    if options:
-                        prop_detail += "\n    Options: " + ", ".join([opt['label'] for opt in options[:10]])
-                        if len(options) > 10:
-                            prop_detail += f" ...and {len(options) - 10} more"
-                    
-                    property_details.append(prop_detail)
-                    total_properties += 1
-            
-            trigger_doc = f"""Trigger: {trigger_name}
-Piece: {piece_name}
-Description: {trigger_desc}
-Variable Name: {trigger_var}
-Trigger Type: {trigger_type}
-Requires Authentication: {requires_auth}
-Type: Trigger{''.join(property_details)}"""
-            
-            documents.append(trigger_doc)
-            metadata_list.append({
-                "type": "trigger",
-                "piece": piece_name,
-                "trigger_name": trigger_name,
-                "slug": piece_slug,
-                "trigger_type": trigger_type,
-                "requires_auth": requires_auth,
-                "num_properties": len(properties)
-            })
+        add_document("\n".join([
+            f"Trigger: {trigger_name}",
+            f"Piece: {piece_name}",
+            f"Description: {trigger_get('description', '')}",
+            f"Variable Name: {trigger_get('name', '')}",
+            f"Trigger Type: {trigger_type}",
+            f"Requires Authentication: {requires_auth}",
+            "Type: Trigger" + _format_properties(properties, "CONFIGURATION PROPERTIES:"),
+        ]))
+        add_metadata(
+            type="trigger",
+            piece=piece_name,
+            trigger_name=trigger_name,
+            slug=piece_slug,
+            trigger_type=trigger_type,
+            requires_auth=requires_auth,
+            num_properties=len(properties)
+        )
+    
+    return documents, metadata, total_properties
+
+
+def create_rich_documents(pieces_data, workers=None):
+    """
+    Convert pieces into rich text documents with ALL details.
+    
+    Large catalogs are formatted across worker processes (one task per piece,
+    results kept in piece order so documents and metadata stay aligned).
+    """
+    documents = []
+    metadata_list = DocumentMetadata()
+    total_properties = 0
+    
+    if len(pieces_data) >= PARALLEL_DOCS_MIN_PIECES and (workers or os.cpu_count() or 1) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_build_docs_for_piece, pieces_data, chunksize=16))
+    else:
+        results = map(_build_docs_for_piece, pieces_data)
+    
+    for piece_documents, piece_metadata, piece_properties in results:
+        documents.extend(piece_documents)
+        metadata_list.extend(piece_metadata)
+        total_properties += piece_properties
     
     print(f"   [OK] Included {total_properties} total properties (inputs) in documents")
     return documents, metadata_list
 
 
-def get_embeddings_with_openai(texts, api_key, batch_size=100):
-    """Get embeddings using OpenAI API directly."""
+_async_client = None
+_async_client_loop = None
+
+
+def _get_async_client(api_key):
+    """
+    Return the shared AsyncOpenAI client for the running event loop.
+    
+    One client (and its keep-alive connection pool) serves every batch; it is
+    only recreated if called from a different event loop.
+    """
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client_loop is not loop:
+        import openai
+        import httpx
+        
+        _async_client = openai.AsyncOpenAI(
+            api_key=api_key,
+            http_client=openai.DefaultAsyncHttpxClient(
+                limits=httpx.Limits(max_connections=64, max_keepalive_connections=32)
+            )
+        )
+        _async_client_loop = loop
+    return _async_client
+
+
+async def _embed_texts(texts, api_key, batch_size, concurrency):
+    """
+    Embed ``texts`` with the OpenAI API.
+    
+    Texts are packed into token-aware batches (at most ``batch_size`` inputs
+    and MAX_BATCH_TOKENS tokens per request). Batches are sent concurrently
+    (bounded by ``concurrency``) and placed back by index, so the result order
+    always matches ``texts``. Results are written straight into one
+    preallocated float32 matrix.
+    """
     import openai
-    from openai import _base_client
     
-    # Monkey patch to fix proxies parameter issue with older openai versions
-    original_init = _base_client.SyncHttpxClientWrapper.__init__
+    client = _get_async_client(api_key)
+    semaphore = asyncio.Semaphore(concurrency)
+    token_counts = count_tokens(texts, EMBEDDING_MODEL)
+    batches = pack_batches(token_counts, max_items=batch_size)
+    out = None
+    
+    print(f"  Getting embeddings for {len(texts)} documents "
+          f"({sum(token_counts)} tokens, {len(batches)} batches, {concurrency} concurrent)...")
+    
+    async def embed(batch_index, start, end):
+        nonlocal out
+        async with semaphore:
+            for attempt in range(EMBEDDING_MAX_RETRIES):
+                try:
+                    response = await client.embeddings.create(
+                        model=EMBEDDING_MODEL,
+                        input=texts[start:end]
+                    )
+                    break
+                except openai.RateLimitError as e:
+                    if attempt == EMBEDDING_MAX_RETRIES - 1:
+                        print(f"  Error getting embeddings for batch {batch_index + 1}: {e}")
+                        raise
+                    delay = 2 ** attempt
+                    print(f"  Rate limited on batch {batch_index + 1}, retrying in {delay}s...")
+                    await asyncio.sleep(delay)
+                except Exception as e:
+                    print(f"  Error getting embeddings for batch {batch_index + 1}: {e}")
+                    raise
+            
+            vectors = [item.embedding for item in response.data]
+            if out is None:
+                # Dimension is only known once the first response arrives
+                out = np.empty((len(texts), len(vectors[0])), dtype=np.float32)
+            out[start:end] = vectors
+            print(f"  Processed batch {batch_index + 1}/{len(batches)}")
+    
+    await asyncio.gather(*(
+        embed(i, start, end) for i, (start, end) in enumerate(batches)
+    ))
     
-    def patched_init(self, **kwargs):
-        kwargs.pop('proxies', None)
-        original_init(self, **kwargs)
+    return out
+
+
+async def get_embeddings_with_openai(texts, api_key, batch_size=MAX_BATCH_ITEMS,
+                                     concurrency=EMBEDDING_CONCURRENCY, use_cache=True):
+    """
+    Get embeddings using OpenAI API directly.
     
-    _base_client.SyncHttpxClientWrapper.__init__ = patched_init
+    Identical texts are embedded once and the vector is shared by every copy.
+    With ``use_cache`` enabled, embeddings are looked up by content hash first
+    and only texts that were never embedded before are sent to the API.
+    """
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
     
-    client = openai.OpenAI(api_key=api_key)
-    all_embeddings = []
+    unique_texts = list(dict.fromkeys(texts))
+    if len(unique_texts) < len(texts):
+        print(f"  {len(texts) - len(unique_texts)} duplicate documents will reuse embeddings")
+        positions = {text: i for i, text in enumerate(unique_texts)}
+        unique_embeddings = await get_embeddings_with_openai(
+            unique_texts, api_key, batch_size, concurrency, use_cache
+        )
+        return unique_embeddings[[positions[text] for text in texts]]
     
-    print(f"Getting embeddings for {len(texts)} documents...")
+    if not use_cache:
+        return await _embed_texts(texts, api_key, batch_size, concurrency)
     
-    for i in range(0, len(texts), batch_size):
-        batch = texts[i:i+batch_size]
-        print(f"  Processing batch {i//batch_size + 1}/{(len(texts)-1)//batch_size + 1}...")
+    new_embeddings = None
+    with EmbeddingCache(model=EMBEDDING_MODEL) as cache:
+        cached = cache.get_many(texts)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        print(f"  Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} to embed")
         
-        try:
-            response = client.embeddings.create(
-                model="text-embedding-ada-002",
-                input=batch
-            )
-            
-            embeddings = [item.embedding for item in response.data]
-            all_embeddings.extend(embeddings)
-            
-        except Exception as e:
-            print(f"  Error getting embeddings for batch: {e}")
-            raise
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            new_embeddings = await _embed_texts(missing_texts, api_key, batch_size, concurrency)
+            cache.put_many(missing_texts, new_embeddings)
     
-    return np.array(all_embeddings, dtype=np.float32)
+    if new_embeddings is not None:
+        dimension = new_embeddings.shape[1]
+    else:
+        dimension = len(cached[0])
+    
+    out = np.empty((len(texts), dimension), dtype=np.float32)
+    for i, vector in enumerate(cached):
+        if vector is not None:
+            out[i] = vector
+    if missing:
+        out[missing] = new_embeddings
+    return out
 
 
-def create_faiss_index(embeddings, metadata_list, texts, index_path="ap_faiss_index"):
-    """Create and save FAISS index."""
-    dimension = embeddings.shape[1]
-    
-    # Create FAISS index
-    index = faiss.IndexFlatL2(dimension)
-    index.add(embeddings)
+def create_faiss_index(embeddings, metadata_list, texts, index_path="ap_faiss_index", factory=None):
+    """
+    Create and save FAISS index.
     
-    # Save index
-    os.makedirs(index_path, exist_ok=True)
-    faiss.write_index(index, os.path.join(index_path, "index.faiss"))
+    The index type follows the catalog size (HNSW for small catalogs,
+    OPQ+IVF+PQ for large ones) unless ``factory`` is given explicitly.
+    """
+    dimension = embeddings.shape[1]
+    factory = factory or choose_index_factory(len(embeddings), dimension)
     
-    # Save metadata and texts in langchain format
-    docstore = {
-        str(i): {"page_content": texts[i], "metadata": metadata_list[i]}
-        for i in range(len(texts))
-    }
+    # Create FAISS index (trained IVF/PQ skeletons are kept in index_path and
+    # reused on later rebuilds; set FAISS_RETRAIN=1 to train from scratch)
+    retrain = env_flag("FAISS_RETRAIN", False)
+    index = build_index(embeddings, factory, trained_index_dir=index_path, retrain=retrain)
     
-    index_to_docstore_id = {i: str(i) for i in range(len(texts))}
+    # Save index (exact Flat indexes go to a compressed side-car when bloscpack is installed)
+    index_file = write_index(index, index_path)
     
-    with open(os.path.join(index_path, "index.pkl"), "wb") as f:
-        pickle.dump((docstore, index_to_docstore_id), f)
+    # Save metadata and texts (msgpack + legacy langchain-style pickle)
+    save_docstore(index_path, texts, metadata_list)
     
     print(f"[OK] FAISS index created and saved to '{index_path}'")
+    print(f"   - Index type: {factory} ({os.path.basename(index_file)})")
     print(f"   - Index dimension: {dimension}")
     print(f"   - Number of vectors: {index.ntotal}")
 
@@ -435,12 +587,13 @@ def main():
     
     # Get embeddings
     print("\n4. Getting embeddings from OpenAI...")
-    embeddings = get_embeddings_with_openai(texts, api_key)
+    embeddings = asyncio.run(get_embeddings_with_openai(texts, api_key))
     print(f"   [OK] Got {len(embeddings)} embeddings")
     
     # Create and save FAISS index
     print("\n5. Creating FAISS index...")
-    create_faiss_index(embeddings, metadata, texts)
+    create_faiss_index(embeddings, metadata, texts, factory=os.getenv("FAISS_INDEX_FACTORY"))
+    del embeddings
     
     print("\n" + "=" * 60)
     print("[SUCCESS] ENHANCED FAISS INDEX REBUILD COMPLETE!")
@@ -12,12 +12,48 @@ import faiss
 load_dotenv()
 
 def fetch_all_pieces_from_db():
-    """Fetch all pieces with their actions and triggers from SQLite database."""
+    """
+    Fetch all pieces with their actions and triggers from SQLite database.
+    
+    Rows are consumed straight off the cursor (no fetchall), so only the
+    assembled piece dicts are held in memory rather than rows + dicts.
+    """
     pieces_data = []
     
     try:
         with get_db_cursor() as cur:
-            # Fetch all pieces
+            # Fetch all actions, grouped by piece
+            cur.execute("""
+                SELECT piece_id, display_name, name, description, requires_auth
+                FROM actions
+                ORDER BY piece_id, display_name
+            """)
+            actions_by_piece = {}
+            for a in cur:
+                actions_by_piece.setdefault(a['piece_id'], []).append({
+                    'displayName': a['display_name'],
+                    'name': a['name'],
+                    'description': a['description'] or '',
+                    'requires_auth': a['requires_auth']
+                })
+            
+            # Fetch all triggers, grouped by piece
+            cur.execute("""
+                SELECT piece_id, display_name, name, description, trigger_type, requires_auth
+                FROM triggers
+                ORDER BY piece_id, display_name
+            """)
+            triggers_by_piece = {}
+            for t in cur:
+                triggers_by_piece.setdefault(t['piece_id'], []).append({
+                    'displayName': t['display_name'],
+                    'name': t['name'],
+                    'description': t['description'] or '',
+                    'trigger_type': t['trigger_type'],
+                    'requires_auth': t['requires_auth']
+                })
+            
+            # Stream pieces and attach their actions/triggers
             cur.execute("""
                 SELECT 
                     id, name, display_name, description, 
@@ -25,31 +61,8 @@ def fetch_all_pieces_from_db():
                 FROM pieces
                 ORDER BY display_name
             """)
-            pieces = cur.fetchall()
-            
-            print(f"Found {len(pieces)} pieces in database")
-            
-            for piece in pieces:
+            for piece in cur:
                 piece_id = piece['id']
-                
-                # Fetch actions for this piece
-                cur.execute("""
-                    SELECT display_name, name, description, requires_auth
-                    FROM actions
-                    WHERE piece_id = ?
-                    ORDER BY display_name
-                """, (piece_id,))
-                actions = cur.fetchall()
-                
-                # Fetch triggers for this piece
-                cur.execute("""
-                    SELECT display_name, name, description, trigger_type, requires_auth
-                    FROM triggers
-                    WHERE piece_id = ?
-                    ORDER BY display_name
-                """, (piece_id,))
-                triggers = cur.fetchall()
-                
                 pieces_data.append({
                     'id': piece['id'],
                     'name': piece['name'],
@@ -58,27 +71,12 @@ def fetch_all_pieces_from_db():
                     'categories': piece['categories'] or [],
                     'auth_type': piece['auth_type'],
                     'version': piece['version'],
-                    'actions': [
-                        {
-                            'displayName': a['display_name'],
-                            'name': a['name'],
-                            'description': a['description'] or '',
-                            'requires_auth': a['requires_auth']
-                        }
-                        for a in actions
-                    ],
-                    'triggers': [
-                        {
-                            'displayName': t['display_name'],
-                            'name': t['name'],
-                            'description': t['description'] or '',
-                            'trigger_type': t['trigger_type'],
-                            'requires_auth': t['requires_auth']
-                        }
-                        for t in triggers
-                    ]
+                    'actions': actions_by_piece.pop(piece_id, []),
+                    'triggers': triggers_by_piece.pop(piece_id, [])
                 })
             
+            print(f"Found {len(pieces_data)} pieces in database")
+            
             return pieces_data
             
     except Exception as e:
@@ -90,25 +88,24 @@ def create_text_documents(pieces_data):
     """Convert database pieces into text documents and metadata."""
     documents = []
     metadata_list = []
+    add_document = documents.append
+    add_metadata = metadata_list.append
     
     for piece in pieces_data:
-        piece_name = piece.get("displayName", "")
-        piece_slug = piece.get("name", "")
-        description = piece.get("description", "")
-        categories = ", ".join(piece.get("categories", []))
-        auth_type = piece.get("auth_type", "")
+        piece_get = piece.get
+        piece_name = piece_get("displayName", "")
+        piece_slug = piece_get("name", "")
+        categories = ", ".join(piece_get("categories", []))
         
         # Create document for the piece itself
-        piece_doc = f"""
-Piece: {piece_name} ({piece_slug})
-Description: {description}
-Categories: {categories}
-Authentication: {auth_type}
-Type: Integration/Piece
-""".strip()
-        
-        documents.append(piece_doc)
-        metadata_list.append({
+        add_document("\n".join([
+            f"Piece: {piece_name} ({piece_slug})",
+            f"Description: {piece_get('description', '')}",
+            f"Categories: {categories}",
+            f"Authentication: {piece_get('auth_type', '')}",
+            "Type: Integration/Piece",
+        ]))
+        add_metadata({
             "type": "piece",
             "name": piece_name,
             "slug": piece_slug,
@@ -116,23 +113,20 @@ Type: Integration/Piece
         })
         
         # Create documents for each action
-        for action in piece.get("actions", []):
-            action_name = action.get("displayName", "")
-            action_desc = action.get("description", "")
-            action_var = action.get("name", "")
-            requires_auth = action.get("requires_auth", False)
+        for action in piece_get("actions", []):
+            action_get = action.get
+            action_name = action_get("displayName", "")
+            requires_auth = action_get("requires_auth", False)
             
-            action_doc = f"""
-Action: {action_name}
-Piece: {piece_name}
-Description: {action_desc}
-Variable Name: {action_var}
-Requires Authentication: {requires_auth}
-Type: Action
-""".strip()
-            
-            documents.append(action_doc)
-            metadata_list.append({
+            add_document("\n".join([
+                f"Action: {action_name}",
+                f"Piece: {piece_name}",
+                f"Description: {action_get('description', '')}",
+                f"Variable Name: {action_get('name', '')}",
+                f"Requires Authentication: {requires_auth}",
+                "Type: Action",
+            ]))
+            add_metadata({
                 "type": "action",
                 "piece": piece_name,
                 "action_name": action_name,
@@ -141,25 +135,22 @@ Type: Action
             })
         
         # Create documents for each trigger
-        for trigger in piece.get("triggers", []):
-            trigger_name = trigger.get("displayName", "")
-            trigger_desc = trigger.get("description", "")
-            trigger_var = trigger.get("name", "")
-            trigger_type = trigger.get("trigger_type", "")
-            requires_auth = trigger.get("requires_auth", False)
-            
-            trigger_doc = f"""
-Trigger: {trigger_name}
-Piece: {piece_name}
-Description: {trigger_desc}
-Variable Name: {trigger_var}
-Trigger Type: {trigger_type}
-Requires Authentication: {requires_auth}
-Type: Trigger
-""".strip()
+        for trigger in piece_get("triggers", []):
+            trigger_get = trigger.get
+            trigger_name = trigger_get("displayName", "")
+            trigger_type = trigger_get("trigger_type", "")
+            requires_auth = trigger_get("requires_auth", False)
             
-            documents.append(trigger_doc)
-            metadata_list.append({
+            add_document("\n".join([
+                f"Trigger: {trigger_name}",
+                f"Piece: {piece_name}",
+                f"Description: {trigger_get('description', '')}",
+                f"Variable Name: {trigger_get('name', '')}",
+                f"Trigger Type: {trigger_type}",
+                f"Requires Authentication: {requires_auth}",
+                "Type: Trigger",
+            ]))
+            add_metadata({
                 "type": "trigger",
                 "piece": piece_name,
                 "trigger_name": trigger_name,
@@ -171,22 +162,28 @@ Type: Trigger
     return documents, metadata_list
 
 
+_client = None
+
+
+def _get_client(api_key):
+    """Return the shared OpenAI client (keep-alive connections reused across batches)."""
+    global _client
+    if _client is None:
+        import openai
+        import httpx
+        
+        _client = openai.OpenAI(
+            api_key=api_key,
+            http_client=openai.DefaultHttpxClient(
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=32)
+            )
+        )
+    return _client
+
+
 def get_embeddings_with_openai(texts, api_key, batch_size=100):
     """Get embeddings using OpenAI API directly."""
-    import openai
-    from openai import _base_client
-    
-    # Monkey patch to fix proxies parameter issue with older openai versions
-    original_init = _base_client.SyncHttpxClientWrapper.__init__
-    
-    def patched_init(self, **kwargs):
-        # Remove unsupported 'proxies' argument if present
-        kwargs.pop('proxies', None)
-        original_init(self, **kwargs)
-    
-    _base_client.SyncHttpxClientWrapper.__init__ = patched_init
-    
-    client = openai.OpenAI(api_key=api_key)
+    client = _get_client(api_key)
     all_embeddings = []
     
     print(f"Getting embeddings for {len(texts)} documents...")
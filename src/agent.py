@@ -1,14 +1,30 @@
 """
 Agent setup with tools and memory.
+
+LangChain and the modules that pull it in are imported where they are first
+needed, so importing this module (and starting the API) stays cheap;
+``preload_agent_modules`` imports them ahead of the first request.
 """
-from typing import Optional, Dict
+from __future__ import annotations
+
+from collections import OrderedDict
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Optional, List, Tuple
+import hashlib
 import logging
+import os
+import time
 from threading import Lock
-from langchain.agents import AgentExecutor, create_tool_calling_agent
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from src.llm_config import get_llm
-from src.memory import create_memory
-from src.tools import get_all_tools
+
+from src.env_utils import env_flag
+
+if TYPE_CHECKING:
+    from langchain.agents import AgentExecutor
+    from langchain_core.messages import SystemMessage
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain.agents.agent import RunnableMultiActionAgent
+    from langchain_core.tools import BaseTool
 
 
 # System prompt for DIRECT agent (without planning layer) - Optimized for speed
@@ -52,17 +68,17 @@ IMPORTANT GUIDELINES FOR PROVIDING COMPLETE INFORMATION:
 CODE GENERATION FORMATTING:
 - When generating TypeScript code, ALWAYS wrap it in markdown code blocks:
   ```typescript
-  export const code = async (inputs: {{...}}) => {{
+  export const code = async (inputs: {...}) => {
     // code here
-  }}
+  }
   ```
 - When returning JSON (like code responses), wrap in json code blocks:
   ```json
-  {{
+  {
     "code": "...",
     "inputs": [...],
     "title": "..."
-  }}
+  }
   ```
 - Use appropriate language tags: typescript, json, javascript, python, etc.
 - This ensures code displays properly with syntax highlighting in the UI
@@ -75,6 +91,10 @@ Remember: You have access to a comprehensive database with:
 
 Be efficient, direct, and helpful. Quality answers within 1-3 tool calls are better than perfect answers that take 10+ calls."""
 
+# Stable version tag for the system prompt; changes only when the prompt text
+# does, so provider-side prompt caches stay valid across deploys
+PROMPT_VERSION = hashlib.sha256(DIRECT_SYSTEM_PROMPT.encode("utf-8")).hexdigest()[:12]
+
 
 # Module-level logger for consistent timing output across environments
 logger = logging.getLogger("flow_assistant.agent")
@@ -86,9 +106,26 @@ logger.setLevel(logging.INFO)
 logger.propagate = False
 
 
-# Simple cache for reusing agent executors (reduces per-request setup overhead)
-_AGENT_CACHE: Dict[str, AgentExecutor] = {}
+# LangChain's verbose mode prints every step to stdout, which is slow under
+# load and in container logs; enable it with FLOW_VERBOSE=1 when debugging
+AGENT_VERBOSE = env_flag("FLOW_VERBOSE", False)
+
+# Tool-call steps kept in the agent scratchpad; older steps (and their tool
+# outputs) are left out of the prompt. 0 keeps every step.
+AGENT_SCRATCHPAD_STEPS = int(os.getenv("AGENT_SCRATCHPAD_STEPS", "5"))
+
+# Bounded LRU cache for reusing agent executors (reduces per-request setup
+# overhead). Entries idle for longer than the TTL are rebuilt on next use.
+# Session history is read from the session log, so an executor holds no
+# messages of its own except for the anonymous (no session ID) one.
+AGENT_EXECUTOR_CACHE_SIZE = int(os.getenv("AGENT_EXECUTOR_CACHE_SIZE", "512"))
+AGENT_EXECUTOR_CACHE_TTL_SECONDS = float(os.getenv("AGENT_EXECUTOR_CACHE_TTL_SECONDS", "1800"))
+
+# key -> (executor, last used as time.monotonic())
+_AGENT_CACHE: "OrderedDict[str, Tuple[AgentExecutor, float]]" = OrderedDict()
 _AGENT_CACHE_LOCK = Lock()
+# key -> Future of an executor being built by another request
+_PENDING_BUILDS: Dict[str, Future] = {}
 _DEFAULT_SESSION_KEY = "__default__"
 
 
@@ -97,10 +134,107 @@ def _make_cache_key(session_id: Optional[str]) -> str:
     return session_id or _DEFAULT_SESSION_KEY
 
 
+def _make_executor_key(session_id: Optional[str], enable_web_search: bool) -> str:
+    # Include web search state in cache key to avoid tool mismatches
+    return f"{_make_cache_key(session_id)}_ws_{enable_web_search}"
+
+
+def _build_system_message() -> SystemMessage:
+    """
+    Build the system prompt as a fixed message rather than a template.
+
+    The content is byte-identical on every call, so it forms a cacheable
+    prefix: OpenAI caches it automatically (grouped by ``prompt_cache_key``)
+    and for Anthropic it is marked with an ephemeral ``cache_control`` block.
+    """
+    from langchain_core.messages import SystemMessage
+
+    if os.getenv("MODEL_PROVIDER", "openai").lower() == "anthropic":
+        return SystemMessage(content=[
+            {"type": "text", "text": DIRECT_SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}
+        ])
+    return SystemMessage(content=DIRECT_SYSTEM_PROMPT)
+
+
+@lru_cache(maxsize=1)
+def _cached_llm():
+    """The chat model shared by every agent."""
+    from src.llm_config import get_llm
+
+    return get_llm(prompt_cache_key=f"flow-assistant-direct-{PROMPT_VERSION}")
+
+
+@lru_cache(maxsize=2)
+def _cached_tools(enable_web_search: bool = False) -> Tuple[BaseTool, ...]:
+    """The agent's tools, with or without web search."""
+    from src.tools import get_all_tools
+
+    return tuple(get_all_tools(enable_web_search=enable_web_search))
+
+
+@lru_cache(maxsize=1)
+def _cached_direct_prompt() -> ChatPromptTemplate:
+    """The direct agent's prompt template (fixed system prompt + history)."""
+    from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+    return ChatPromptTemplate.from_messages([
+        _build_system_message(),
+        MessagesPlaceholder(variable_name="chat_history"),
+        ("human", "{input}"),
+        MessagesPlaceholder(variable_name="agent_scratchpad"),
+    ])
+
+
+@lru_cache(maxsize=2)
+def _cached_direct_agent(enable_web_search: bool = False) -> RunnableMultiActionAgent:
+    """
+    The tool-calling agent; stateless, so every session shares it.
+
+    The runnable is wrapped here, once, rather than by AgentExecutor's
+    validator, which would resolve its output type and wrap it again for
+    every session.
+    """
+    from langchain.agents import create_tool_calling_agent
+    from langchain.agents.agent import RunnableMultiActionAgent
+
+    runnable = create_tool_calling_agent(
+        llm=_cached_llm(),
+        tools=list(_cached_tools(enable_web_search)),
+        prompt=_cached_direct_prompt()
+    )
+    return RunnableMultiActionAgent(runnable=runnable, stream_runnable=True)
+
+
+def _trim_scratchpad(intermediate_steps: list) -> list:
+    """
+    Keep the last ``AGENT_SCRATCHPAD_STEPS`` steps of the scratchpad.
+
+    Parallel tool calls from one model turn are separate steps sharing that
+    turn's ``message_log``; the cut is moved back so such a group is kept
+    whole, since providers reject a tool-call message whose calls are not
+    all answered.
+    """
+    if AGENT_SCRATCHPAD_STEPS <= 0 or len(intermediate_steps) <= AGENT_SCRATCHPAD_STEPS:
+        return intermediate_steps
+
+    start = len(intermediate_steps) - AGENT_SCRATCHPAD_STEPS
+    message_log = getattr(intermediate_steps[start][0], "message_log", None)
+    while (
+        start > 0
+        and message_log
+        and getattr(intermediate_steps[start - 1][0], "message_log", None) == message_log
+    ):
+        start -= 1
+    return intermediate_steps[start:]
+
+
 def create_direct_agent(session_id: Optional[str] = None, enable_web_search: bool = False) -> AgentExecutor:
     """
     Create a DIRECT agent instance optimized for speed.
 
+    Only the memory is session-specific; the LLM, tools, prompt and
+    tool-calling agent are built once and shared by every session.
+
     Args:
         session_id: Optional session ID to load conversation history
         enable_web_search: Whether to include web search tool
@@ -108,47 +242,118 @@ def create_direct_agent(session_id: Optional[str] = None, enable_web_search: boo
     Returns:
         AgentExecutor configured for fast execution
     """
-    llm = get_llm()
-    memory = create_memory(session_id=session_id)
-    tools = get_all_tools(enable_web_search=enable_web_search)
-
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", DIRECT_SYSTEM_PROMPT),
-        MessagesPlaceholder(variable_name="chat_history"),
-        ("human", "{input}"),
-        MessagesPlaceholder(variable_name="agent_scratchpad"),
-    ])
+    from langchain.agents import AgentExecutor
+    from src.memory import create_memory
 
-    agent = create_tool_calling_agent(
-        llm=llm,
-        tools=tools,
-        prompt=prompt
-    )
+    memory = create_memory(session_id=session_id)
 
     agent_executor = AgentExecutor(
-        agent=agent,
-        tools=tools,
+        agent=_cached_direct_agent(enable_web_search),
+        tools=_cached_tools(enable_web_search),
         memory=memory,
-        verbose=True,
+        verbose=AGENT_VERBOSE,
         handle_parsing_errors=True,
         max_iterations=60,
         max_execution_time=120,
-        return_intermediate_steps=False
+        trim_intermediate_steps=_trim_scratchpad
     )
 
     return agent_executor
 
 
+def preload_agent_modules() -> None:
+    """Import LangChain and the agent's dependencies ahead of the first request."""
+    import langchain.agents  # noqa: F401
+    import langchain_core.prompts  # noqa: F401
+    import src.llm_config  # noqa: F401
+    import src.memory  # noqa: F401
+    import src.tools  # noqa: F401
+
+
+def warmup(ping: bool = False) -> None:
+    """
+    Build everything the first request would otherwise build in-line.
+
+    Imports the agent's modules, constructs the shared LLM, tools and
+    tool-calling agents (with and without web search), the anonymous
+    session's executors and the documentation vector store. With ``ping``
+    a tiny request is also sent, so the HTTP connection and TLS
+    handshake to the provider are already up. Failures are logged, never
+    raised: the first real request simply builds what is missing.
+    """
+    started = time.perf_counter()
+    try:
+        preload_agent_modules()
+        for enable_web_search in (False, True):
+            get_agent(session_id=None, enable_web_search=enable_web_search)
+
+        from src.tools import get_vector_store
+        get_vector_store()
+
+        if ping:
+            _cached_llm().invoke("Reply with OK.")
+    except Exception as e:
+        logger.warning(f"Agent warmup incomplete: {e}")
+        return
+    logger.info(f"Agent warmup finished in {time.perf_counter() - started:.2f}s")
+
+
+def _release_executor(executor: AgentExecutor) -> None:
+    try:
+        executor.memory.clear()
+    except Exception:
+        pass
+
+
 def get_agent(session_id: Optional[str] = None, enable_web_search: bool = False) -> AgentExecutor:
     """Get or create an agent executor with session-scoped memory."""
-    # Include web search state in cache key to avoid tool mismatches
-    cache_key = f"{_make_cache_key(session_id)}_ws_{enable_web_search}"
+    cache_key = _make_executor_key(session_id, enable_web_search)
+    evicted: List[AgentExecutor] = []
 
+    # The lock only guards the cache bookkeeping; executors are built outside
+    # it, and concurrent requests for the same key wait on one shared build
+    with _AGENT_CACHE_LOCK:
+        entry = _AGENT_CACHE.get(cache_key)
+        if entry is not None and time.monotonic() - entry[1] < AGENT_EXECUTOR_CACHE_TTL_SECONDS:
+            _AGENT_CACHE[cache_key] = (entry[0], time.monotonic())
+            _AGENT_CACHE.move_to_end(cache_key)
+            return entry[0]
+
+        if entry is not None:
+            del _AGENT_CACHE[cache_key]
+            evicted.append(entry[0])
+
+        pending = _PENDING_BUILDS.get(cache_key)
+        is_builder = pending is None
+        if is_builder:
+            pending = _PENDING_BUILDS[cache_key] = Future()
+
+    for executor in evicted:
+        _release_executor(executor)
+
+    if not is_builder:
+        return pending.result()
+
+    try:
+        agent_executor = create_direct_agent(session_id=session_id, enable_web_search=enable_web_search)
+    except BaseException as e:
+        with _AGENT_CACHE_LOCK:
+            _PENDING_BUILDS.pop(cache_key, None)
+        pending.set_exception(e)
+        raise
+
+    evicted = []
     with _AGENT_CACHE_LOCK:
-        agent_executor = _AGENT_CACHE.get(cache_key)
-        if agent_executor is None:
-            agent_executor = create_direct_agent(session_id=session_id, enable_web_search=enable_web_search)
-            _AGENT_CACHE[cache_key] = agent_executor
+        _PENDING_BUILDS.pop(cache_key, None)
+        _AGENT_CACHE[cache_key] = (agent_executor, time.monotonic())
+        _AGENT_CACHE.move_to_end(cache_key)
+        while len(_AGENT_CACHE) > AGENT_EXECUTOR_CACHE_SIZE:
+            _, (oldest, _) = _AGENT_CACHE.popitem(last=False)
+            evicted.append(oldest)
+    pending.set_result(agent_executor)
+
+    for executor in evicted:
+        _release_executor(executor)
 
     return agent_executor
 
@@ -157,18 +362,18 @@ def clear_agent_cache(session_id: Optional[str] = None) -> None:
     """Clear cached agents to release memory or refresh state."""
     with _AGENT_CACHE_LOCK:
         if session_id is None:
-            for executor in _AGENT_CACHE.values():
-                try:
-                    executor.memory.clear()
-                except Exception:
-                    pass
+            removed = [executor for executor, _ in _AGENT_CACHE.values()]
             _AGENT_CACHE.clear()
-            return
-
-        cache_key = _make_cache_key(session_id)
-        executor = _AGENT_CACHE.pop(cache_key, None)
-        if executor is not None:
-            try:
-                executor.memory.clear()
-            except Exception:
-                pass
+        else:
+            removed = [
+                entry[0]
+                for entry in (
+                    _AGENT_CACHE.pop(_make_executor_key(session_id, enable_web_search), None)
+                    for enable_web_search in (False, True)
+                )
+                if entry is not None
+            ]
+
+    for executor in removed:
+        _release_executor(executor)
+
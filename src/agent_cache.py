@@ -0,0 +1,223 @@
+"""Semantic cache for agent replies.
+
+Questions about the fixed ActivePieces catalog repeat a lot across users
+("what inputs does Gmail send email need?"), and each one otherwise pays for a
+full tool-calling agent run. Replies to first-turn questions (no earlier
+history, so the answer does not depend on the conversation) are kept in
+memory and served again for the same normalized question, or for a
+near-duplicate whose query embedding has cosine similarity of at least
+``AGENT_CACHE_SIMILARITY`` with a cached one. A near-duplicate must also
+name the same catalog pieces: "send a Slack message" and "send a Discord
+message" embed almost identically but need different answers. Questions that
+mention dates or relative time ("today", "latest", ...) are never cached.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from threading import Lock
+from typing import Callable, FrozenSet, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.env_utils import env_flag
+from src.query_utils import normalize_query
+
+
+CACHE_ENABLED = env_flag("AGENT_RESPONSE_CACHE", True)
+SIMILARITY_THRESHOLD = float(os.getenv("AGENT_CACHE_SIMILARITY", "0.95"))
+MAX_ENTRIES = int(os.getenv("AGENT_CACHE_MAX_ENTRIES", "1024"))
+TTL_SECONDS = int(os.getenv("AGENT_CACHE_TTL_SECONDS", "86400"))
+
+# Relative time words and literal dates/times make an answer time-dependent
+_VOLATILE_RE = re.compile(
+    r"\b(?:now|today|tonight|tomorrow|yesterday|currently|current|latest|recent|recently"
+    r"|this (?:week|month|year)|\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}|\d{1,2}:\d{2})\b",
+    re.IGNORECASE,
+)
+
+# AgentExecutor's fallback output when it hits max_iterations/max_execution_time
+_INCOMPLETE_REPLY_PREFIX = "Agent stopped"
+
+
+def is_cacheable(query: str) -> bool:
+    """Return False for empty or time-dependent questions."""
+    return bool(normalize_query(query)) and not _VOLATILE_RE.search(query)
+
+
+def piece_name_matcher(names: Iterable[str]) -> Callable[[str], FrozenSet[str]]:
+    """Build a function returning the (lowercased) ``names`` a text mentions."""
+    alternatives = sorted({name.strip() for name in names if name and name.strip()}, key=len, reverse=True)
+    if not alternatives:
+        return lambda text: frozenset()
+    pattern = re.compile(
+        r"(?<!\w)(?:" + "|".join(re.escape(name) for name in alternatives) + r")(?!\w)",
+        re.IGNORECASE,
+    )
+    return lambda text: frozenset(match.lower() for match in pattern.findall(text))
+
+
+@lru_cache(maxsize=1)
+def _catalog_piece_matcher() -> Callable[[str], FrozenSet[str]]:
+    # Errors propagate, so lru_cache does not keep a failed load
+    from src.db_config import get_db_cursor
+
+    with get_db_cursor() as cur:
+        cur.execute("SELECT display_name FROM pieces")
+        return piece_name_matcher(row["display_name"] for row in cur.fetchall())
+
+
+def _default_piece_names(text: str) -> Optional[FrozenSet[str]]:
+    """Catalog pieces named in ``text``; ``None`` if the catalog is unreadable."""
+    try:
+        return _catalog_piece_matcher()(text)
+    except Exception as e:
+        print(f"[WARNING] Response cache could not load piece names: {e}")
+        return None
+
+
+def _default_embed(text: str) -> Sequence[float]:
+    """Embed with the same model the documentation search uses."""
+    from src.tools import get_vector_store
+
+    return get_vector_store().embedding_function.embed_query(text)
+
+
+class AgentResponseCache:
+    """
+    In-process ``(namespace, question) -> reply`` cache with semantic lookup.
+
+    Exact matches on the normalized question are free; otherwise the question
+    is embedded once (the vector is reused by ``put``) and compared against
+    the cached questions in the same namespace that name the same pieces
+    (per ``piece_names_fn``; ``None`` from it disables the semantic lookup
+    for that question). Entries expire after
+    ``ttl`` seconds and the least recently used are evicted beyond
+    ``max_entries``.
+    """
+
+    def __init__(
+        self,
+        embed_fn: Optional[Callable[[str], Sequence[float]]] = None,
+        threshold: float = SIMILARITY_THRESHOLD,
+        max_entries: int = MAX_ENTRIES,
+        ttl: float = TTL_SECONDS,
+        piece_names_fn: Optional[Callable[[str], Optional[FrozenSet[str]]]] = None,
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._embed_fn = embed_fn or _default_embed
+        self._embed_normalized = lru_cache(maxsize=256)(self._embed_uncached)
+        self._piece_names = piece_names_fn or _default_piece_names
+        # (namespace, lowercased question) -> (reply, vector, created at, piece names)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, Optional[np.ndarray], float, Optional[FrozenSet[str]]]]" = OrderedDict()
+        self._lock = Lock()
+
+    def _embed_uncached(self, normalized: str) -> Optional[np.ndarray]:
+        try:
+            vector = np.asarray(self._embed_fn(normalized), dtype=np.float32)
+        except Exception as e:
+            # Semantic matching is best effort; exact matches still work
+            print(f"[WARNING] Response cache could not embed query: {e}")
+            return None
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else None
+
+    def _is_fresh(self, created_at: float) -> bool:
+        return time.time() - created_at < self.ttl
+
+    def get(self, query: str, namespace: str = "") -> Optional[str]:
+        """Return the cached reply for ``query`` (or a near-duplicate), if any."""
+        normalized = normalize_query(query)
+        key = (namespace, normalized.lower())
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._is_fresh(entry[2]):
+                self._entries.move_to_end(key)
+                return entry[0]
+
+        if self.threshold > 1:
+            return None
+        pieces = self._piece_names(normalized)
+        if pieces is None:
+            return None
+        vector = self._embed_normalized(normalized)
+        if vector is None:
+            return None
+
+        with self._lock:
+            candidates = [
+                (candidate_key, entry)
+                for candidate_key, entry in self._entries.items()
+                if candidate_key[0] == namespace
+                and entry[3] == pieces
+                and entry[1] is not None
+                and entry[1].shape == vector.shape
+                and self._is_fresh(entry[2])
+            ]
+            if not candidates:
+                return None
+
+            similarities = np.stack([entry[1] for _, entry in candidates]) @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                return None
+
+            best_key, best_entry = candidates[best]
+            self._entries.move_to_end(best_key)
+            return best_entry[0]
+
+    def put(self, query: str, reply: str, namespace: str = "") -> None:
+        """Store ``reply`` for ``query``."""
+        normalized = normalize_query(query)
+        key = (namespace, normalized.lower())
+        vector = pieces = None
+        if self.threshold <= 1:
+            vector = self._embed_normalized(normalized)
+            pieces = self._piece_names(normalized)
+
+        with self._lock:
+            self._entries[key] = (reply, vector, time.time(), pieces)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_response_cache: Optional[AgentResponseCache] = None
+_response_cache_lock = Lock()
+
+
+def get_response_cache() -> AgentResponseCache:
+    """Return the process-wide response cache."""
+    global _response_cache
+    if _response_cache is None:
+        with _response_cache_lock:
+            if _response_cache is None:
+                _response_cache = AgentResponseCache()
+    return _response_cache
+
+
+def get_cached_reply(query: str, namespace: str = "") -> Optional[str]:
+    """Look up a cached reply; ``None`` when disabled, uncacheable or missing."""
+    if not CACHE_ENABLED or not is_cacheable(query):
+        return None
+    return get_response_cache().get(query, namespace)
+
+
+def cache_reply(query: str, reply: str, namespace: str = "") -> None:
+    """Remember ``reply`` for ``query`` unless caching is disabled or unsafe."""
+    if not CACHE_ENABLED or not reply or not is_cacheable(query):
+        return
+    if reply.startswith(_INCOMPLETE_REPLY_PREFIX):
+        return
+    get_response_cache().put(query, reply, namespace)
@@ -4,71 +4,181 @@ Database configuration for SQLite connection to Activepieces pieces database.
 Migrated from PostgreSQL to SQLite for easier deployment.
 Original PostgreSQL config backed up in db_config_postgresql_backup.py
 """
+import atexit
 import os
 import sqlite3
+import threading
 from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
 from typing import Optional
 import json
 
+try:
+    from src.env_utils import env_flag
+except ImportError:
+    # Migration scripts put src/ itself on the path and import db_config directly
+    from env_utils import env_flag
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # SQLite database file path (updated to use new activepieces-pieces.db structure)
 DB_FILE = os.getenv('SQLITE_DB_FILE', 'data/activepieces.db')
+# The assistant only reads the catalog; read-only connections skip the
+# write-lock bookkeeping and can never modify the file by accident
+DB_READ_ONLY = env_flag("SQLITE_READ_ONLY", True)
+# Only safe when nothing rewrites the file while the server runs: SQLite then
+# skips file locking and change detection entirely
+DB_IMMUTABLE = env_flag("SQLITE_IMMUTABLE", False)
+
+
+# One persistent connection per thread; opening a connection and re-running
+# the PRAGMAs on every query was measurable overhead on the tool-call path
+_local = threading.local()
+# (owning thread, connection) for every persistent connection
+_connections = []
+_connections_lock = threading.Lock()
+
+# (cursor.description, column names) of the last statement dict_row saw
+_last_columns = (None, ())
+
+
+def dict_row(cursor, row) -> dict:
+    """
+    Row factory returning plain dicts.
+
+    Cheaper than sqlite3.Row followed by dict_from_row; the column names are
+    only worked out once per statement, since every row of a statement gets
+    the same description tuple.
+    """
+    global _last_columns
+    description = cursor.description
+    last = _last_columns
+    if last[0] is not description:
+        last = _last_columns = (description, tuple(column[0] for column in description))
+    return dict(zip(last[1], row))
+
+
+def _connect():
+    if not DB_READ_ONLY:
+        return sqlite3.connect(DB_FILE, check_same_thread=False)
+    uri = Path(DB_FILE).resolve().as_uri() + "?mode=ro"
+    if DB_IMMUTABLE:
+        uri += "&immutable=1"
+    return sqlite3.connect(uri, uri=True, check_same_thread=False)
 
 
 def get_connection():
     """
-    Get a SQLite database connection.
-    Returns a connection with Row factory for dict-like access.
+    Get a new SQLite database connection.
+    Returns a connection whose rows are plain dicts; read-only unless
+    SQLITE_READ_ONLY is turned off.
     """
     try:
-        conn = sqlite3.connect(DB_FILE, check_same_thread=False)
-        # Enable dict-like row access
-        conn.row_factory = sqlite3.Row
+        conn = _connect()
+        # Return rows as dicts
+        conn.row_factory = dict_row
         # Enable foreign keys
         conn.execute("PRAGMA foreign_keys = ON")
+        # Keep sorts/temp tables in RAM; 64MB page cache and memory-mapped
+        # reads keep the hot pages of the read-mostly catalog resident
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA cache_size = -65536")
+        conn.execute("PRAGMA mmap_size = 268435456")
         return conn
     except sqlite3.Error as e:
         print(f"[WARNING] Database connection failed: {e}")
         raise
 
 
+def get_thread_connection():
+    """Return this thread's persistent connection, opening it on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = get_connection()
+        _local.conn = conn
+        with _connections_lock:
+            # Close connections left behind by threads that have finished
+            # (e.g. the per-request worker threads of the streaming endpoint)
+            stale = [c for thread, c in _connections if not thread.is_alive()]
+            _connections[:] = [(thread, c) for thread, c in _connections if thread.is_alive()]
+            _connections.append((threading.current_thread(), conn))
+        for old_conn in stale:
+            try:
+                old_conn.close()
+            except sqlite3.Error:
+                pass
+    return conn
+
+
+@atexit.register
+def close_connections():
+    """Close every persistent connection (runs at interpreter exit)."""
+    with _connections_lock:
+        connections = [conn for _, conn in _connections]
+        _connections.clear()
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    _local.__dict__.pop("conn", None)
+
+
 @contextmanager
 def get_db_cursor():
     """
     Context manager for database cursor.
-    Automatically handles connection and cursor cleanup.
+    Uses the calling thread's persistent connection; commits on success,
+    rolls back on error and closes the cursor (not the connection).
     
     Usage:
         with get_db_cursor() as cur:
             cur.execute("SELECT * FROM pieces")
             results = cur.fetchall()
     """
-    conn = None
+    conn = get_thread_connection()
+    cur = conn.cursor()
     try:
-        conn = get_connection()
-        cur = conn.cursor()
         yield cur
-        conn.commit()
+        if conn.in_transaction:
+            conn.commit()
     except Exception as e:
-        if conn:
+        if conn.in_transaction:
             conn.rollback()
         raise e
     finally:
-        if conn:
-            cur.close()
-            conn.close()
+        cur.close()
 
 
 def dict_from_row(row) -> dict:
-    """Convert a sqlite3.Row to a regular dictionary."""
+    """Convert a sqlite3.Row to a regular dictionary (dict rows pass through)."""
     if row is None:
         return None
+    if isinstance(row, dict):
+        return row
     return {key: row[key] for key in row.keys()}
 
 
+@lru_cache(maxsize=4096)
+def _loads_json(text: str):
+    """Parse JSON text (orjson when installed), memoised on the raw string."""
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
 def parse_json_fields(row: dict, json_fields: list) -> dict:
     """
     Parse JSON text fields back to Python objects.
     
+    The catalog is static, so the same column values are parsed over and
+    over; parsed values are cached by their raw text and shared between
+    calls, so callers must treat them as read-only.
+    
     Args:
         row: Dictionary row from database
         json_fields: List of field names that contain JSON text
@@ -83,8 +193,8 @@ def parse_json_fields(row: dict, json_fields: list) -> dict:
     for field in json_fields:
         if field in result and result[field]:
             try:
-                result[field] = json.loads(result[field])
-            except (json.JSONDecodeError, TypeError):
+                result[field] = _loads_json(result[field])
+            except (ValueError, TypeError):
                 # Keep original value if not valid JSON
                 pass
     return result
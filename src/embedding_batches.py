@@ -0,0 +1,107 @@
+"""Token-aware batching for embedding requests.
+
+The embeddings endpoint limits both the tokens per input and the tokens per
+request, so a fixed "100 texts per batch" either sends tiny requests for short
+documents or oversized ones for long documents. These helpers count tokens
+with tiktoken (falling back to a length estimate when it is unavailable) and
+greedily pack consecutive texts into batches that respect those limits.
+Texts longer than the per-input limit are truncated by tokens rather than
+rejected by the API.
+"""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import List, Sequence, Tuple
+
+
+MAX_BATCH_ITEMS = 2048
+MAX_BATCH_TOKENS = 200_000
+MAX_ITEM_TOKENS = 8191
+
+# Rough characters-per-token ratio for English text when tiktoken is missing
+_CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: str):
+    """Return the tiktoken encoding for ``model`` or ``None`` if it cannot be loaded."""
+    try:
+        import tiktoken
+
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        # Not installed, unknown model, or the encoding file could not be fetched
+        return None
+
+
+def count_tokens(texts: Sequence[str], model: str) -> List[int]:
+    """Count tokens for each text (estimated from length without tiktoken)."""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return [-(-len(text) // _CHARS_PER_TOKEN) for text in texts]
+    return [len(tokens) for tokens in encoding.encode_ordinary_batch(list(texts))]
+
+
+def truncate_to_token_limit(
+    texts: Sequence[str],
+    model: str,
+    max_tokens: int = MAX_ITEM_TOKENS,
+) -> Tuple[List[str], List[int]]:
+    """
+    Cut every text down to at most ``max_tokens`` tokens.
+
+    Returns the (possibly shortened) texts and their token counts, so callers
+    can pack batches without encoding a second time. Without tiktoken the
+    cut is made at the estimated character offset instead.
+    """
+    encoding = _get_encoding(model)
+    if encoding is None:
+        max_chars = max_tokens * _CHARS_PER_TOKEN
+        truncated = [text[:max_chars] for text in texts]
+        return truncated, count_tokens(truncated, model)
+
+    truncated: List[str] = []
+    token_counts: List[int] = []
+    for text, tokens in zip(texts, encoding.encode_ordinary_batch(list(texts))):
+        if len(tokens) > max_tokens:
+            tokens = tokens[:max_tokens]
+            text = encoding.decode(tokens)
+        truncated.append(text)
+        token_counts.append(len(tokens))
+    return truncated, token_counts
+
+
+def pack_batches(
+    token_counts: Sequence[int],
+    max_items: int = MAX_BATCH_ITEMS,
+    max_tokens: int = MAX_BATCH_TOKENS,
+) -> List[Tuple[int, int]]:
+    """
+    Greedily group consecutive inputs into request-sized batches.
+
+    Args:
+        token_counts: Token count of each input, in order.
+        max_items: Maximum number of inputs per request.
+        max_tokens: Maximum total tokens per request.
+
+    Returns:
+        ``(start, end)`` slices covering every input exactly once, in order.
+    """
+    batches: List[Tuple[int, int]] = []
+    start = 0
+    batch_tokens = 0
+
+    for position, tokens in enumerate(token_counts):
+        tokens = min(tokens, MAX_ITEM_TOKENS)
+        if position > start and (
+            position - start >= max_items or batch_tokens + tokens > max_tokens
+        ):
+            batches.append((start, position))
+            start = position
+            batch_tokens = 0
+        batch_tokens += tokens
+
+    if start < len(token_counts):
+        batches.append((start, len(token_counts)))
+    return batches
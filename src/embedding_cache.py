@@ -0,0 +1,98 @@
+"""Persistent content-hash cache for document embeddings.
+
+Vector store rebuilds re-embed the same documents run after run. This cache
+stores each embedding under the SHA-256 of (model, text) in a small SQLite
+file so only new or changed documents hit the embeddings API.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+from typing import Iterable, List, Optional, Sequence
+
+import numpy as np
+
+
+_PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CACHE_PATH = os.getenv(
+    "EMBEDDING_CACHE_PATH",
+    os.path.join(_PROJECT_DIR, "data", "embedding_cache.db"),
+)
+
+# Stay well under SQLite's bound-parameter limit for IN (...) lookups
+_LOOKUP_CHUNK = 500
+
+
+def content_hash(text: str, model: str) -> str:
+    """Return the cache key for ``text`` embedded with ``model``."""
+    return hashlib.sha256(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite-backed ``sha256(model, text) -> float32 vector`` cache."""
+
+    def __init__(self, model: str, path: Optional[str] = None):
+        self.model = model
+        self.path = path or DEFAULT_CACHE_PATH
+
+        cache_dir = os.path.dirname(self.path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " hash TEXT PRIMARY KEY,"
+            " vec BLOB NOT NULL"
+            ")"
+        )
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """
+        Look up embeddings for ``texts``.
+
+        Returns a list aligned with ``texts`` holding the cached vector, or
+        ``None`` where the text has not been embedded before.
+        """
+        keys = [content_hash(text, self.model) for text in texts]
+        found = {}
+
+        unique_keys = list(dict.fromkeys(keys))
+        for start in range(0, len(unique_keys), _LOOKUP_CHUNK):
+            chunk = unique_keys[start:start + _LOOKUP_CHUNK]
+            placeholders = ", ".join("?" for _ in chunk)
+            rows = self.conn.execute(
+                f"SELECT hash, vec FROM embeddings WHERE hash IN ({placeholders})",
+                chunk,
+            )
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+
+        return [found.get(key) for key in keys]
+
+    def put_many(self, texts: Iterable[str], vectors: Iterable[Sequence[float]]) -> None:
+        """Store embeddings for ``texts`` in a single transaction."""
+        rows = [
+            (
+                content_hash(text, self.model),
+                np.asarray(vector, dtype=np.float32).tobytes(),
+            )
+            for text, vector in zip(texts, vectors)
+        ]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (hash, vec) VALUES (?, ?)",
+                rows,
+            )
@@ -0,0 +1,16 @@
+"""Helpers for reading configuration from environment variables."""
+
+from __future__ import annotations
+
+import os
+
+
+_TRUE_VALUES = {"1", "true", "yes"}
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    """Read a boolean switch: ``1``, ``true`` or ``yes`` (any case) enable it."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.lower() in _TRUE_VALUES
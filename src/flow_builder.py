@@ -21,14 +21,25 @@ Features:
 - Adaptive model selection based on complexity
 - Context-aware guide generation for ActivePieces platform
 """
+import copy
+import hashlib
 import os
 import json
+import re
 import time
+from collections import OrderedDict
 from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
-from typing import Dict, Any, Optional, List
+from threading import Lock
+from typing import Dict, Any, Optional, List, Tuple
 from dotenv import load_dotenv
 from openai import OpenAI
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 from src.tools import (
     find_piece_by_name,
     find_action_by_name,
@@ -39,9 +50,213 @@ from src.tools import (
     web_search,
     get_code_generation_guidelines,
 )
+from src.env_utils import env_flag
+from src.flow_cache import LookupFailedError, cached_lookup
+from src.query_utils import normalize_query
+from src.tool_cache import track_lookup_failures
 
 load_dotenv()
 
+# Analyses of recent requests, keyed on model, effort and normalized request,
+# so a retried or repeated request skips the analysis LLM call
+ANALYSIS_CACHE_ENABLED = env_flag("FLOW_ANALYSIS_CACHE", True)
+ANALYSIS_CACHE_SIZE = int(os.getenv("FLOW_ANALYSIS_CACHE_SIZE", "512"))
+_analysis_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_analysis_cache_lock = Lock()
+
+# Keywords that mark an action as an AI task, in priority order: the first
+# category with any keyword (substring) in the action text wins
+_AI_CATEGORY_KEYWORDS = (
+    ("image", ("image", "logo", "banner", "graphic", "picture", "thumbnail")),
+    ("video", ("video", "clip", "animation", "reel", "promo")),
+    ("structured", ("extract", "structured", "json", "schema", "fields", "parse", "table", "invoice")),
+    ("moderation", ("moderation", "flag", "safe", "inappropriate")),
+    ("classification", ("classify", "categorize", "category", "label")),
+    ("summary", ("summarize", "summary", "tl;dr", "compress")),
+    ("text", (
+        "ask",
+        "answer",
+        "write",
+        "generate",
+        "draft",
+        "translate",
+        "sentiment",
+        "analysis",
+        "chat",
+        "respond",
+        "reply",
+        "describe",
+        "explain",
+        "gpt",
+        "gpt-4",
+        "gpt4",
+        "gpt-5",
+        "gpt5",
+        "chatgpt",
+        "openai",
+        "claude",
+        "gemini",
+        "sonnet",
+        "anthropic",
+    )),
+)
+
+# AI category -> (AI piece, action to recommend, reason shown to the user)
+_AI_CATEGORY_MAP = {
+    "structured": ("utility_ai", "Extract Structured Data", "Structured data extraction task"),
+    "moderation": ("utility_ai", "Check Moderation", "Content moderation task"),
+    "classification": ("utility_ai", "Classify Text", "Text classification task"),
+    "summary": ("text_ai", "Summarize Text", "Text summarization task"),
+    "image": ("image_ai", "Generate Image", "Image generation task"),
+    "video": ("video_ai", "Generate Video", "Video generation task"),
+    "text": ("text_ai", "Ask AI", "Text AI supports OpenAI GPT-4/5, Claude, and Gemini models directly"),
+}
+
+# One compiled alternation per category: a single C-level scan per category
+# instead of a Python-level `in` test per keyword
+_AI_CATEGORY_PATTERNS = tuple(
+    (category, re.compile("|".join(re.escape(keyword) for keyword in keywords)))
+    for category, keywords in _AI_CATEGORY_KEYWORDS
+)
+
+# The analysis reply is parsed with orjson when installed
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+# Punctuation trimmed from the ends of keyword tokens (split() has already
+# removed the whitespace)
+_KEYWORD_STRIP_CHARS = ",-:;|"
+
+# Connectors after which a component description names the service
+# ("send email via Gmail")
+_SEARCH_TERM_SEPARATORS = (" via ", " using ", " with ", " for ")
+
+# Fields of the analysis JSON that are complete once their closing quote or
+# bracket has streamed in
+_STREAMED_TRIGGER_RE = re.compile(r'"trigger_type"\s*:\s*("(?:[^"\\]|\\.)*")')
+_STREAMED_ACTIONS_RE = re.compile(r'"actions_needed"\s*:\s*(\[(?:[^\]"]|"(?:[^"\\]|\\.)*")*\])')
+
+# Responses stream events that end the stream without a completed response
+_STREAM_FAILURE_EVENTS = ("error", "response.failed", "response.incomplete")
+
+
+def _stream_failure_detail(event: Any) -> Any:
+    """Pull the reason out of an ``error``/``response.failed``/``response.incomplete`` event."""
+    response = getattr(event, "response", None)
+    if response is not None:
+        return getattr(response, "error", None) or getattr(response, "incomplete_details", None)
+    return getattr(event, "message", None) or getattr(event, "error", None)
+
+
+# Shared by every request; creating (and joining) a fresh pool per search
+# cost a round of thread start-ups on each flow
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="flow-builder")
+
+
+# Module-level rather than static methods: the cached lookups are called for
+# every action of every flow, and a plain function call skips the class
+# attribute lookup in front of the cache
+_ai_piece_catalog: Optional[Dict[str, Optional[Dict[str, Any]]]] = None
+# Catalog key -> {lowercased action name: display name}, built with the catalog
+_ai_action_displays: Dict[str, Dict[str, str]] = {}
+_ai_piece_catalog_lock = Lock()
+
+
+def _build_display_index(piece: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """Map each of a piece's lowercased action names to its display name."""
+    index: Dict[str, str] = {}
+    for action in (piece or {}).get("actions") or []:
+        display = (
+            action.get("displayName")
+            or action.get("display_name")
+            or action.get("name")
+        )
+        if display:
+            # First match wins, as in a linear scan
+            index.setdefault(display.lower(), display)
+    return index
+
+
+def _get_ai_piece_catalog() -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Return the native AI pieces, loading them on first use.
+
+    A load that hit a database error is returned but not kept, so the next
+    call tries again instead of serving the gaps for the life of the process.
+    """
+    global _ai_piece_catalog
+    if _ai_piece_catalog is not None:
+        return _ai_piece_catalog
+
+    with _ai_piece_catalog_lock:
+        if _ai_piece_catalog is not None:
+            return _ai_piece_catalog
+
+        piece_names = {
+            "text_ai": "Text AI",
+            "utility_ai": "Utility AI",
+            "image_ai": "Image AI",
+            "video_ai": "Video AI",
+        }
+
+        catalog: Dict[str, Optional[Dict[str, Any]]] = {}
+        failed = False
+        with track_lookup_failures() as lookup_failed:
+            for key, piece_name in piece_names.items():
+                try:
+                    catalog[key] = find_piece_by_name(piece_name)
+                except Exception as exc:
+                    print(f"⚠️  Unable to load AI piece '{piece_name}': {exc}")
+                    catalog[key] = None
+                    failed = True
+                _ai_action_displays[key] = _build_display_index(catalog[key])
+            failed = failed or lookup_failed()
+
+        if not failed:
+            _ai_piece_catalog = catalog
+        return catalog
+
+
+@lru_cache(maxsize=512)
+def _rag_suggestions_cached(normalized_query: str, k: int) -> Tuple[str, ...]:
+    vector_store = get_vector_store()
+    docs = vector_store.similarity_search(normalized_query, k=k)
+    suggestions: List[str] = []
+    for doc in docs or []:
+        metadata = doc.metadata or {}
+        meta_piece = metadata.get("piece") or metadata.get("title") or metadata.get("source")
+        snippet = (doc.page_content or "").strip()
+        if len(snippet) > 180:
+            snippet = snippet[:180].rstrip() + "..."
+        if meta_piece:
+            suggestions.append(f"{meta_piece}: {snippet}")
+        elif snippet:
+            suggestions.append(snippet)
+    return tuple(suggestions)
+
+
+@lru_cache(maxsize=256)
+def _kb_search(normalized_query: str, k: int = 3) -> Tuple[str, ...]:
+    """Workflow documentation passages for the knowledge base context."""
+    results = get_vector_store().similarity_search(normalized_query, k=k)
+    return tuple(doc.page_content for doc in results or [])
+
+
+@lru_cache(maxsize=128)
+def _piece_overview_cached(piece_name: str) -> str:
+    # In-memory LRU in front of the on-disk cache that survives restarts
+    return cached_lookup(
+        f"piece:{piece_name}",
+        lambda: list_piece_actions_and_triggers(piece_name),
+    )
+
+
+@lru_cache(maxsize=256)
+def _action_inputs_cached(piece_name: str, action_name: str) -> str:
+    return cached_lookup(
+        f"inputs:{piece_name}|{action_name}",
+        lambda: list_action_inputs(piece_name, action_name),
+    )
+
 
 class FlowBuilder:
     """
@@ -61,6 +276,12 @@ class FlowBuilder:
     3. Build: Generate comprehensive step-by-step flow guide
     """
     
+    # Kept as class attributes for callers that used the static methods
+    _get_ai_piece_catalog = staticmethod(_get_ai_piece_catalog)
+    _rag_suggestions_cached = staticmethod(_rag_suggestions_cached)
+    _piece_overview_cached = staticmethod(_piece_overview_cached)
+    _action_inputs_cached = staticmethod(_action_inputs_cached)
+
     def __init__(self, model: str = "gpt-5-mini", status_callback=None, enable_web_search: bool = False):
         """
         Initialize the flow builder with GPT-5 model.
@@ -75,8 +296,11 @@ class FlowBuilder:
         self.status_callback = status_callback
         self.enable_web_search = enable_web_search
         self.action_counter = 0
+        # (kind, term) -> Future of a catalog lookup started while the
+        # analysis was still streaming; consumed by search_flow_components
+        self._prefetched_lookups: Dict[tuple, Any] = {}
         print(f"✓ Flow Builder initialized with model: {model}, web search: {enable_web_search}")
-        self._fast_mode = os.getenv("FLOW_BUILDER_FAST_MODE", "true").lower() in {"1", "true", "yes"}
+        self._fast_mode = env_flag("FLOW_BUILDER_FAST_MODE", True)
     
     def _emit_action_log(self, icon: str, action: str, detail: Optional[str] = None, status: str = "started", duration: Optional[float] = None):
         """Emit an action log if callback is available."""
@@ -102,10 +326,14 @@ class FlowBuilder:
         """Return the first few meaningful words from text for searching."""
         if not text:
             return ""
-        tokens = [token.strip(",-:;|\n\t") for token in text.split() if token.strip()]
+        # Only the first max_words tokens are used, so stop splitting there
+        tokens = [
+            token.strip(_KEYWORD_STRIP_CHARS)
+            for token in text.split(None, max_words)[:max_words]
+        ]
         if not tokens:
             return ""
-        return " ".join(tokens[:max_words])
+        return " ".join(tokens)
 
     @staticmethod
     def _generate_search_terms(text: str) -> List[str]:
@@ -115,32 +343,72 @@ class FlowBuilder:
 
         base = text.strip()
         lower = base.lower()
-        separators = [" via ", " using ", " with ", " for "]
-        candidates = {base}
+        # Insertion-ordered, so the terms (and which ones get searched) are the
+        # same on every run
+        candidates = {base: None}
 
-        for sep in separators:
+        for sep in _SEARCH_TERM_SEPARATORS:
             if sep in lower:
-                parts = base.lower().split(sep)
-                tail = parts[-1].strip()
+                tail = lower.split(sep)[-1].strip()
                 if tail:
-                    candidates.add(tail)
+                    candidates[tail] = None
 
-        words = [w.strip(",.;:") for w in base.split() if w.strip()]
+        words = [w.strip(",.;:") for w in base.split()]
         if len(words) >= 2:
-            candidates.add(" ".join(words[:3]))
-            candidates.add(" ".join(words[-3:]))
-
-        # Filter and return unique preserving order
-        ordered: List[str] = []
-        seen = set()
-        for item in [base, *candidates]:
-            normalized = item.strip()
-            if not normalized or normalized in seen:
-                continue
-            seen.add(normalized)
-            ordered.append(normalized)
+            candidates[" ".join(words[:3]).strip()] = None
+            candidates[" ".join(words[-3:]).strip()] = None
 
-        return ordered
+        candidates.pop("", None)
+        return list(candidates)
+
+    @staticmethod
+    def _action_search_term(action_desc: str) -> str:
+        """Term the component search looks an action up by."""
+        terms = FlowBuilder._generate_search_terms(action_desc)
+        return terms[0] if terms else FlowBuilder._extract_keywords(action_desc)
+
+    def _prefetch_lookup(self, kind: str, term: str) -> None:
+        """Start a catalog lookup the component search is about to make."""
+        key = (kind, term)
+        if not term or key in self._prefetched_lookups:
+            return
+        if kind == "piece":
+            future = _executor.submit(find_piece_by_name, term)
+        elif kind == "action":
+            future = _executor.submit(find_action_by_name, term, limit=8)
+        else:
+            future = _executor.submit(find_trigger_by_name, term, limit=8)
+        self._prefetched_lookups[key] = future
+
+    def _prefetch_from_partial_analysis(self, partial_text: str, seen: set) -> None:
+        """Start lookups for the trigger and actions once they have streamed in."""
+        if "trigger" not in seen:
+            match = _STREAMED_TRIGGER_RE.search(partial_text)
+            if match:
+                seen.add("trigger")
+                try:
+                    trigger_type = _json_loads(match.group(1))
+                except ValueError:
+                    trigger_type = None
+                if isinstance(trigger_type, str) and trigger_type and trigger_type != "unclear":
+                    for term in self._generate_search_terms(trigger_type)[:2]:
+                        self._prefetch_lookup("piece", term)
+                        self._prefetch_lookup("trigger", term)
+
+        if "actions" not in seen:
+            match = _STREAMED_ACTIONS_RE.search(partial_text)
+            if match:
+                seen.add("actions")
+                try:
+                    actions = _json_loads(match.group(1))
+                except ValueError:
+                    actions = []
+                for action_desc in actions:
+                    if not isinstance(action_desc, str) or not action_desc or action_desc.startswith("unclear"):
+                        continue
+                    primary_term = self._action_search_term(action_desc)
+                    self._prefetch_lookup("piece", primary_term)
+                    self._prefetch_lookup("action", primary_term)
 
     @staticmethod
     def _detect_ai_category(text: Optional[str]) -> Optional[str]:
@@ -148,91 +416,24 @@ class FlowBuilder:
             return None
 
         lowered = text.lower()
-
-        if any(keyword in lowered for keyword in ("image", "logo", "banner", "graphic", "picture", "thumbnail")):
-            return "image"
-
-        if any(keyword in lowered for keyword in ("video", "clip", "animation", "reel", "promo")):
-            return "video"
-
-        if any(keyword in lowered for keyword in ("extract", "structured", "json", "schema", "fields", "parse", "table", "invoice")):
-            return "structured"
-
-        if any(keyword in lowered for keyword in ("moderation", "flag", "safe", "inappropriate")):
-            return "moderation"
-
-        if any(keyword in lowered for keyword in ("classify", "categorize", "category", "label")):
-            return "classification"
-
-        if any(keyword in lowered for keyword in ("summarize", "summary", "tl;dr", "compress")):
-            return "summary"
-
-        if any(keyword in lowered for keyword in (
-            "ask",
-            "answer",
-            "write",
-            "generate",
-            "draft",
-            "translate",
-            "sentiment",
-            "analysis",
-            "chat",
-            "respond",
-            "reply",
-            "describe",
-            "explain",
-            "gpt",
-            "gpt-4",
-            "gpt4",
-            "gpt-5",
-            "gpt5",
-            "chatgpt",
-            "openai",
-            "claude",
-            "gemini",
-            "sonnet",
-            "anthropic",
-        )):
-            return "text"
+        for category, pattern in _AI_CATEGORY_PATTERNS:
+            if pattern.search(lowered):
+                return category
 
         return None
 
     @staticmethod
-    @lru_cache(maxsize=1)
-    def _get_ai_piece_catalog() -> Dict[str, Optional[Dict[str, Any]]]:
-        piece_names = {
-            "text_ai": "Text AI",
-            "utility_ai": "Utility AI",
-            "image_ai": "Image AI",
-            "video_ai": "Video AI",
-        }
-
-        catalog: Dict[str, Optional[Dict[str, Any]]] = {}
-        for key, piece_name in piece_names.items():
-            try:
-                catalog[key] = find_piece_by_name(piece_name)
-            except Exception as exc:
-                print(f"⚠️  Unable to load AI piece '{piece_name}': {exc}")
-                catalog[key] = None
-
-        return catalog
-
-    @staticmethod
-    def _resolve_action_display(piece: Optional[Dict[str, Any]], desired_action: str) -> str:
+    def _resolve_action_display(
+        piece: Optional[Dict[str, Any]],
+        desired_action: str,
+        display_index: Optional[Dict[str, str]] = None,
+    ) -> str:
         if not piece or not desired_action:
             return desired_action
 
-        actions = piece.get("actions") or []
-        for action in actions:
-            display = (
-                action.get("displayName")
-                or action.get("display_name")
-                or action.get("name")
-            )
-            if display and display.lower() == desired_action.lower():
-                return display
-
-        return desired_action
+        if display_index is None:
+            display_index = _build_display_index(piece)
+        return display_index.get(desired_action.lower(), desired_action)
 
     @staticmethod
     def _select_ai_recommendation(action_text: str) -> Optional[Dict[str, str]]:
@@ -240,92 +441,21 @@ class FlowBuilder:
         if not category:
             return None
 
-        catalog = FlowBuilder._get_ai_piece_catalog()
-
-        if category == "structured":
-            piece = catalog.get("utility_ai")
-            if piece:
-                action_name = FlowBuilder._resolve_action_display(piece, "Extract Structured Data")
-                return {
-                    "piece_key": "utility_ai",
-                    "piece": piece,
-                    "action": action_name,
-                    "reason": "Structured data extraction task",
-                }
-            return None
-
-        if category == "moderation":
-            piece = catalog.get("utility_ai")
-            if piece:
-                action_name = FlowBuilder._resolve_action_display(piece, "Check Moderation")
-                return {
-                    "piece_key": "utility_ai",
-                    "piece": piece,
-                    "action": action_name,
-                    "reason": "Content moderation task",
-                }
+        entry = _AI_CATEGORY_MAP.get(category)
+        if not entry:
             return None
 
-        if category == "classification":
-            piece = catalog.get("utility_ai")
-            if piece:
-                action_name = FlowBuilder._resolve_action_display(piece, "Classify Text")
-                return {
-                    "piece_key": "utility_ai",
-                    "piece": piece,
-                    "action": action_name,
-                    "reason": "Text classification task",
-                }
+        piece_key, action, reason = entry
+        piece = _get_ai_piece_catalog().get(piece_key)
+        if not piece:
             return None
 
-        if category == "summary":
-            piece = catalog.get("text_ai")
-            if piece:
-                action_name = FlowBuilder._resolve_action_display(piece, "Summarize Text")
-                return {
-                    "piece_key": "text_ai",
-                    "piece": piece,
-                    "action": action_name,
-                    "reason": "Text summarization task",
-                }
-            return None
-
-        if category == "image":
-            piece = catalog.get("image_ai")
-            if piece:
-                action_name = FlowBuilder._resolve_action_display(piece, "Generate Image")
-                return {
-                    "piece_key": "image_ai",
-                    "piece": piece,
-                    "action": action_name,
-                    "reason": "Image generation task",
-                }
-            return None
-
-        if category == "video":
-            piece = catalog.get("video_ai")
-            if piece:
-                action_name = FlowBuilder._resolve_action_display(piece, "Generate Video")
-                return {
-                    "piece_key": "video_ai",
-                    "piece": piece,
-                    "action": action_name,
-                    "reason": "Video generation task",
-                }
-            return None
-
-        if category in {"text"}:
-            piece = catalog.get("text_ai")
-            if piece:
-                action_name = FlowBuilder._resolve_action_display(piece, "Ask AI")
-                return {
-                    "piece_key": "text_ai",
-                    "piece": piece,
-                    "action": action_name,
-                    "reason": "Text AI supports OpenAI GPT-4/5, Claude, and Gemini models directly",
-                }
-
-        return None
+        return {
+            "piece_key": piece_key,
+            "piece": piece,
+            "action": FlowBuilder._resolve_action_display(piece, action, _ai_action_displays.get(piece_key)),
+            "reason": reason,
+        }
 
     @staticmethod
     def _extract_output_text(final_response: Any) -> str:
@@ -364,29 +494,38 @@ class FlowBuilder:
         return ""
 
     @staticmethod
-    @lru_cache(maxsize=128)
-    def _rag_piece_suggestions(query: str) -> List[str]:
-        if not query:
+    def _rag_query_key(query: str) -> str:
+        """Case- and whitespace-insensitive form of a RAG query."""
+        return " ".join(query.lower().split()) if query else ""
+
+    @staticmethod
+    def _rag_piece_suggestions(query: str, k: int = 4) -> List[str]:
+        normalized = FlowBuilder._rag_query_key(query)
+        if not normalized:
             return []
         try:
-            vector_store = get_vector_store()
-            docs = vector_store.similarity_search(query, k=4)
-            suggestions: List[str] = []
-            for doc in docs or []:
-                metadata = doc.metadata or {}
-                meta_piece = metadata.get("piece") or metadata.get("title") or metadata.get("source")
-                snippet = (doc.page_content or "").strip()
-                if len(snippet) > 180:
-                    snippet = snippet[:180].rstrip() + "..."
-                if meta_piece:
-                    suggestions.append(f"{meta_piece}: {snippet}")
-                elif snippet:
-                    suggestions.append(snippet)
-            return suggestions
+            return list(_rag_suggestions_cached(normalized, k))
         except Exception as exc:
             print(f"⚠️  RAG suggestion error for '{query}': {exc}")
             return []
 
+    @staticmethod
+    def _embed_rag_queries(queries: List[str]) -> None:
+        """Embed all of a request's RAG queries in one embeddings call.
+
+        The vectors land in the embedder's query cache, so the searches that
+        follow reuse them instead of each making its own request.
+        """
+        queries = list(dict.fromkeys(query for query in queries if query))
+        if len(queries) < 2:
+            return
+        try:
+            embed_queries = getattr(get_vector_store().embedding_function, "embed_queries", None)
+            if embed_queries is not None:
+                embed_queries(queries)
+        except Exception as exc:
+            print(f"⚠️  Batched RAG embedding failed: {exc}")
+
     @staticmethod
     def _latest_http_request_docs(enable_web_search: bool = False) -> str:
         """Get HTTP Request documentation, optionally from web search."""
@@ -501,29 +640,73 @@ class FlowBuilder:
         return strategy
 
     @staticmethod
-    @lru_cache(maxsize=128)
-    def _piece_overview_cached(piece_name: str) -> str:
-        return list_piece_actions_and_triggers(piece_name)
+    def _lookup_failure_text(exc: LookupFailedError, fallback: str) -> str:
+        """Keep a lookup's own error message; replace a misleading "not found"."""
+        text = str(exc)
+        if text.startswith("⚠️"):
+            return text
+        return f"⚠️  {fallback}: the catalog database could not be read."
 
     @staticmethod
     def _safe_piece_overview(piece_name: str) -> str:
         try:
-            return FlowBuilder._piece_overview_cached(piece_name)
+            return _piece_overview_cached(piece_name)
+        except LookupFailedError as exc:
+            # Not cached, so the next flow retries the lookup
+            return FlowBuilder._lookup_failure_text(exc, f"Unable to load actions/triggers for {piece_name}")
         except Exception as exc:
             return f"⚠️  Unable to load actions/triggers for {piece_name}: {exc}"
 
-    @staticmethod
-    @lru_cache(maxsize=256)
-    def _action_inputs_cached(piece_name: str, action_name: str) -> str:
-        return list_action_inputs(piece_name, action_name)
-
     @staticmethod
     def _safe_action_inputs(piece_name: str, action_name: str) -> str:
         try:
-            return FlowBuilder._action_inputs_cached(piece_name, action_name)
+            return _action_inputs_cached(piece_name, action_name)
+        except LookupFailedError as exc:
+            return FlowBuilder._lookup_failure_text(exc, f"Unable to fetch inputs for {piece_name} – {action_name}")
         except Exception as exc:
             return f"⚠️  Unable to fetch inputs for {piece_name} – {action_name}: {exc}"
     
+    def _stream_analysis_text(self, analysis_prompt: str, reasoning_effort: str, verbosity_level: str) -> str:
+        """
+        Stream the analysis response and return its text.
+
+        The trigger and action lookups start as soon as those fields are
+        complete, overlapping the DB work with the rest of the generation.
+        Raises ``RuntimeError`` unless the response completed.
+        """
+        analysis_text = ""
+        seen_fields: set = set()
+        completed = False
+        final_response = None
+        with self.client.responses.stream(
+            model=self.model,
+            input=analysis_prompt,
+            reasoning={"effort": reasoning_effort},
+            text={"verbosity": verbosity_level},
+        ) as stream:
+            for event in stream:
+                event_type = getattr(event, "type", None)
+                if event_type == "response.output_text.delta":
+                    chunk_text = getattr(event, "delta", "") or ""
+                    if chunk_text:
+                        analysis_text += chunk_text
+                        if len(seen_fields) < 2:
+                            self._prefetch_from_partial_analysis(analysis_text, seen_fields)
+                elif event_type == "response.completed":
+                    completed = True
+                    final_response = stream.get_final_response()
+                elif event_type in _STREAM_FAILURE_EVENTS:
+                    raise RuntimeError(f"Analysis stream {event_type}: {_stream_failure_detail(event)}")
+
+        if not completed:
+            raise RuntimeError("Analysis stream ended without a completed response")
+        status = getattr(final_response, "status", None)
+        if status not in (None, "completed"):
+            raise RuntimeError(f"Analysis response {status}")
+        if final_response is not None and not analysis_text:
+            analysis_text = self._extract_output_text(final_response) or ""
+        return analysis_text
+
     def analyze_flow_request(self, user_request: str) -> Dict[str, Any]:
         """
         Analyze the user's flow request to understand what they want to build.
@@ -536,6 +719,30 @@ class FlowBuilder:
         """
         start_time = time.time()
         self._emit_action_log("🧠", "Analyzing flow request with AI", f"Understanding: {user_request[:60]}..." if len(user_request) > 60 else f"Understanding: {user_request}", "started")
+
+        reasoning_effort = "medium"
+        verbosity_level = "medium"
+
+        if self._fast_mode:
+            reasoning_effort = "low"
+            verbosity_level = "low"
+
+        cache_key = hashlib.blake2b(
+            f"{self.model}\0{reasoning_effort}\0{normalize_query(user_request).lower()}".encode("utf-8"),
+            digest_size=16,
+        ).hexdigest()
+        if ANALYSIS_CACHE_ENABLED:
+            with _analysis_cache_lock:
+                cached = _analysis_cache.get(cache_key)
+                if cached is not None:
+                    _analysis_cache.move_to_end(cache_key)
+            if cached is not None:
+                analysis = copy.deepcopy(cached)
+                actions_count = len(analysis.get('actions_needed', []))
+                complexity = analysis.get('complexity', 'Unknown').upper()
+                confidence = analysis.get('confidence', 'Unknown').upper()
+                self._emit_action_log("✅", "Flow analysis completed", f"Identified {actions_count} actions needed • Complexity: {complexity} • Confidence: {confidence} (cached)", "completed", time.time() - start_time)
+                return analysis
         
         analysis_prompt = f"""You are an expert workflow automation analyst for ActivePieces, a powerful workflow automation platform.
 
@@ -591,22 +798,19 @@ Request: "Automate my customer onboarding"
 
 Now analyze the user's request above."""
 
-        reasoning_effort = "medium"
-        verbosity_level = "medium"
-
-        if self._fast_mode:
-            reasoning_effort = "low"
-            verbosity_level = "low"
-
         try:
-            response = self.client.responses.create(
-                model=self.model,
-                input=analysis_prompt,
-                reasoning={"effort": reasoning_effort},
-                text={"verbosity": verbosity_level}
-            )
-            
-            analysis_text = response.output_text.strip()
+            try:
+                analysis_text = self._stream_analysis_text(analysis_prompt, reasoning_effort, verbosity_level)
+            except Exception as stream_error:
+                print(f"⚠️  Analysis streaming failed, falling back to non-streaming: {stream_error}")
+                response = self.client.responses.create(
+                    model=self.model,
+                    input=analysis_prompt,
+                    reasoning={"effort": reasoning_effort},
+                    text={"verbosity": verbosity_level}
+                )
+                analysis_text = response.output_text
+            analysis_text = analysis_text.strip()
             
             # Parse JSON response
             if "```json" in analysis_text:
@@ -614,7 +818,7 @@ Now analyze the user's request above."""
             elif "```" in analysis_text:
                 analysis_text = analysis_text.split("```")[1].split("```")[0].strip()
             
-            analysis = json.loads(analysis_text)
+            analysis = _json_loads(analysis_text)
             
             print(f"\n{'='*60}")
             print("🔍 FLOW ANALYSIS:")
@@ -628,6 +832,13 @@ Now analyze the user's request above."""
             confidence = analysis.get('confidence', 'Unknown').upper()
             actions_count = len(analysis.get('actions_needed', []))
             self._emit_action_log("✅", "Flow analysis completed", f"Identified {actions_count} actions needed • Complexity: {complexity} • Confidence: {confidence}", "completed", duration)
+
+            if ANALYSIS_CACHE_ENABLED and isinstance(analysis, dict):
+                with _analysis_cache_lock:
+                    _analysis_cache[cache_key] = copy.deepcopy(analysis)
+                    _analysis_cache.move_to_end(cache_key)
+                    while len(_analysis_cache) > ANALYSIS_CACHE_SIZE:
+                        _analysis_cache.popitem(last=False)
             
             return analysis
             
@@ -663,7 +874,10 @@ Now analyze the user's request above."""
         # Prepare cached lookups to avoid duplicate DB hits within a single request
         @lru_cache(maxsize=32)
         def cached_find_piece(name: str):
+            prefetched = self._prefetched_lookups.pop(("piece", name), None)
             try:
+                if prefetched is not None:
+                    return prefetched.result()
                 return find_piece_by_name(name)
             except Exception as exc:
                 print(f"⚠️  Piece lookup failed for '{name}': {exc}")
@@ -671,7 +885,10 @@ Now analyze the user's request above."""
 
         @lru_cache(maxsize=32)
         def cached_find_action(term: str):
+            prefetched = self._prefetched_lookups.pop(("action", term), None)
             try:
+                if prefetched is not None:
+                    return prefetched.result()
                 return find_action_by_name(term, limit=8)
             except Exception as exc:
                 print(f"⚠️  Action search failed for '{term}': {exc}")
@@ -679,61 +896,83 @@ Now analyze the user's request above."""
 
         @lru_cache(maxsize=32)
         def cached_find_trigger(term: str):
+            prefetched = self._prefetched_lookups.pop(("trigger", term), None)
             try:
+                if prefetched is not None:
+                    return prefetched.result()
                 return find_trigger_by_name(term, limit=8)
             except Exception as exc:
                 print(f"⚠️  Trigger search failed for '{term}': {exc}")
                 return []
 
-        def perform_vector_search() -> List[str]:
-            try:
-                self._emit_action_log("📚", "Searching knowledge base", "Looking for relevant workflow documentation", "searching")
-                vector_store = get_vector_store()
-                search_query = " ".join(
+        # Sorted and lowercased so retries of the same analysis share a
+        # knowledge base cache entry
+        kb_query = " ".join(
+            " ".join(
+                sorted(
                     filter(
                         None,
                         [
                             analysis.get("flow_goal", ""),
                             analysis.get("trigger_type", ""),
-                            " ".join(analysis.get("actions_needed", [])),
+                            *analysis.get("actions_needed", []),
                         ],
                     )
-                ).strip()
+                )
+            ).lower().split()
+        ) if should_fetch_kb else ""
 
-                if not search_query:
+        def perform_vector_search() -> List[str]:
+            try:
+                self._emit_action_log("📚", "Searching knowledge base", "Looking for relevant workflow documentation", "searching")
+                if not kb_query:
                     return []
 
-                results = vector_store.similarity_search(search_query, k=3)
-                return [doc.page_content for doc in results] if results else []
+                return list(_kb_search(kb_query))
             except Exception as exc:
                 print(f"⚠️  Knowledge base search error: {exc}")
                 return []
 
+        def perform_rag_searches(action_descs: List[str]):
+            # One embeddings request for every action plus the knowledge base
+            # query; the per-query searches below then only probe the index
+            FlowBuilder._embed_rag_queries(
+                [*(FlowBuilder._rag_query_key(desc) for desc in action_descs), kb_query]
+            )
+            suggestions = {desc: FlowBuilder._rag_piece_suggestions(desc) for desc in dict.fromkeys(action_descs)}
+            knowledge = perform_vector_search() if should_fetch_kb else []
+            return suggestions, knowledge
+
+        # One task per distinct lookup: a term shared by several actions (or
+        # by an action and the trigger) is looked up once
         futures: Dict[Any, Any] = {}
         trigger_terms = []
 
-        with ThreadPoolExecutor(max_workers=8) as executor:
-            trigger_type = analysis.get("trigger_type")
-            if trigger_type and trigger_type != "unclear":
-                trigger_terms = self._generate_search_terms(trigger_type)
-                for term in trigger_terms[:2]:  # limit parallel fan-out
-                    futures[("trigger_piece", term)] = executor.submit(cached_find_piece, term)
-                    futures[("trigger_matches", term)] = executor.submit(cached_find_trigger, term)
-
-            action_terms: List[tuple[int, str, str]] = []
-            for idx, action_desc in enumerate(analysis.get("actions_needed", [])):
-                if not action_desc or action_desc.startswith("unclear"):
-                    continue
+        def submit_once(key: tuple, fn, term: str) -> None:
+            if key not in futures:
+                futures[key] = _executor.submit(fn, term)
+
+        trigger_type = analysis.get("trigger_type")
+        if trigger_type and trigger_type != "unclear":
+            trigger_terms = self._generate_search_terms(trigger_type)
+            for term in trigger_terms[:2]:  # limit parallel fan-out
+                submit_once(("piece", term), cached_find_piece, term)
+                submit_once(("trigger_matches", term), cached_find_trigger, term)
+
+        action_terms: List[tuple[int, str, str]] = []
+        for idx, action_desc in enumerate(analysis.get("actions_needed", [])):
+            if not action_desc or action_desc.startswith("unclear"):
+                continue
 
-                terms = self._generate_search_terms(action_desc)
-                primary_term = terms[0] if terms else self._extract_keywords(action_desc)
-                action_terms.append((idx, action_desc, primary_term))
-                futures[("action_piece", idx, primary_term)] = executor.submit(cached_find_piece, primary_term)
-                futures[("action_matches", idx, primary_term)] = executor.submit(cached_find_action, primary_term)
-                futures[("action_rag", idx, action_desc)] = executor.submit(FlowBuilder._rag_piece_suggestions, action_desc)
+            primary_term = self._action_search_term(action_desc)
+            action_terms.append((idx, action_desc, primary_term))
+            submit_once(("piece", primary_term), cached_find_piece, primary_term)
+            submit_once(("action_matches", primary_term), cached_find_action, primary_term)
 
-            if should_fetch_kb:
-                futures[("knowledge_context", 0)] = executor.submit(perform_vector_search)
+        if action_terms or should_fetch_kb:
+            futures[("rag", 0)] = _executor.submit(
+                perform_rag_searches, [action_desc for _, action_desc, _ in action_terms]
+            )
 
         resolved: Dict[Any, Any] = {}
         for key, future in futures.items():
@@ -743,10 +982,12 @@ Now analyze the user's request above."""
                 print(f"⚠️  Lookup task {key} failed: {exc}")
                 resolved[key] = None
 
+        rag_suggestions_by_desc, knowledge_context = resolved.get(("rag", 0)) or ({}, [])
+
         # Process trigger results
         trigger_piece = None
         for term in trigger_terms:
-            candidate_piece = resolved.get(("trigger_piece", term))
+            candidate_piece = resolved.get(("piece", term))
             if candidate_piece:
                 trigger_piece = candidate_piece
                 break
@@ -772,9 +1013,9 @@ Now analyze the user's request above."""
 
         # Process action results
         for idx, action_desc, primary_term in action_terms:
-            action_piece = resolved.get(("action_piece", idx, primary_term))
-            matches = resolved.get(("action_matches", idx, primary_term)) or []
-            rag_suggestions = resolved.get(("action_rag", idx, action_desc)) or []
+            action_piece = resolved.get(("piece", primary_term))
+            matches = resolved.get(("action_matches", primary_term)) or []
+            rag_suggestions = rag_suggestions_by_desc.get(action_desc) or []
 
             ai_recommendation = self._select_ai_recommendation(action_desc)
             preferred_piece = None
@@ -834,7 +1075,9 @@ Now analyze the user's request above."""
 
             components["actions"].append(action_entry)
 
-        components["knowledge_context"] = resolved.get(("knowledge_context", 0)) or []
+        components["knowledge_context"] = knowledge_context or []
+        # Lookups prefetched for terms the analysis ended up not using
+        self._prefetched_lookups.clear()
         
         duration = time.time() - start_time
         actions_found = len(components.get('actions', []))
@@ -1435,6 +1678,18 @@ Make this the MOST COMPREHENSIVE ActivePieces flow guide possible - the user sho
         return plan
 
 
+def warmup() -> None:
+    """Load the AI piece catalog and the vector store ahead of the first flow."""
+    started = time.perf_counter()
+    try:
+        _get_ai_piece_catalog()
+        get_vector_store()
+    except Exception as e:
+        print(f"⚠️  Flow builder warmup incomplete: {e}")
+        return
+    print(f"✓ Flow builder warmup finished in {time.perf_counter() - started:.2f}s")
+
+
 # Global flow builder instance
 _flow_builder: Optional[FlowBuilder] = None
 
@@ -1488,7 +1743,11 @@ def build_flow(
     # Create builder with primary model
     builder = FlowBuilder(model=primary_model, status_callback=status_callback, enable_web_search=enable_web_search)
     
-    # Step 1: Analyze the request
+    # Step 1: Analyze the request. The component search needs the vector store
+    # and the AI piece catalog, so load them while the analysis LLM call runs
+    # (failures are left for the search step to report)
+    _executor.submit(get_vector_store)
+    _executor.submit(_get_ai_piece_catalog)
     analysis = builder.analyze_flow_request(user_request)
     
     # Step 2: Search for components
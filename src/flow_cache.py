@@ -0,0 +1,187 @@
+"""Persistent cache for the flow builder's catalog lookups.
+
+The piece overviews and action input schemas the flow builder pulls into
+its prompts are formatted from the same catalog rows after every restart.
+Their text is stored in a small SQLite file, keyed on the lookup and on the
+catalog database's modification time, so a restarted server answers from
+disk and a rebuilt catalog is never served stale text. Opening the cache
+drops rows from older catalog builds, rows past their TTL and the oldest
+rows beyond a size cap. Lookups that hit a database error are never stored.
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import time
+from threading import Lock
+from typing import Callable, Optional
+
+from src.db_config import DB_FILE
+from src.env_utils import env_flag
+from src.tool_cache import track_lookup_failures
+
+
+_PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CACHE_PATH = os.getenv(
+    "FLOW_CACHE_PATH",
+    os.path.join(_PROJECT_DIR, "data", "flow_cache.db"),
+)
+CACHE_ENABLED = env_flag("FLOW_PERSISTENT_CACHE", True)
+TTL_SECONDS = int(os.getenv("FLOW_CACHE_TTL_SECONDS", str(30 * 86400)))
+MAX_ENTRIES = int(os.getenv("FLOW_CACHE_MAX_ENTRIES", "20000"))
+
+# Lookups that report a database error in their text start with this marker
+_TRANSIENT_ERROR_PREFIX = "⚠️"
+
+
+class LookupFailedError(RuntimeError):
+    """A lookup hit a database error; its text must not be cached."""
+
+
+def _catalog_version() -> str:
+    """Identify the current catalog build by its file's modification time."""
+    try:
+        return str(os.stat(DB_FILE).st_mtime_ns)
+    except OSError:
+        return "missing"
+
+
+class FlowLookupCache:
+    """
+    SQLite-backed ``key -> text`` cache scoped to one catalog version.
+
+    Entries older than ``ttl`` seconds are not served. The size cap is
+    enforced when the cache is opened; one catalog version has only a few
+    thousand distinct lookups, so a running process stays near it.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        version: Optional[str] = None,
+        ttl: float = TTL_SECONDS,
+        max_entries: int = MAX_ENTRIES,
+    ):
+        self.path = path or DEFAULT_CACHE_PATH
+        self.version = version or _catalog_version()
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        cache_dir = os.path.dirname(self.path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        # Shared by the flow builder's worker threads; the lock keeps each
+        # statement (and its commit) on the connection at a time
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " ts INTEGER NOT NULL"
+            ")"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS cache_ts ON cache (ts)")
+        self._prune()
+        self.conn.commit()
+        self._lock = Lock()
+
+    def _versioned(self, key: str) -> str:
+        return f"{self.version}:{key}"
+
+    def _oldest_fresh_ts(self) -> int:
+        return int(time.time() - self.ttl)
+
+    def _prune(self) -> None:
+        """Drop other catalog versions, expired rows and the oldest beyond the cap."""
+        prefix = self._versioned("")
+        self.conn.execute(
+            "DELETE FROM cache WHERE substr(key, 1, ?) != ? OR ts < ?",
+            (len(prefix), prefix, self._oldest_fresh_ts()),
+        )
+        self.conn.execute(
+            "DELETE FROM cache WHERE key IN ("
+            " SELECT key FROM cache ORDER BY ts DESC LIMIT -1 OFFSET ?"
+            ")",
+            (self.max_entries,),
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT value FROM cache WHERE key = ? AND ts >= ?",
+                (self._versioned(key), self._oldest_fresh_ts()),
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, value: str) -> None:
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, ts) VALUES (?, ?, ?)",
+                (self._versioned(key), value, int(time.time())),
+            )
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+_flow_cache: Optional[FlowLookupCache] = None
+_flow_cache_failed = False
+_flow_cache_lock = Lock()
+
+
+def get_flow_cache() -> Optional[FlowLookupCache]:
+    """Return the process-wide cache, or ``None`` if disabled or unavailable."""
+    global _flow_cache, _flow_cache_failed
+    if not CACHE_ENABLED or _flow_cache_failed:
+        return None
+    if _flow_cache is None:
+        with _flow_cache_lock:
+            if _flow_cache is None and not _flow_cache_failed:
+                try:
+                    _flow_cache = FlowLookupCache()
+                except (OSError, sqlite3.Error) as e:
+                    # e.g. a read-only deployment; lookups still work uncached
+                    print(f"[WARNING] Flow lookup cache unavailable: {e}")
+                    _flow_cache_failed = True
+    return _flow_cache
+
+
+def _compute_checked(compute: Callable[[], str]) -> str:
+    """Run ``compute``, raising ``LookupFailedError`` if a lookup failed."""
+    with track_lookup_failures() as lookup_failed:
+        value = compute()
+        failed = lookup_failed()
+    if failed or not isinstance(value, str) or value.startswith(_TRANSIENT_ERROR_PREFIX):
+        raise LookupFailedError(value)
+    return value
+
+
+def cached_lookup(key: str, compute: Callable[[], str]) -> str:
+    """
+    Return the stored text for ``key``, computing and storing it on a miss.
+
+    Raises ``LookupFailedError`` (carrying the computed text) instead of
+    returning when a catalog lookup inside ``compute`` failed, so neither
+    this cache nor an in-memory one in front of it keeps the result.
+    """
+    cache = get_flow_cache()
+    if cache is None:
+        return _compute_checked(compute)
+
+    try:
+        value = cache.get(key)
+    except sqlite3.Error as e:
+        print(f"[WARNING] Flow lookup cache read failed: {e}")
+        return _compute_checked(compute)
+    if value is not None:
+        return value
+
+    value = _compute_checked(compute)
+    try:
+        cache.put(key, value)
+    except sqlite3.Error as e:
+        print(f"[WARNING] Flow lookup cache write failed: {e}")
+    return value
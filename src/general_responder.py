@@ -3,8 +3,7 @@ Lightweight responder for generic, non-ActivePieces queries.
 Preserves session context so follow-up questions remain coherent.
 """
 from typing import Any, List, Optional
-from langchain.schema import SystemMessage, HumanMessage, AIMessage
-from langchain_core.messages import BaseMessage
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
 
 from src.llm_config import get_llm
 from src.memory import create_memory
@@ -2,16 +2,21 @@
 LLM configuration and initialization supporting multiple providers.
 """
 import os
-from typing import Any
+from typing import Any, Optional
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
-def get_llm() -> Any:
+def get_llm(prompt_cache_key: Optional[str] = None) -> Any:
     """
     Initialize and return the LLM based on environment configuration.
     Supports OpenAI, Anthropic (Claude), and can be extended for Google.
+    
+    Args:
+        prompt_cache_key: Optional OpenAI ``prompt_cache_key`` sent with every
+            request so calls sharing a static prompt prefix are routed to the
+            same prompt cache. Ignored by other providers.
     """
     provider = os.getenv("MODEL_PROVIDER", "openai").lower()
     model_name = os.getenv("MODEL_NAME", "gpt-4-turbo-preview")
@@ -22,7 +27,8 @@ def get_llm() -> Any:
         llm = ChatOpenAI(
             model_name=model_name,
             temperature=0.2,
-            streaming=False
+            streaming=False,
+            model_kwargs={"prompt_cache_key": prompt_cache_key} if prompt_cache_key else {}
         )
         print(f"✓ Initialized OpenAI LLM: {model_name}")
         return llm
@@ -15,7 +15,9 @@ from threading import Thread
 from typing import Any, Dict, Optional
 import time
 
-from src.agent import get_agent, clear_agent_cache
+from src.agent import get_agent, clear_agent_cache, warmup
+from src.agent_cache import cache_reply, get_cached_reply
+from src.env_utils import env_flag
 from src.general_responder import generate_general_response
 from src.memory import (
     log_interaction,
@@ -27,6 +29,7 @@ from src.memory import (
     serialize_memory_to_chat_history,
 )
 from src.query_utils import is_activepieces_query
+from src.tools import prefetch_activepieces_docs
 
 # Load environment variables
 load_dotenv()
@@ -111,8 +114,13 @@ def _get_recent_history_messages(session_id: Optional[str], limit: int = 8) -> l
     return [msg.get("message", "") for msg in recent if msg.get("message")]
 
 
+def _response_cache_namespace(enable_web_search: Optional[bool]) -> str:
+    """Keep cached replies with and without web search apart."""
+    return f"web_search={bool(enable_web_search)}"
+
+
 # Custom callback handler for tracking agent status
-from langchain.callbacks.base import BaseCallbackHandler
+from langchain_core.callbacks.base import BaseCallbackHandler
 from threading import Event
 
 class CancellationException(Exception):
@@ -122,6 +130,9 @@ class CancellationException(Exception):
 class StatusCallbackHandler(BaseCallbackHandler):
     """Callback handler that tracks agent status and emits updates."""
     
+    # Seconds between streaming_update events (tokens are batched in between)
+    STREAM_UPDATE_INTERVAL = 0.25
+    
     def __init__(self, status_queue: Queue, cancellation_event: Event):
         self.status_queue = status_queue
         self.cancellation_event = cancellation_event
@@ -129,6 +140,11 @@ class StatusCallbackHandler(BaseCallbackHandler):
         self.action_counter = 0
         self.action_start_times = {}  # Track start times for each action
         self.tool_start_time = None
+        # Streamed answer text: everything generated so far and the part not yet sent
+        self.streamed_text = ""
+        self.pending_text = ""
+        self.stream_start_time = None
+        self.last_stream_update = 0.0
     
     def _check_cancellation(self):
         """Check if the request has been cancelled and raise exception if so."""
@@ -246,6 +262,13 @@ class StatusCallbackHandler(BaseCallbackHandler):
         try:
             self._check_cancellation()
             
+            # Text from an earlier call was tool-turn narration, not the answer
+            if self.streamed_text or self.pending_text:
+                self.streamed_text = ""
+                self.pending_text = ""
+                self.stream_start_time = None
+                self.status_queue.put({"type": "streaming_reset"})
+            
             # Log LLM reasoning
             reasoning_step = self.action_counter + 0.5
             self.action_start_times[reasoning_step] = time.time()
@@ -262,9 +285,39 @@ class StatusCallbackHandler(BaseCallbackHandler):
         except CancellationException:
             raise
     
+    def on_llm_new_token(self, token: str, **kwargs) -> None:
+        """Forward answer tokens to the client as the model generates them."""
+        self._check_cancellation()
+        if not token:
+            return  # Tool-call chunks carry no text
+        
+        now = time.time()
+        if self.stream_start_time is None:
+            self.stream_start_time = now
+        self.streamed_text += token
+        self.pending_text += token
+        if now - self.last_stream_update >= self.STREAM_UPDATE_INTERVAL:
+            self._emit_streaming_update(now)
+    
+    def _emit_streaming_update(self, now: float) -> None:
+        if not self.pending_text:
+            return
+        self.status_queue.put({
+            "type": "streaming_update",
+            "content": self.pending_text,
+            "total_chars": len(self.streamed_text),
+            "total_words": len(self.streamed_text.split()),
+            "elapsed_time": now - self.stream_start_time,
+            "message": "✍️ Writing response...",
+            "status": "streaming"
+        })
+        self.pending_text = ""
+        self.last_stream_update = now
+    
     def on_llm_end(self, response: Any, **kwargs) -> None:
         """Called when LLM finishes."""
         try:
+            self._emit_streaming_update(time.time())
             reasoning_step = self.action_counter + 0.5
             if reasoning_step in self.action_start_times:
                 duration = time.time() - self.action_start_times[reasoning_step]
@@ -298,6 +351,13 @@ class StatusCallbackHandler(BaseCallbackHandler):
             pass  # Ignore errors during finish
 
 
+def _warmup_flow_builder() -> None:
+    """Import the flow builder and load its catalog and vector store."""
+    from src.flow_builder import warmup as warmup_flow_builder
+
+    warmup_flow_builder()
+
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize the agent and knowledge base on startup."""
@@ -313,8 +373,18 @@ async def startup_event():
     else:
         print("✓ Vector store found")
     
-    # Initialize agent (lazy loading will happen on first request)
-    print("✓ Agent initialization ready")
+    # Build the agent (and load the vector store) in the background so the
+    # server starts accepting requests (health checks) right away and the
+    # first chat request does not pay for it
+    if env_flag("AGENT_WARMUP", True):
+        ping = env_flag("AGENT_WARMUP_PING", False)
+        Thread(target=warmup, kwargs={"ping": ping}, daemon=True).start()
+        print("✓ Agent warmup started")
+    else:
+        print("✓ Agent initialization ready")
+    if env_flag("FLOW_BUILDER_WARMUP", True):
+        Thread(target=_warmup_flow_builder, name="flow-builder-warmup", daemon=True).start()
+        print("✓ Flow builder warmup started")
     print("="*60 + "\n")
 
 
@@ -354,9 +424,10 @@ async def chat(request: ChatRequest):
         print(f"Build Flow Mode: {build_flow_mode}")
         print(f"{'='*60}")
 
+        history_context = _get_recent_history_messages(session_id)
+
         # If Build Flow Mode is OFF, check if it's a general query
         if not build_flow_mode:
-            history_context = _get_recent_history_messages(session_id)
             is_ap_query = is_activepieces_query(user_message, history=history_context)
             
             if not is_ap_query:
@@ -366,9 +437,21 @@ async def chat(request: ChatRequest):
                 print(f"{'='*60}\n")
                 log_interaction(user_message, assistant_reply, session_id=session_id)
                 return {"reply": assistant_reply}
-        agent = get_agent(session_id=session_id, enable_web_search=request.enable_web_search)
-        result = agent.invoke({"input": user_message})
-        assistant_reply = result.get("output", "I apologize, but I couldn't generate a response.")
+        # First-turn replies do not depend on history, so they can be shared
+        cache_namespace = _response_cache_namespace(request.enable_web_search)
+        use_response_cache = bool(session_id) and not history_context
+        assistant_reply = get_cached_reply(user_message, cache_namespace) if use_response_cache else None
+
+        if assistant_reply is not None:
+            print("⚡ Reply served from response cache")
+        else:
+            # Search the docs while the agent makes its first LLM call
+            prefetch_activepieces_docs(user_message)
+            agent = get_agent(session_id=session_id, enable_web_search=request.enable_web_search)
+            result = agent.invoke({"input": user_message}, config={"run_name": "direct_agent"})
+            assistant_reply = result.get("output", "I apologize, but I couldn't generate a response.")
+            if use_response_cache and "output" in result:
+                cache_reply(user_message, assistant_reply, cache_namespace)
         
         print(f"\nAssistant: {assistant_reply}")
         print(f"{'='*60}\n")
@@ -401,6 +484,7 @@ async def chat_stream(request: ChatRequest):
     
     # If Build Flow Mode is enabled, ALWAYS use the flow builder (skip general responder)
     # Only check if it's an ActivePieces query if Build Flow Mode is OFF
+    history_context: list[str] = []
     if not build_flow_mode:
         history_context = _get_recent_history_messages(user_session_id)
         is_ap_query = is_activepieces_query(user_message, history=history_context)
@@ -577,16 +661,34 @@ async def chat_stream(request: ChatRequest):
                     })
                     status_queue.put({"type": "status", "message": "🤖 Processing query...", "tool": None})
 
-                    logger.info("Getting agent instance...")
-                    agent = get_agent(session_id=user_session_id, enable_web_search=enable_web_search)
-                    
-                    logger.info("Invoking agent with message...")
-                    result = agent.invoke({"input": user_message}, config={"callbacks": [callback]})
-                    
-                    logger.info(f"Agent execution complete")
-                    logger.debug(f"Agent result keys: {result.keys()}")
+                    # First-turn replies do not depend on history, so they can be shared
+                    cache_namespace = _response_cache_namespace(enable_web_search)
+                    use_response_cache = bool(user_session_id) and not history_context
+                    assistant_reply = (
+                        get_cached_reply(user_message, cache_namespace) if use_response_cache else None
+                    )
 
-                    assistant_reply = result.get("output", "I apologize, but I couldn't generate a response.")
+                    if assistant_reply is not None:
+                        logger.info("Reply served from response cache")
+                        status_queue.put({"type": "status", "message": "⚡ Answered from cache", "tool": None})
+                    else:
+                        # Search the docs while the agent makes its first LLM call
+                        prefetch_activepieces_docs(user_message)
+                        logger.info("Getting agent instance...")
+                        agent = get_agent(session_id=user_session_id, enable_web_search=enable_web_search)
+                        
+                        logger.info("Invoking agent with message...")
+                        result = agent.invoke(
+                            {"input": user_message},
+                            config={"callbacks": [callback], "run_name": "direct_agent"}
+                        )
+                        
+                        logger.info(f"Agent execution complete")
+                        logger.debug(f"Agent result keys: {result.keys()}")
+
+                        assistant_reply = result.get("output", "I apologize, but I couldn't generate a response.")
+                        if use_response_cache and "output" in result:
+                            cache_reply(user_message, assistant_reply, cache_namespace)
                     result_container["output"] = assistant_reply
                     
                     logger.info(f"Assistant reply length: {len(assistant_reply)}")
@@ -1,17 +1,30 @@
 """
 Memory management for session-based chat history.
 """
+from __future__ import annotations
+
 import json
 import os
-from typing import List, Dict, Optional, Any
+from typing import TYPE_CHECKING, List, Dict, Optional, Any
 from datetime import datetime
-from langchain.memory import ConversationBufferMemory
-from langchain.schema import HumanMessage, AIMessage
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if TYPE_CHECKING:
+    from langchain.memory.chat_memory import BaseChatMemory
 
 
 SESSIONS_DIR = "data/chat_sessions"
 SESSIONS_INDEX_FILE = "data/sessions_index.json"
 
+# Past exchanges (user + assistant pairs) put in the agent's prompt each turn.
+# Older turns stay in the session log but are not re-sent, which keeps the
+# per-turn input flat on long sessions. 0 sends the whole history.
+MEMORY_WINDOW_TURNS = int(os.getenv("AGENT_MEMORY_WINDOW", "4"))
+
 # In-memory storage for current sessions (not persisted across server restarts)
 _active_sessions = {}
 
@@ -22,12 +35,30 @@ def ensure_sessions_dir():
         os.makedirs(SESSIONS_DIR)
 
 
+def _read_json(path: str) -> Any:
+    """Read a JSON file (orjson when installed)."""
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_json(path: str, data: Any):
+    """Write a JSON file indented by two spaces (orjson when installed)."""
+    if orjson is not None:
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        return
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+
 def load_sessions_index() -> Dict:
     """Load the sessions index from file."""
     if os.path.exists(SESSIONS_INDEX_FILE):
         try:
-            with open(SESSIONS_INDEX_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
+            return _read_json(SESSIONS_INDEX_FILE)
         except Exception as e:
             print(f"Warning: Could not load sessions index: {e}")
             return {}
@@ -37,8 +68,7 @@ def load_sessions_index() -> Dict:
 def save_sessions_index(index: Dict):
     """Save the sessions index to file."""
     try:
-        with open(SESSIONS_INDEX_FILE, "w", encoding="utf-8") as f:
-            json.dump(index, f, indent=2, ensure_ascii=False)
+        _write_json(SESSIONS_INDEX_FILE, index)
     except Exception as e:
         print(f"Warning: Could not save sessions index: {e}")
 
@@ -57,8 +87,7 @@ def create_session(session_id: str) -> Dict:
     # Save session file
     session_file = os.path.join(SESSIONS_DIR, f"{session_id}.json")
     try:
-        with open(session_file, "w", encoding="utf-8") as f:
-            json.dump(session_data, f, indent=2, ensure_ascii=False)
+        _write_json(session_file, session_data)
     except Exception as e:
         print(f"Warning: Could not create session file: {e}")
     
@@ -79,8 +108,7 @@ def load_session(session_id: str) -> Optional[Dict]:
     session_file = os.path.join(SESSIONS_DIR, f"{session_id}.json")
     if os.path.exists(session_file):
         try:
-            with open(session_file, "r", encoding="utf-8") as f:
-                return json.load(f)
+            return _read_json(session_file)
         except Exception as e:
             print(f"Warning: Could not load session {session_id}: {e}")
             return None
@@ -96,8 +124,7 @@ def save_session(session_data: Dict):
     
     session_file = os.path.join(SESSIONS_DIR, f"{session_id}.json")
     try:
-        with open(session_file, "w", encoding="utf-8") as f:
-            json.dump(session_data, f, indent=2, ensure_ascii=False)
+        _write_json(session_file, session_data)
         
         # Update index
         index = load_sessions_index()
@@ -134,41 +161,52 @@ def get_all_sessions() -> List[Dict]:
     return sessions
 
 
-def create_memory(session_id: Optional[str] = None) -> ConversationBufferMemory:
+def create_memory(session_id: Optional[str] = None) -> BaseChatMemory:
     """
-    Create a ConversationBufferMemory instance for a session.
+    Create the conversation memory for a session.
     If session_id is None, creates an in-memory only session.
+
+    Sessions with an ID read their messages from the session log on demand
+    (see ``SessionLogChatMessageHistory``) rather than holding a copy; the
+    agent prompt only receives the last ``MEMORY_WINDOW_TURNS`` exchanges.
     """
-    memory = ConversationBufferMemory(
-        memory_key="chat_history",
-        return_messages=True,
-        output_key="output"
-    )
-    
-    # Load session history if session_id provided
+    # Imported here so the session log helpers do not load LangChain
+    from langchain.memory import ConversationBufferMemory, ConversationBufferWindowMemory
+    from langchain_core.chat_history import InMemoryChatMessageHistory
+    from src.session_history import SessionLogChatMessageHistory
+
     if session_id:
         session_data = load_session(session_id)
         if session_data:
             messages = session_data.get("messages", [])
             if messages:
                 print(f"✓ Loaded {len(messages)} messages for session {session_id}")
-                
-                # Restore messages to memory
-                for msg in messages:
-                    if msg["role"] == "user":
-                        memory.chat_memory.add_message(HumanMessage(content=msg["message"]))
-                    elif msg["role"] == "assistant":
-                        memory.chat_memory.add_message(AIMessage(content=msg["message"]))
         else:
             # Create new session
             create_session(session_id)
             print(f"✓ Created new session {session_id}")
-    
-    return memory
+        chat_memory = SessionLogChatMessageHistory(session_id)
+    else:
+        chat_memory = InMemoryChatMessageHistory()
+
+    if MEMORY_WINDOW_TURNS > 0:
+        return ConversationBufferWindowMemory(
+            chat_memory=chat_memory,
+            k=MEMORY_WINDOW_TURNS,
+            memory_key="chat_history",
+            return_messages=True,
+            output_key="output"
+        )
+    return ConversationBufferMemory(
+        chat_memory=chat_memory,
+        memory_key="chat_history",
+        return_messages=True,
+        output_key="output"
+    )
 
 
-def serialize_memory_to_chat_history(memory: Optional[ConversationBufferMemory], limit: int = 10) -> List[Dict[str, str]]:
-    """Convert ConversationBufferMemory into a serializable chat history list."""
+def serialize_memory_to_chat_history(memory: Optional[BaseChatMemory], limit: int = 10) -> List[Dict[str, str]]:
+    """Convert conversation memory into a serializable chat history list."""
     history: List[Dict[str, str]] = []
 
     if not memory or not hasattr(memory, "chat_memory"):
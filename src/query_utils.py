@@ -3,7 +3,8 @@
 from __future__ import annotations
 
 import re
-from typing import List, Optional, Sequence
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
 
 
 # Common stopwords to filter out when extracting topical keywords
@@ -109,11 +110,20 @@ def _extract_topic_phrase(normalized_query: str, max_tokens: int = 6) -> str:
 
 
 def generate_query_variants(user_query: str, min_variants: int = 3) -> List[str]:
-    """Generate diversified query variants for query-fusion style retrieval."""
+    """Generate diversified query variants for query-fusion style retrieval.
+
+    Results are memoised per normalized query, so repeated questions skip
+    the variant expansion; callers get a fresh list they may modify.
+    """
     normalized = normalize_query(user_query)
     if not normalized:
         return []
+    return list(_query_variants(normalized, min_variants))
+
 
+@lru_cache(maxsize=1024)
+def _query_variants(normalized: str, min_variants: int) -> Tuple[str, ...]:
+    """Build the variants for an already-normalized, non-empty query."""
     variants: List[str] = []
     seen = set()
 
@@ -157,7 +167,7 @@ def generate_query_variants(user_query: str, min_variants: int = 3) -> List[str]
         add_variant(f"{normalized} ActivePieces reference {counter}")
         counter += 1
 
-    return variants
+    return tuple(variants)
 
 
 _DOMAIN_PHRASES = (
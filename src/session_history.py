@@ -0,0 +1,41 @@
+"""
+Chat message history backed by the session log.
+
+Every exchange is already written to ``data/chat_sessions/<id>.json`` by
+``log_interaction``. Reading the agent's history from that file, instead of
+copying it into an in-memory buffer per session, keeps cached executors
+small and means a restarted (or second) server process sees the same
+conversation.
+"""
+from typing import List, Sequence
+
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from src.memory import load_session
+
+
+class SessionLogChatMessageHistory(BaseChatMessageHistory):
+    """Read-only view of a session's logged messages."""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+
+    @property
+    def messages(self) -> List[BaseMessage]:
+        session_data = load_session(self.session_id) or {}
+        messages: List[BaseMessage] = []
+        for msg in session_data.get("messages", []):
+            if msg.get("role") == "user":
+                messages.append(HumanMessage(content=msg.get("message", "")))
+            elif msg.get("role") == "assistant":
+                messages.append(AIMessage(content=msg.get("message", "")))
+        return messages
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        # log_interaction records every exchange; writing here would log it twice
+        pass
+
+    def clear(self) -> None:
+        # Evicting a cached executor must not delete the session log
+        pass
@@ -0,0 +1,153 @@
+"""Result cache for the agent's tools.
+
+The catalog and documentation the tools read from only change when the
+database or vector store is rebuilt, yet agents in different sessions keep
+making the same calls (``check_activepieces("gmail")``). Tool results are kept
+in a process-wide LRU keyed on ``(tool name, arguments)`` so repeated calls are
+answered without touching SQLite, the embeddings API or FAISS again.
+"""
+
+from __future__ import annotations
+
+import functools
+import inspect
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from typing import Any, Callable, Iterator, Optional, Tuple
+
+from src.env_utils import env_flag
+
+
+logger = logging.getLogger(__name__)
+
+CACHE_ENABLED = env_flag("TOOL_RESULT_CACHE", True)
+MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "10000"))
+DOCS_TTL_SECONDS = int(os.getenv("TOOL_CACHE_DOCS_TTL_SECONDS", "86400"))
+
+# Tools report failures as text; those must be retried, not replayed
+_ERROR_PREFIXES = ("Error", "⚠️")
+
+# Set by catalog lookups that swallow a database error and return an empty
+# result: the answer built from it reads like an ordinary "not found"
+_lookup_failed: ContextVar[bool] = ContextVar("lookup_failed", default=False)
+
+
+def mark_lookup_failed() -> None:
+    """Record that a lookup in the current call hit an error it swallowed."""
+    _lookup_failed.set(True)
+
+
+@contextmanager
+def track_lookup_failures() -> Iterator[Callable[[], bool]]:
+    """
+    Watch for ``mark_lookup_failed`` calls made inside the block.
+
+    Yields a function that reports whether any lookup failed so far. A
+    failure is also passed on to an enclosing block.
+    """
+    token = _lookup_failed.set(False)
+    try:
+        yield _lookup_failed.get
+    finally:
+        failed = _lookup_failed.get()
+        _lookup_failed.reset(token)
+        if failed:
+            _lookup_failed.set(True)
+
+
+class ToolResultCache:
+    """
+    Thread-safe ``(tool, arguments) -> output`` LRU with optional per-entry TTL.
+
+    Entries stored with ``ttl=None`` never expire; the least recently used are
+    evicted beyond ``max_entries``.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Any, Optional[float], float]]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, str]) -> Tuple[bool, Any, float]:
+        """Return ``(found, output, seconds the original call took)``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                output, expires_at, duration = entry
+                if expires_at is None or time.monotonic() < expires_at:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, output, duration
+                del self._entries[key]
+            self.misses += 1
+            return False, None, 0.0
+
+    def put(self, key: Tuple[str, str], output: Any, ttl: Optional[float], duration: float) -> None:
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._entries[key] = (output, expires_at, duration)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_tool_cache = ToolResultCache()
+
+
+def get_tool_cache() -> ToolResultCache:
+    """Return the process-wide tool result cache."""
+    return _tool_cache
+
+
+def cached_tool(name: str, ttl: Optional[float] = None) -> Callable[[Callable], Callable]:
+    """
+    Cache a tool function's string results under ``name`` and its arguments.
+
+    Keeps the wrapped function's signature and docstring, so it can sit under
+    LangChain's ``@tool`` decorator. ``ttl=None`` caches for the life of the
+    process. Error messages, and outputs produced while a lookup reported a
+    failure through ``mark_lookup_failed``, are returned but not cached.
+    """
+    def decorator(func: Callable) -> Callable:
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not CACHE_ENABLED:
+                return func(*args, **kwargs)
+
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (name, json.dumps(bound.arguments, sort_keys=True, default=str))
+
+            found, output, duration = _tool_cache.get(key)
+            if found:
+                logger.info(f"[tool_cache] Hit for {name} (saved {duration:.2f}s)")
+                return output
+
+            started = time.perf_counter()
+            with track_lookup_failures() as lookup_failed:
+                output = func(*args, **kwargs)
+                failed = lookup_failed()
+            if not failed and isinstance(output, str) and not output.startswith(_ERROR_PREFIXES):
+                _tool_cache.put(key, output, ttl, time.perf_counter() - started)
+            return output
+
+        return wrapper
+
+    return decorator
@@ -3,92 +3,137 @@ Tools for the AI assistant agent.
 """
 import os
 import requests
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Lock
 from typing import Optional, List, Dict, Any
 from src.db_config import get_db_cursor
 from src.activepieces_db import ActivepiecesDB
+from src.env_utils import env_flag
 from src.query_utils import generate_query_variants, normalize_query
+from src.tool_cache import mark_lookup_failed
 
 
 # Global variables for caching
 _vector_store = None
 _embeddings = None
+_vector_store_lock = Lock()
+
+# Recently embedded search queries kept by the embeddings client
+QUERY_EMBEDDING_CACHE_SIZE = 1024
+
+# Speculative documentation searches, keyed by normalized query
+DOC_SEARCH_PREFETCH = env_flag("DOC_SEARCH_PREFETCH", True)
+_PREFETCH_MAX_PENDING = 64
+_prefetch_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="docs-prefetch")
+_prefetched: "OrderedDict[str, Future]" = OrderedDict()
+_prefetch_lock = Lock()
 
 
 def get_vector_store():
     """Load or return cached vector store."""
     global _vector_store, _embeddings
     if _vector_store is None:
-        import pickle
-        import faiss
-        import numpy as np
-        from openai import OpenAI
+        # Prefetch threads and tool calls may race to the first load
+        with _vector_store_lock:
+            if _vector_store is not None:
+                return _vector_store
+            import numpy as np
+            from openai import OpenAI
+            from src.vector_index import ColumnarDocstore, configure_search, load_docstore, read_index
         
-        # Import langchain components (avoiding langchain-openai)
-        try:
-            from langchain_community.docstore.in_memory import InMemoryDocstore
-            from langchain.schema import Document
-            from langchain_community.vectorstores import FAISS
-            from langchain.embeddings.base import Embeddings
-        except Exception as e:
-            raise ImportError(f"Failed to import langchain components: {e}. Please ensure langchain packages are properly installed.")
-        
-        # Load the FAISS index
-        index = faiss.read_index("data/ap_faiss_index/index.faiss")
+            # Import langchain components (avoiding langchain-openai)
+            try:
+                from langchain_community.vectorstores import FAISS
+                from langchain.embeddings.base import Embeddings
+            except Exception as e:
+                raise ImportError(f"Failed to import langchain components: {e}. Please ensure langchain packages are properly installed.")
         
-        # Load the docstore and index mapping
-        with open("data/ap_faiss_index/index.pkl", "rb") as f:
-            docstore_dict, index_to_docstore_id = pickle.load(f)
+            # Load the FAISS index (memory-mapped read-only unless FAISS_MMAP=false)
+            index = read_index(
+                "data/ap_faiss_index",
+                mmap=env_flag("FAISS_MMAP", True)
+            )
         
-        # Convert dict docstore to InMemoryDocstore with Document objects
-        documents = {}
-        for doc_id, doc_data in docstore_dict.items():
-            documents[doc_id] = Document(
-                page_content=doc_data['page_content'],
-                metadata=doc_data['metadata']
+            # Optional recall/latency tuning without rebuilding the index
+            ef_search = os.getenv("FAISS_EF_SEARCH")
+            nprobe = os.getenv("FAISS_NPROBE")
+            configure_search(
+                index,
+                ef_search=int(ef_search) if ef_search else None,
+                nprobe=int(nprobe) if nprobe else None
             )
         
-        docstore = InMemoryDocstore(documents)
+            # Load the docstore (msgpack when available, legacy pickle otherwise);
+            # Documents are only materialised for rows a search actually returns
+            texts, metadatas = load_docstore("data/ap_faiss_index")
+            docstore = ColumnarDocstore(texts, metadatas)
+            index_to_docstore_id = {i: str(i) for i in range(len(texts))}
         
-        # Create custom embeddings class using OpenAI directly (avoiding langchain-openai compatibility issues)
-        class CustomOpenAIEmbeddings(Embeddings):
-            def __init__(self, api_key: str, model: str = "text-embedding-ada-002"):
-                # Create OpenAI client without proxies parameter to avoid compatibility issues
-                self.client = OpenAI(
-                    api_key=api_key,
-                    http_client=None  # Let OpenAI use default http client
-                )
-                self.model = model
+            # Create custom embeddings class using OpenAI directly (avoiding langchain-openai compatibility issues)
+            class CustomOpenAIEmbeddings(Embeddings):
+                def __init__(self, api_key: str, model: str = "text-embedding-ada-002"):
+                    # Create OpenAI client without proxies parameter to avoid compatibility issues
+                    self.client = OpenAI(
+                        api_key=api_key,
+                        http_client=None  # Let OpenAI use default http client
+                    )
+                    self.model = model
+                    # Query vectors are reused by repeated searches, the prefetch
+                    # and the response cache's similarity lookup
+                    self._query_vectors: "OrderedDict[str, list[float]]" = OrderedDict()
+                    self._query_lock = Lock()
+            
+                def embed_documents(self, texts: list[str]) -> list[list[float]]:
+                    """Embed a list of documents."""
+                    response = self.client.embeddings.create(
+                        input=texts,
+                        model=self.model
+                    )
+                    return [item.embedding for item in response.data]
             
-            def embed_documents(self, texts: list[str]) -> list[list[float]]:
-                """Embed a list of documents."""
-                response = self.client.embeddings.create(
-                    input=texts,
-                    model=self.model
-                )
-                return [item.embedding for item in response.data]
+                def embed_query(self, text: str) -> list[float]:
+                    """Embed a single query."""
+                    return self.embed_queries([text])[0]
             
-            def embed_query(self, text: str) -> list[float]:
-                """Embed a single query."""
-                response = self.client.embeddings.create(
-                    input=[text],
-                    model=self.model
-                )
-                return response.data[0].embedding
+                def embed_queries(self, texts: list[str]) -> list[list[float]]:
+                    """Embed several queries in one request, reusing recently embedded ones."""
+                    found = {}
+                    with self._query_lock:
+                        for text in texts:
+                            if text in self._query_vectors:
+                                self._query_vectors.move_to_end(text)
+                                found[text] = self._query_vectors[text]
+                    
+                    missing = [text for text in dict.fromkeys(texts) if text not in found]
+                    if missing:
+                        response = self.client.embeddings.create(
+                            input=missing,
+                            model=self.model
+                        )
+                        vectors = [item.embedding for item in response.data]
+                        found.update(zip(missing, vectors))
+                        with self._query_lock:
+                            self._query_vectors.update(zip(missing, vectors))
+                            while len(self._query_vectors) > QUERY_EMBEDDING_CACHE_SIZE:
+                                self._query_vectors.popitem(last=False)
+                    
+                    return [list(found[text]) for text in texts]
         
-        # Initialize custom embeddings
-        api_key = os.getenv("OPENAI_API_KEY")
-        _embeddings = CustomOpenAIEmbeddings(
-            api_key=api_key,
-            model="text-embedding-ada-002"
-        )
+            # Initialize custom embeddings
+            api_key = os.getenv("OPENAI_API_KEY")
+            _embeddings = CustomOpenAIEmbeddings(
+                api_key=api_key,
+                model="text-embedding-ada-002"
+            )
         
-        # Create FAISS vector store from components
-        _vector_store = FAISS(
-            embedding_function=_embeddings,
-            index=index,
-            docstore=docstore,
-            index_to_docstore_id=index_to_docstore_id
-        )
+            # Create FAISS vector store from components
+            _vector_store = FAISS(
+                embedding_function=_embeddings,
+                index=index,
+                docstore=docstore,
+                index_to_docstore_id=index_to_docstore_id
+            )
     return _vector_store
 
 
@@ -136,6 +181,7 @@ def find_piece_by_name(name: str) -> Optional[Dict[str, Any]]:
             
     except Exception as e:
         print(f"Error finding piece: {e}")
+        mark_lookup_failed()
         return None
 
 
@@ -164,6 +210,7 @@ def find_action_by_name(action_name: str, limit: int = 50) -> List[Dict[str, str
             
     except Exception as e:
         print(f"Error finding actions: {e}")
+        mark_lookup_failed()
         return []
 
 
@@ -209,6 +256,7 @@ def find_trigger_by_name(trigger_name: str, limit: int = 50) -> List[Dict[str, s
             
     except Exception as e:
         print(f"Error finding triggers: {e}")
+        mark_lookup_failed()
         return []
 
 
@@ -702,6 +750,52 @@ def search_activepieces_docs(query: str) -> str:
             logger.warning(f"[search_activepieces_docs] Empty query after normalization")
             return "Error: Query cannot be empty. Please provide a valid search query."
         
+        with _prefetch_lock:
+            prefetched = _prefetched.pop(normalized_query, None)
+        if prefetched is not None:
+            logger.info(f"[search_activepieces_docs] Using prefetched results for: {normalized_query}")
+            return prefetched.result()
+
+        return _search_docs_normalized(normalized_query)
+
+    except Exception as e:
+        logger.error(f"[search_activepieces_docs] Error: {str(e)}", exc_info=True)
+        return f"Error searching knowledge base: {str(e)}"
+
+
+def prefetch_activepieces_docs(query: str) -> None:
+    """
+    Start searching the knowledge base for ``query`` in the background.
+
+    The agent usually spends its first LLM round trip deciding to call
+    ``search_activepieces_docs`` with the user's question; running that
+    search meanwhile takes it (and the first-time vector store load) off the
+    critical path. A later search for the same normalized query picks up
+    the result instead of searching again. Disabled with
+    DOC_SEARCH_PREFETCH=false.
+    """
+    if not DOC_SEARCH_PREFETCH or not isinstance(query, str):
+        return
+
+    normalized_query = normalize_query(query)
+    if not normalized_query:
+        return
+
+    with _prefetch_lock:
+        if normalized_query in _prefetched:
+            return
+        _prefetched[normalized_query] = _prefetch_executor.submit(_search_docs_normalized, normalized_query)
+        # Drop the oldest searches nobody asked for
+        while len(_prefetched) > _PREFETCH_MAX_PENDING:
+            _prefetched.popitem(last=False)
+
+
+def _search_docs_normalized(normalized_query: str) -> str:
+    """Run the knowledge base search for an already normalized query."""
+    import logging
+    logger = logging.getLogger(__name__)
+
+    try:
         logger.info(f"[search_activepieces_docs] Searching for: {normalized_query}")
 
         try:
@@ -721,11 +815,20 @@ def search_activepieces_docs(query: str) -> str:
         query_variants = generate_query_variants(normalized_query)
         logger.info(f"[search_activepieces_docs] Query variants: {query_variants}")
 
+        # Embed every variant with a single request when the embeddings support it
+        embed_queries = getattr(vector_store.embedding_function, "embed_queries", None)
+        query_vectors = embed_queries(query_variants) if embed_queries is not None else None
+
         aggregated: Dict[str, Dict[str, Any]] = {}
 
-        for variant in query_variants:
+        for position, variant in enumerate(query_variants):
             try:
-                variant_results = vector_store.similarity_search_with_score(variant, k=per_variant_k)
+                if query_vectors is not None:
+                    variant_results = vector_store.similarity_search_with_score_by_vector(
+                        query_vectors[position], k=per_variant_k
+                    )
+                else:
+                    variant_results = vector_store.similarity_search_with_score(variant, k=per_variant_k)
             except AttributeError:
                 # Fallback if the vector store implementation does not support returning scores
                 raw_results = vector_store.similarity_search(variant, k=per_variant_k)
@@ -1114,8 +1217,13 @@ def get_all_tools(enable_web_search: bool = False):
         enable_web_search: Whether to include web search tool in the available tools
     """
     from langchain.tools import tool
+    from src.tool_cache import DOCS_TTL_SECONDS, cached_tool
+    
+    # Catalog lookups are static for the life of the process; docs search
+    # results expire daily and web search results are never cached
     
     @tool
+    @cached_tool("check_activepieces")
     def check_activepieces_tool(query: str) -> str:
         """Check if an integration, action, or trigger exists in ActivePieces. Use this to verify availability.
         
@@ -1124,6 +1232,7 @@ def get_all_tools(enable_web_search: bool = False):
         return check_activepieces(query)
     
     @tool
+    @cached_tool("list_piece_actions_and_triggers")
     def list_piece_actions_and_triggers_tool(piece_name: str) -> str:
         """List all actions and triggers for an ActivePieces integration.
         
@@ -1132,6 +1241,7 @@ def get_all_tools(enable_web_search: bool = False):
         return list_piece_actions_and_triggers(piece_name)
     
     @tool
+    @cached_tool("list_action_inputs")
     def list_action_inputs_tool(piece_name: str, action_name: str) -> str:
         """List the input fields required for a specific action within an integration.
         
@@ -1141,6 +1251,7 @@ def get_all_tools(enable_web_search: bool = False):
         return list_action_inputs(piece_name, action_name)
     
     @tool
+    @cached_tool("search_piece_catalog")
     def search_piece_catalog_tool(query: str = "", auth_type: str = "", limit: int = 10) -> str:
         """Search the catalog of integrations with optional auth-type filtering.
         
@@ -1151,6 +1262,7 @@ def get_all_tools(enable_web_search: bool = False):
         return search_piece_catalog(query=query, auth_type=auth_type, limit=limit)
     
     @tool
+    @cached_tool("get_top_pieces_overview")
     def get_top_pieces_overview_tool(limit: int = 10) -> str:
         """Highlight the integrations with the largest number of actions and triggers.
         
@@ -1159,6 +1271,7 @@ def get_all_tools(enable_web_search: bool = False):
         return get_top_pieces_overview(limit=limit)
     
     @tool
+    @cached_tool("list_pieces_by_auth_type")
     def list_pieces_by_auth_type_tool(auth_type: str, limit: int = 25) -> str:
         """List integrations that use a specific authentication mechanism.
         
@@ -1168,6 +1281,7 @@ def get_all_tools(enable_web_search: bool = False):
         return list_pieces_by_auth_type(auth_type, limit=limit)
     
     @tool
+    @cached_tool("search_actions_by_keyword")
     def search_actions_by_keyword_tool(keyword: str, limit: int = 10) -> str:
         """Search across all integrations for actions matching the provided keyword.
         
@@ -1177,6 +1291,7 @@ def get_all_tools(enable_web_search: bool = False):
         return search_actions_by_keyword(keyword, limit=limit)
     
     @tool
+    @cached_tool("search_triggers_by_keyword")
     def search_triggers_by_keyword_tool(keyword: str, limit: int = 10) -> str:
         """Search across all integrations for triggers matching the provided keyword.
         
@@ -1186,6 +1301,7 @@ def get_all_tools(enable_web_search: bool = False):
         return search_triggers_by_keyword(keyword, limit=limit)
     
     @tool
+    @cached_tool("search_activepieces_docs", ttl=DOCS_TTL_SECONDS)
     def search_activepieces_docs_tool(query: str = "") -> str:
         """Search the ActivePieces knowledge base for information about actions, triggers, and their properties.
         
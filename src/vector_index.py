@@ -0,0 +1,399 @@
+"""Helpers for building and persisting the FAISS index behind the knowledge base.
+
+Small catalogs get an HNSW graph over 8-bit scalar-quantised vectors
+(near-exact recall, millisecond search, a quarter of the float32 size);
+large catalogs get an OPQ + IVF + PQ index that is trained once and stores
+compressed codes. Vectors are L2-normalised before indexing, so L2 distance
+ranks results exactly like cosine similarity while keeping the "lower score
+is better" convention the search tools rely on.
+
+The docstore is written as columnar msgpack (``docstore.msgpack``) next to
+the legacy ``index.pkl``; loaders prefer whichever of the two is newer. With
+pyarrow installed a ``docstore.parquet`` table (text plus one column per
+metadata field) is written too, for column-wise analysis of the catalog.
+Exact (``Flat``) indexes can be stored as a Blosc-compressed ``vecs.blp``
+side-car instead of the raw ``index.faiss`` when bloscpack is installed.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import pickle
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+# Per-dimension trained 8-bit codes; ada-002 embeddings lose no meaningful recall
+HNSW_STORAGE = "SQ8"
+
+PQ_M = 64
+IVF_NPROBE = 16
+# IVF/PQ training needs a few dozen vectors per centroid (inverted list or
+# 8-bit PQ code); below that use HNSW
+MIN_TRAINING_POINTS_PER_CENTROID = 39
+PQ_CENTROIDS = 256
+MAX_TRAINING_POINTS = 100_000
+
+# Vectors are added in slices so FAISS never copies the whole matrix at once
+ADD_CHUNK_SIZE = 50_000
+
+INDEX_FILE = "index.faiss"
+FLAT_VECTORS_FILE = "vecs.blp"
+DOCSTORE_FILE = "docstore.msgpack"
+LEGACY_DOCSTORE_FILE = "index.pkl"
+PARQUET_DOCSTORE_FILE = "docstore.parquet"
+
+
+def choose_index_factory(num_vectors: int, dimension: int) -> str:
+    """Pick a FAISS ``index_factory`` string suited to the catalog size."""
+    nlist = 2 ** max(4, round(math.log2(4 * math.sqrt(max(num_vectors, 1)))))
+    min_training_points = MIN_TRAINING_POINTS_PER_CENTROID * max(nlist, PQ_CENTROIDS)
+    if dimension % PQ_M == 0 and num_vectors >= min_training_points:
+        return f"OPQ{PQ_M},IVF{nlist}_HNSW{HNSW_M},PQ{PQ_M}"
+    return f"HNSW{HNSW_M},{HNSW_STORAGE}"
+
+
+def _configure_search_params(index) -> None:
+    """Set search-time knobs on the index so they are persisted by ``write_index``."""
+    import faiss
+
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+        return
+
+    try:
+        faiss.extract_index_ivf(index).nprobe = IVF_NPROBE
+    except RuntimeError:
+        pass
+
+
+def configure_search(index, ef_search: Optional[int] = None, nprobe: Optional[int] = None) -> None:
+    """
+    Override search-time recall/latency knobs on a loaded index.
+
+    ``ef_search`` applies to HNSW indexes and ``nprobe`` to IVF indexes;
+    ``None`` keeps the value stored in the index file.
+    """
+    import faiss
+
+    if ef_search is not None and hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
+    if nprobe is not None:
+        try:
+            faiss.extract_index_ivf(index).nprobe = nprobe
+        except RuntimeError:
+            pass
+
+
+def _training_sample(embeddings: np.ndarray) -> np.ndarray:
+    """Return a uniform subsample of ``embeddings`` large enough to train on."""
+    if len(embeddings) <= MAX_TRAINING_POINTS:
+        return embeddings
+    rng = np.random.default_rng(1234)
+    rows = np.sort(rng.choice(len(embeddings), MAX_TRAINING_POINTS, replace=False))
+    return embeddings[rows]
+
+
+def _is_ivf(index) -> bool:
+    import faiss
+
+    try:
+        faiss.extract_index_ivf(index)
+        return True
+    except RuntimeError:
+        return False
+
+
+def _trained_index_file(trained_index_dir: str, factory: str) -> str:
+    safe_factory = "".join(c if c.isalnum() else "_" for c in factory)
+    return os.path.join(trained_index_dir, f"trained_{safe_factory}.faiss")
+
+
+def build_index(
+    embeddings: np.ndarray,
+    factory: Optional[str] = None,
+    trained_index_dir: Optional[str] = None,
+    retrain: bool = False,
+):
+    """
+    Build a FAISS index over ``embeddings``.
+
+    Args:
+        embeddings: ``(n, d)`` float32 matrix. It is L2-normalised (in place
+            when already float32 and C-contiguous).
+        factory: Optional ``index_factory`` string; chosen from the catalog
+            size when omitted.
+        trained_index_dir: Where to keep the trained-but-empty skeleton of
+            IVF/PQ indexes. When a skeleton for the same factory and dimension
+            exists, training (OPQ rotation, coarse quantizer, PQ codebooks) is
+            skipped and vectors are added to it directly.
+        retrain: Ignore any saved skeleton and train from scratch.
+
+    Returns:
+        The trained and populated FAISS index.
+    """
+    import faiss
+
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    faiss.normalize_L2(embeddings)
+    num_vectors, dimension = embeddings.shape
+
+    factory = factory or choose_index_factory(num_vectors, dimension)
+    index = faiss.index_factory(dimension, factory, faiss.METRIC_L2)
+
+    if hasattr(index, "hnsw"):
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+
+    faiss.omp_set_num_threads(os.cpu_count() or 1)
+
+    if not index.is_trained:
+        # Only IVF/PQ training is expensive enough to be worth persisting
+        trained_path = (
+            _trained_index_file(trained_index_dir, factory)
+            if trained_index_dir and _is_ivf(index) else None
+        )
+        if trained_path and not retrain and os.path.exists(trained_path):
+            skeleton = faiss.read_index(trained_path)
+            if skeleton.d == dimension and skeleton.is_trained and skeleton.ntotal == 0:
+                print(f"   [OK] Reusing trained index skeleton: {trained_path}")
+                index = skeleton
+
+        if not index.is_trained:
+            index.train(_training_sample(embeddings))
+            if trained_path:
+                os.makedirs(trained_index_dir, exist_ok=True)
+                faiss.write_index(index, trained_path)
+
+    for start in range(0, num_vectors, ADD_CHUNK_SIZE):
+        index.add(embeddings[start:start + ADD_CHUNK_SIZE])
+    _configure_search_params(index)
+    return index
+
+
+def _remove_if_exists(path: str) -> None:
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def write_index(index, index_path: str) -> str:
+    """
+    Write ``index`` into ``index_path`` and return the file that was written.
+
+    A plain flat index is stored as compressed vectors in ``vecs.blp`` when
+    bloscpack is installed (zstd with byte shuffle compresses float32
+    embeddings well); every other index is written with ``faiss.write_index``.
+    """
+    import faiss
+
+    os.makedirs(index_path, exist_ok=True)
+    faiss_path = os.path.join(index_path, INDEX_FILE)
+    vectors_path = os.path.join(index_path, FLAT_VECTORS_FILE)
+
+    try:
+        import bloscpack
+    except ImportError:
+        bloscpack = None
+
+    if bloscpack is not None and type(index) in (faiss.IndexFlat, faiss.IndexFlatL2):
+        vectors = index.reconstruct_n(0, index.ntotal)
+        bloscpack.pack_ndarray_to_file(
+            vectors,
+            vectors_path,
+            chunk_size="8M",
+            blosc_args=bloscpack.BloscArgs(
+                typesize=vectors.dtype.itemsize, clevel=3, shuffle=True, cname="zstd"
+            ),
+        )
+        _remove_if_exists(faiss_path)
+        return vectors_path
+
+    faiss.write_index(index, faiss_path)
+    _remove_if_exists(vectors_path)
+    return faiss_path
+
+
+def _read_faiss_file(path: str, mmap: bool):
+    import faiss
+
+    if mmap:
+        # IO_FLAG_MMAP_IFC also maps flat/SQ codes (IO_FLAG_MMAP alone only
+        # covers inverted lists); older FAISS builds lack it
+        flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+        try:
+            return faiss.read_index(path, flags)
+        except RuntimeError:
+            pass
+    return faiss.read_index(path)
+
+
+def read_index(index_path: str, mmap: bool = False):
+    """
+    Load the FAISS index written by :func:`write_index`.
+
+    With ``mmap`` the vector data of ``index.faiss`` is memory-mapped
+    read-only instead of copied into the process, so loading is near-instant
+    and pages are shared between workers. The returned index must not be
+    modified. Falls back to a regular read when the index type cannot be
+    mapped.
+    """
+    import faiss
+
+    vectors_path = os.path.join(index_path, FLAT_VECTORS_FILE)
+    if not os.path.exists(vectors_path):
+        return _read_faiss_file(os.path.join(index_path, INDEX_FILE), mmap)
+
+    try:
+        import bloscpack
+    except ImportError:
+        raise ImportError(
+            f"{vectors_path} needs bloscpack to load. Install with: pip install bloscpack"
+        )
+
+    vectors = np.ascontiguousarray(
+        bloscpack.unpack_ndarray_from_file(vectors_path), dtype=np.float32
+    )
+    index = faiss.IndexFlatL2(vectors.shape[1])
+    index.add(vectors)
+    return index
+
+
+class ColumnarDocstore:
+    """
+    Read-only docstore over parallel text/metadata lists.
+
+    Drop-in for LangChain's ``InMemoryDocstore`` when the store is only
+    searched: ``Document`` objects are created on lookup instead of up front.
+    Ids are the stringified FAISS row positions.
+    """
+
+    def __init__(self, texts: Sequence[str], metadatas: Sequence[Dict[str, Any]]):
+        self.texts = texts
+        self.metadatas = metadatas
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def search(self, search: str):
+        from langchain_core.documents import Document
+
+        try:
+            position = int(search)
+            if position < 0:
+                raise IndexError(position)
+            return Document(page_content=self.texts[position], metadata=self.metadatas[position])
+        except (ValueError, IndexError):
+            return f"ID {search} not found."
+
+
+def _write_parquet_docstore(path: str, texts: Sequence[str], metadatas: Sequence[Dict[str, Any]]) -> bool:
+    """Write texts and metadata as a Parquet table; returns False if pyarrow is missing."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        return False
+
+    fields = dict.fromkeys(field for metadata in metadatas for field in metadata)
+    columns = {field: [metadata.get(field) for metadata in metadatas] for field in fields}
+    columns["page_content"] = list(texts)
+
+    try:
+        table = pa.table(columns)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        # Metadata fields with mixed value types have no single column type
+        print(f"   [WARNING] Skipping {PARQUET_DOCSTORE_FILE}: {e}")
+        _remove_if_exists(path)
+        return False
+
+    pq.write_table(table, path + ".tmp")
+    os.replace(path + ".tmp", path)
+    return True
+
+
+def save_docstore(index_path: str, texts: Sequence[str], metadatas: Sequence[Dict[str, Any]]) -> None:
+    """
+    Persist documents for the index rows in ``index_path``.
+
+    Writes ``docstore.msgpack`` (when msgpack is installed) followed by the
+    legacy ``index.pkl`` that older loaders and ``FAISS.load_local``-style
+    tooling understand, and ``docstore.parquet`` when pyarrow is installed.
+    """
+    os.makedirs(index_path, exist_ok=True)
+
+    try:
+        import msgpack
+    except ImportError:
+        msgpack = None
+
+    if msgpack is not None:
+        target = os.path.join(index_path, DOCSTORE_FILE)
+        with open(target + ".tmp", "wb") as f:
+            msgpack.pack({"texts": list(texts), "metadata": list(metadatas)}, f, use_bin_type=True)
+        os.replace(target + ".tmp", target)
+
+    docstore = {
+        str(i): {"page_content": texts[i], "metadata": metadatas[i]}
+        for i in range(len(texts))
+    }
+    index_to_docstore_id = {i: str(i) for i in range(len(texts))}
+    with open(os.path.join(index_path, LEGACY_DOCSTORE_FILE), "wb") as f:
+        pickle.dump((docstore, index_to_docstore_id), f)
+
+    _write_parquet_docstore(os.path.join(index_path, PARQUET_DOCSTORE_FILE), texts, metadatas)
+
+    if msgpack is not None:
+        # Keep the msgpack file the newer of the two so loaders pick it
+        os.utime(os.path.join(index_path, DOCSTORE_FILE))
+
+
+def _load_legacy_docstore(path: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+    with open(path, "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+
+    # Scripts pickle a plain dict; FAISS.save_local pickles an InMemoryDocstore
+    entries = docstore if isinstance(docstore, dict) else docstore._dict
+
+    texts: List[str] = []
+    metadatas: List[Dict[str, Any]] = []
+    for position in range(len(index_to_docstore_id)):
+        entry = entries[index_to_docstore_id[position]]
+        if isinstance(entry, dict):
+            texts.append(entry["page_content"])
+            metadatas.append(entry["metadata"])
+        else:
+            texts.append(entry.page_content)
+            metadatas.append(entry.metadata)
+    return texts, metadatas
+
+
+def load_docstore(index_path: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """
+    Load documents for the index in ``index_path``.
+
+    Returns ``(texts, metadatas)`` aligned with the FAISS row positions.
+    The msgpack docstore is used when present, installed and not older than
+    ``index.pkl``; otherwise the pickle is read.
+    """
+    packed_path = os.path.join(index_path, DOCSTORE_FILE)
+    legacy_path = os.path.join(index_path, LEGACY_DOCSTORE_FILE)
+
+    if os.path.exists(packed_path) and (
+        not os.path.exists(legacy_path)
+        or os.path.getmtime(packed_path) >= os.path.getmtime(legacy_path)
+    ):
+        try:
+            import msgpack
+        except ImportError:
+            msgpack = None
+
+        if msgpack is not None:
+            with open(packed_path, "rb") as f:
+                payload = msgpack.unpack(f, raw=False, strict_map_key=False)
+            return payload["texts"], payload["metadata"]
+
+    return _load_legacy_docstore(legacy_path)
@@ -0,0 +1,151 @@
+"""
+Tests for the agent's semantic response cache.
+"""
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import agent_cache
+from src.agent_cache import (
+    AgentResponseCache,
+    cache_reply,
+    get_cached_reply,
+    is_cacheable,
+    piece_name_matcher,
+)
+
+
+# Hand-picked query vectors: the two Gmail phrasings are near-duplicates,
+# Slack points elsewhere, and the Slack/Discord messages embed almost alike
+_VECTORS = {
+    "what inputs does gmail send email need?": [1.0, 0.0, 0.0],
+    "which inputs does gmail's send email action need?": [0.99, 0.1, 0.0],
+    "how do i post to slack?": [0.0, 1.0, 0.0],
+    "how do i send a slack message?": [0.0, 0.6, 0.8],
+    "how do i send a discord message?": [0.0, 0.61, 0.79],
+}
+
+
+def _fake_embed(text):
+    return _VECTORS.get(text.lower(), [0.0, 0.0, 1.0])
+
+
+def _cache(**kwargs):
+    kwargs.setdefault("threshold", 0.95)
+    kwargs.setdefault("piece_names_fn", piece_name_matcher(["Gmail", "Slack", "Discord"]))
+    return AgentResponseCache(embed_fn=_fake_embed, **kwargs)
+
+
+def test_exact_hit_ignores_case_and_whitespace():
+    cache = _cache(threshold=2)  # semantic lookup disabled
+    cache.put("What inputs does Gmail send email need?", "reply")
+
+    assert cache.get("  what inputs does   gmail send email need?") == "reply"
+    assert cache.get("Which inputs does Gmail's send email action need?") is None
+
+
+def test_semantic_hit_for_near_duplicate():
+    cache = _cache()
+    cache.put("What inputs does Gmail send email need?", "gmail reply")
+
+    assert cache.get("Which inputs does Gmail's send email action need?") == "gmail reply"
+    assert cache.get("How do I post to Slack?") is None
+
+
+def test_semantic_hit_requires_same_pieces():
+    """Near-identical questions about different pieces need different answers."""
+    cache = _cache()
+    cache.put("How do I send a Slack message?", "slack reply")
+
+    assert cache.get("How do I send a Discord message?") is None
+    assert cache.get("how do I send a slack message?") == "slack reply"
+
+
+def test_unreadable_piece_names_disable_semantic_hits():
+    cache = _cache(piece_names_fn=lambda text: None)
+    cache.put("What inputs does Gmail send email need?", "gmail reply")
+
+    assert cache.get("Which inputs does Gmail's send email action need?") is None
+    assert cache.get("What inputs does Gmail send email need?") == "gmail reply"
+
+
+def test_piece_name_matcher():
+    match = piece_name_matcher(["Google Sheets", "Google", "HTTP", "C++ Builder"])
+
+    assert match("Append a row in google sheets via http") == frozenset({"google sheets", "http"})
+    assert match("Use the C++ Builder piece") == frozenset({"c++ builder"})
+    assert match("Googled it, no HTTPS") == frozenset()
+    assert piece_name_matcher([])("anything") == frozenset()
+
+
+def test_namespaces_are_isolated():
+    cache = _cache()
+    cache.put("What inputs does Gmail send email need?", "reply", namespace="gpt-5")
+
+    assert cache.get("What inputs does Gmail send email need?", namespace="gpt-5") == "reply"
+    assert cache.get("What inputs does Gmail send email need?", namespace="gpt-4o") is None
+    assert cache.get("Which inputs does Gmail's send email action need?", namespace="gpt-4o") is None
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(agent_cache, "time", SimpleNamespace(time=lambda: now[0]))
+    cache = _cache(ttl=60)
+    cache.put("What inputs does Gmail send email need?", "reply")
+
+    now[0] += 59
+    assert cache.get("What inputs does Gmail send email need?") == "reply"
+    now[0] += 1
+    assert cache.get("What inputs does Gmail send email need?") is None
+    assert cache.get("Which inputs does Gmail's send email action need?") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = _cache(threshold=2, max_entries=2)
+    cache.put("first", "1")
+    cache.put("second", "2")
+    assert cache.get("first") == "1"  # "second" is now least recently used
+
+    cache.put("third", "3")
+
+    assert cache.get("second") is None
+    assert cache.get("first") == "1"
+    assert cache.get("third") == "3"
+
+
+@pytest.fixture
+def response_cache(monkeypatch):
+    cache = _cache()
+    monkeypatch.setattr(agent_cache, "_response_cache", cache)
+    monkeypatch.setattr(agent_cache, "CACHE_ENABLED", True)
+    return cache
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "What are the latest Gmail actions?",
+        "Which triggers ran today?",
+        "What happened on 2024-05-01?",
+        "Schedule it for 09:30",
+        "   ",
+    ],
+)
+def test_time_dependent_questions_are_not_cached(response_cache, query):
+    assert not is_cacheable(query)
+    cache_reply(query, "reply")
+    assert get_cached_reply(query) is None
+
+
+def test_incomplete_agent_reply_is_not_cached(response_cache):
+    query = "What inputs does Gmail send email need?"
+    cache_reply(query, "Agent stopped due to iteration limit or time limit.")
+    assert get_cached_reply(query) is None
+
+    cache_reply(query, "It needs a recipient, subject and body.")
+    assert get_cached_reply(query) == "It needs a recipient, subject and body."
@@ -0,0 +1,80 @@
+"""
+Tests for token-aware embedding batching.
+"""
+import sys
+from pathlib import Path
+
+import pytest
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import embedding_batches
+from src.embedding_batches import MAX_ITEM_TOKENS, count_tokens, pack_batches, truncate_to_token_limit
+
+
+class _CharEncoding:
+    """Stand-in for a tiktoken encoding with one token per character."""
+
+    def encode_ordinary_batch(self, texts):
+        return [list(text) for text in texts]
+
+    def decode(self, tokens):
+        return "".join(tokens)
+
+
+@pytest.fixture(params=["estimate", "tiktoken"])
+def chars_per_token(request, monkeypatch):
+    """Run with and without tiktoken; yields how many characters make a token."""
+    if request.param == "estimate":
+        monkeypatch.setattr(embedding_batches, "_get_encoding", lambda model: None)
+        return embedding_batches._CHARS_PER_TOKEN
+    monkeypatch.setattr(embedding_batches, "_get_encoding", lambda model: _CharEncoding())
+    return 1
+
+
+def test_pack_batches_empty():
+    assert pack_batches([]) == []
+
+
+def test_pack_batches_token_limit_is_inclusive():
+    assert pack_batches([5, 5], max_tokens=10) == [(0, 2)]
+    assert pack_batches([5, 6], max_tokens=10) == [(0, 1), (1, 2)]
+
+
+def test_pack_batches_item_limit():
+    assert pack_batches([1] * 5, max_items=2) == [(0, 2), (2, 4), (4, 5)]
+
+
+def test_pack_batches_oversized_item_gets_own_batch():
+    assert pack_batches([3, 50, 3], max_tokens=10) == [(0, 1), (1, 2), (2, 3)]
+
+
+def test_pack_batches_caps_item_tokens():
+    # Inputs are truncated to MAX_ITEM_TOKENS before sending, so they count as such
+    assert pack_batches([10 * MAX_ITEM_TOKENS, 1], max_tokens=MAX_ITEM_TOKENS + 1) == [(0, 2)]
+
+
+def test_pack_batches_covers_every_input_in_order():
+    counts = [7, 1, 9, 4, 4, 2, 10, 3]
+    batches = pack_batches(counts, max_items=3, max_tokens=12)
+
+    assert [i for start, end in batches for i in range(start, end)] == list(range(len(counts)))
+    for start, end in batches:
+        assert end - start <= 3
+        assert end - start == 1 or sum(counts[start:end]) <= 12
+
+
+def test_truncate_keeps_texts_within_limit(chars_per_token):
+    at_limit = "a" * (10 * chars_per_token)
+    over_limit = "b" * (10 * chars_per_token + 1)
+    texts = [at_limit, over_limit, "c" * 1000, ""]
+
+    truncated, counts = truncate_to_token_limit(texts, "model", max_tokens=10)
+
+    assert truncated[0] == at_limit
+    assert truncated[1] == over_limit[: len(at_limit)]
+    assert truncated[2] == "c" * len(at_limit)
+    assert truncated[3] == ""
+    assert counts == [10, 10, 10, 0]
+    assert counts == count_tokens(truncated, "model")
@@ -259,7 +259,71 @@ def run_all_tests():
     return failed == 0
 
 
+def test_ai_piece_catalog_failure_is_retried(monkeypatch):
+    """A catalog load that hit a DB error must not be kept for the process."""
+    import sqlite3
+
+    from src import flow_builder, tools
+
+    monkeypatch.setattr(flow_builder, "_ai_piece_catalog", None)
+
+    def locked(self):
+        raise sqlite3.OperationalError("database is locked")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(tools.ActivepiecesDB, "__enter__", locked)
+        failed = flow_builder._get_ai_piece_catalog()
+
+    assert all(piece is None for piece in failed.values())
+    assert flow_builder._ai_piece_catalog is None
+
+    catalog = flow_builder._get_ai_piece_catalog()
+    assert catalog["text_ai"] is not None
+    assert flow_builder._ai_piece_catalog is catalog
+
+
+def test_failed_analysis_stream_falls_back(monkeypatch):
+    """A failed Responses stream must not be parsed as a (partial) analysis."""
+    from types import SimpleNamespace
+
+    from src import flow_builder
+
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(flow_builder, "ANALYSIS_CACHE_ENABLED", False)
+    analysis_json = '{"flow_goal": "Post new Gmail emails to Slack", "trigger_type": "Gmail - New Email", "actions_needed": ["Send Slack message"], "is_clear": true, "missing_info": [], "complexity": "simple", "confidence": "high"}'
+
+    class FailedStream:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def __iter__(self):
+            yield SimpleNamespace(type="response.output_text.delta", delta='{"flow_goal": "Post')
+            yield SimpleNamespace(
+                type="response.failed",
+                response=SimpleNamespace(status="failed", error="server_error"),
+            )
+
+    created = []
+
+    def create(**kwargs):
+        created.append(kwargs)
+        return SimpleNamespace(output_text=analysis_json)
+
+    builder = flow_builder.FlowBuilder()
+    builder.client = SimpleNamespace(
+        responses=SimpleNamespace(stream=lambda **kwargs: FailedStream(), create=create)
+    )
+
+    analysis = builder.analyze_flow_request("post my new gmail emails to slack")
+
+    assert len(created) == 1
+    assert analysis["trigger_type"] == "Gmail - New Email"
+    assert analysis["actions_needed"] == ["Send Slack message"]
+
+
 if __name__ == "__main__":
     success = run_all_tests()
     sys.exit(0 if success else 1)
-
@@ -0,0 +1,130 @@
+"""
+Tests for the flow builder's persistent lookup cache.
+"""
+import sqlite3
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import flow_cache
+from src.flow_cache import FlowLookupCache, LookupFailedError, cached_lookup
+from src.tool_cache import mark_lookup_failed
+
+
+@pytest.fixture
+def lookup_cache(tmp_path, monkeypatch):
+    cache = FlowLookupCache(path=str(tmp_path / "flow_cache.db"), version="v1")
+    monkeypatch.setattr(flow_cache, "_flow_cache", cache)
+    monkeypatch.setattr(flow_cache, "CACHE_ENABLED", True)
+    yield cache
+    cache.close()
+
+
+def test_successful_lookup_is_persisted(lookup_cache):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return "Slack actions and triggers"
+
+    assert cached_lookup("piece:Slack", compute) == "Slack actions and triggers"
+    assert cached_lookup("piece:Slack", compute) == "Slack actions and triggers"
+    assert len(calls) == 1
+    assert lookup_cache.get("piece:Slack") == "Slack actions and triggers"
+
+
+def test_failed_lookup_is_not_persisted(lookup_cache):
+    """A "not found" built on a swallowed DB error must not reach the disk."""
+    def failing_compute():
+        mark_lookup_failed()
+        return "✗ No ActivePieces integration matched 'gmail'."
+
+    with pytest.raises(LookupFailedError):
+        cached_lookup("piece:gmail", failing_compute)
+    assert lookup_cache.get("piece:gmail") is None
+
+    assert cached_lookup("piece:gmail", lambda: "Gmail actions and triggers") == "Gmail actions and triggers"
+
+
+def test_error_text_is_not_persisted(lookup_cache):
+    with pytest.raises(LookupFailedError):
+        cached_lookup("inputs:Slack|Send", lambda: "⚠️ Failed to load action details for 'Slack'.")
+    assert lookup_cache.get("inputs:Slack|Send") is None
+
+
+def test_db_failure_in_piece_overview_is_retried(lookup_cache, monkeypatch):
+    """End to end: a locked catalog is neither cached in memory nor on disk."""
+    from src import tools
+    from src.flow_builder import FlowBuilder, _piece_overview_cached
+
+    _piece_overview_cached.cache_clear()
+
+    def locked(self):
+        raise sqlite3.OperationalError("database is locked")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(tools.ActivepiecesDB, "__enter__", locked)
+        failed = FlowBuilder._safe_piece_overview("Slack")
+
+    assert failed.startswith("⚠️")
+    assert lookup_cache.get("piece:Slack") is None
+
+    overview = FlowBuilder._safe_piece_overview("Slack")
+    assert not overview.startswith("⚠️")
+    assert lookup_cache.get("piece:Slack") == overview
+    _piece_overview_cached.cache_clear()
+
+
+def _keys(cache):
+    return {row[0] for row in cache.conn.execute("SELECT key FROM cache")}
+
+
+def test_opening_drops_other_catalog_versions(tmp_path):
+    path = str(tmp_path / "flow_cache.db")
+    old = FlowLookupCache(path=path, version="v1")
+    old.put("piece:Slack", "old Slack text")
+    old.close()
+
+    cache = FlowLookupCache(path=path, version="v2")
+    assert cache.get("piece:Slack") is None
+    assert _keys(cache) == set()
+    cache.close()
+
+
+def test_expired_entries_are_not_served_and_pruned(tmp_path, monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(flow_cache, "time", SimpleNamespace(time=lambda: now[0]))
+    path = str(tmp_path / "flow_cache.db")
+
+    cache = FlowLookupCache(path=path, version="v1", ttl=60)
+    cache.put("piece:Slack", "Slack text")
+    now[0] += 59
+    assert cache.get("piece:Slack") == "Slack text"
+    now[0] += 2
+    assert cache.get("piece:Slack") is None
+    cache.close()
+
+    reopened = FlowLookupCache(path=path, version="v1", ttl=60)
+    assert _keys(reopened) == set()
+    reopened.close()
+
+
+def test_opening_trims_oldest_entries_beyond_cap(tmp_path, monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(flow_cache, "time", SimpleNamespace(time=lambda: now[0]))
+    path = str(tmp_path / "flow_cache.db")
+
+    cache = FlowLookupCache(path=path, version="v1")
+    for name in ("Gmail", "Slack", "Notion"):
+        now[0] += 1
+        cache.put(f"piece:{name}", f"{name} text")
+    cache.close()
+
+    capped = FlowLookupCache(path=path, version="v1", max_entries=2)
+    assert _keys(capped) == {"v1:piece:Slack", "v1:piece:Notion"}
+    capped.close()
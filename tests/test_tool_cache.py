@@ -0,0 +1,107 @@
+"""
+Tests for the tool result cache.
+"""
+import sqlite3
+import sys
+from pathlib import Path
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src import tool_cache
+from src.tool_cache import cached_tool, get_tool_cache
+
+
+def _get_tool(name):
+    from src.tools import get_all_tools
+
+    return next(t for t in get_all_tools() if t.name == name)
+
+
+def test_cache_key_binds_positional_keyword_and_default_arguments(monkeypatch):
+    monkeypatch.setattr(tool_cache, "CACHE_ENABLED", True)
+    get_tool_cache().clear()
+    calls = []
+
+    @cached_tool("test_search")
+    def search(query, limit=5):
+        calls.append((query, limit))
+        return f"{query}:{limit}"
+
+    assert search("gmail") == "gmail:5"
+    assert search(query="gmail") == "gmail:5"
+    assert search("gmail", limit=5) == "gmail:5"
+    assert calls == [("gmail", 5)]
+
+    assert search("gmail", 3) == "gmail:3"
+    assert search("slack") == "slack:5"
+    assert calls == [("gmail", 5), ("gmail", 3), ("slack", 5)]
+
+
+def test_cache_key_includes_tool_name(monkeypatch):
+    monkeypatch.setattr(tool_cache, "CACHE_ENABLED", True)
+    get_tool_cache().clear()
+
+    @cached_tool("first_tool")
+    def first(query):
+        return "first"
+
+    @cached_tool("second_tool")
+    def second(query):
+        return "second"
+
+    assert first("gmail") == "first"
+    assert second("gmail") == "second"
+
+
+def test_error_outputs_are_not_cached(monkeypatch):
+    monkeypatch.setattr(tool_cache, "CACHE_ENABLED", True)
+    get_tool_cache().clear()
+    outputs = iter(["Error: search failed", "⚠️ Web search unavailable", "results"])
+    calls = []
+
+    @cached_tool("flaky_tool")
+    def flaky(query):
+        calls.append(query)
+        return next(outputs)
+
+    assert flaky("gmail") == "Error: search failed"
+    assert flaky("gmail") == "⚠️ Web search unavailable"
+    assert len(get_tool_cache()) == 0
+
+    assert flaky("gmail") == "results"
+    assert flaky("gmail") == "results"
+    assert len(calls) == 3
+    assert len(get_tool_cache()) == 1
+
+
+def test_failed_lookup_is_not_cached(monkeypatch):
+    """A swallowed DB error must not leave a cached "not found" answer behind."""
+    from src import tools
+
+    get_tool_cache().clear()
+    check_tool = _get_tool("check_activepieces_tool")
+
+    def locked(self):
+        raise sqlite3.OperationalError("database is locked")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(tools.ActivepiecesDB, "__enter__", locked)
+        failed_output = check_tool.invoke({"query": "gmail"})
+
+    assert "NOT" in failed_output
+    assert len(get_tool_cache()) == 0
+
+    calls = []
+    real_find = tools.find_piece_by_name
+
+    def counting_find(name):
+        calls.append(name)
+        return real_find(name)
+
+    monkeypatch.setattr(tools, "find_piece_by_name", counting_find)
+    output = check_tool.invoke({"query": "gmail"})
+
+    assert calls, "the lookup after the failure should query the database"
+    assert output != failed_output
+    assert len(get_tool_cache()) == 1